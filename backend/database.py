@@ -1,7 +1,13 @@
 from motor.motor_asyncio import AsyncIOMotorClient
-from models import Project, ImageResponse, UserSession
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+from pydantic import BaseModel
+from models import Project, ImageResponse, UserSession, ExportJob
+from render_cache import RenderCache
+import asyncio
+import logging
 import os
-from typing import List, Optional
+from typing import List, Optional, Tuple, Type, TypeVar, Union, get_args, get_origin
 from datetime import datetime
 
 # Global variables for database connection
@@ -10,27 +16,164 @@ db = None
 projects_collection = None
 images_collection = None
 sessions_collection = None
+export_jobs_collection = None
 
-def initialize_database():
-    """Initialize database connection"""
-    global client, db, projects_collection, images_collection, sessions_collection
-    
-    if client is None:
-        # MongoDB connection
-        mongo_url = os.environ['MONGO_URL']
-        client = AsyncIOMotorClient(mongo_url)
-        db = client[os.environ['DB_NAME']]
+# Project fields that change how a banner renders
+RENDER_FIELDS = {"images", "grid_size", "background_color", "text_overlays", "export_settings"}
+
+# Sessions not accessed for this long are removed by MongoDB's TTL monitor
+SESSION_TTL_SECONDS = int(os.environ.get('SESSION_TTL_SECONDS', 30 * 24 * 3600))
+EXPORT_JOB_TTL_SECONDS = int(os.environ.get('EXPORT_JOB_TTL_SECONDS', 7 * 24 * 3600))
+
+# MongoDB error code for an existing index with the same name but different options
+INDEX_OPTIONS_CONFLICT = 85
+
+logger = logging.getLogger(__name__)
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+def get_projection(fields: Optional[List[str]]) -> Optional[dict]:
+    """Build a MongoDB projection for the requested fields, or None for whole documents"""
+    if fields is None:
+        return None
+    projection = {field: 1 for field in fields}
+    projection["_id"] = 0
+    return projection
+
+def construct_model(model_class: Type[ModelT], data: dict) -> ModelT:
+    """Build a model from trusted database data without running validation.
+
+    Nested models are constructed too. Fields missing from ``data`` (e.g. left
+    out of a projection) get their defaults, or stay unset if they have none.
+    """
+    values = {}
+    for name, field in model_class.model_fields.items():
+        if name not in data:
+            continue
+        value = data[name]
+        annotation = field.annotation
+        if get_origin(annotation) is Union:
+            # Optional[X] -> X
+            non_null = [arg for arg in get_args(annotation) if arg is not type(None)]
+            annotation = non_null[0] if len(non_null) == 1 else annotation
+        item_type = get_args(annotation)[0] if get_origin(annotation) is list and get_args(annotation) else None
         
-        # Collections
-        projects_collection = db.projects
-        images_collection = db.images
-        sessions_collection = db.sessions
+        if isinstance(annotation, type) and issubclass(annotation, BaseModel) and isinstance(value, dict):
+            value = construct_model(annotation, value)
+        elif isinstance(item_type, type) and issubclass(item_type, BaseModel) and isinstance(value, list):
+            value = [construct_model(item_type, item) if isinstance(item, dict) else item for item in value]
+        values[name] = value
+    return model_class.model_construct(**values)
+
+def create_client() -> AsyncIOMotorClient:
+    """Create the MongoDB client with pool settings from the environment"""
+    return AsyncIOMotorClient(
+        os.environ['MONGO_URL'],
+        maxPoolSize=int(os.environ.get('MONGO_MAX_POOL_SIZE', 100)),
+        minPoolSize=int(os.environ.get('MONGO_MIN_POOL_SIZE', 10)),
+        maxIdleTimeMS=int(os.environ.get('MONGO_MAX_IDLE_TIME_MS', 300000)),
+        connectTimeoutMS=int(os.environ.get('MONGO_CONNECT_TIMEOUT_MS', 5000)),
+        serverSelectionTimeoutMS=int(os.environ.get('MONGO_SERVER_SELECTION_TIMEOUT_MS', 5000)),
+        waitQueueTimeoutMS=int(os.environ.get('MONGO_WAIT_QUEUE_TIMEOUT_MS', 10000)),
+    )
+
+def initialize_database(mongo_client: AsyncIOMotorClient):
+    """Point the data layer at a connected client"""
+    global client, db, projects_collection, images_collection, sessions_collection, export_jobs_collection
+    
+    client = mongo_client
+    db = client[os.environ['DB_NAME']]
+    
+    # Collections
+    projects_collection = db.projects
+    images_collection = db.images
+    sessions_collection = db.sessions
+    export_jobs_collection = db.export_jobs
+
+async def connect_database() -> AsyncIOMotorClient:
+    """Create the shared client, open its minimum pool and initialize the data layer"""
+    mongo_client = create_client()
+    
+    # Open the minimum pool up front so the first requests don't pay for connection setup
+    warm_connections = max(1, int(os.environ.get('MONGO_MIN_POOL_SIZE', 10)))
+    await asyncio.gather(*(mongo_client.admin.command('ping') for _ in range(warm_connections)))
+    
+    initialize_database(mongo_client)
+    return mongo_client
+
+def close_database():
+    """Close the shared client"""
+    global client
+    if client is not None:
+        client.close()
+        client = None
 
 class DatabaseManager:
+    # Indexes backing every query in this class, applied at startup by ensure_indexes()
+    INDEXES = {
+        "projects": [
+            IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+            IndexModel([("user_session", ASCENDING), ("updated_at", DESCENDING)], name="user_session_updated_at"),
+        ],
+        "images": [
+            IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+            IndexModel([("url", ASCENDING)], name="url"),
+            IndexModel([("variants.url", ASCENDING)], name="variants_url"),
+            IndexModel([("content_hash", ASCENDING)], name="content_hash"),
+        ],
+        "sessions": [
+            IndexModel([("session_id", ASCENDING)], name="session_id_unique", unique=True),
+            IndexModel([("last_accessed", ASCENDING)], name="last_accessed_ttl", expireAfterSeconds=SESSION_TTL_SECONDS),
+        ],
+        "export_jobs": [
+            IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+            IndexModel([("created_at", ASCENDING)], name="created_at_ttl", expireAfterSeconds=EXPORT_JOB_TTL_SECONDS),
+        ],
+    }
+    
+    @staticmethod
+    async def ensure_indexes():
+        """Create any missing indexes from the registry; safe to run on every startup"""
+        for collection_name, indexes in DatabaseManager.INDEXES.items():
+            collection = db[collection_name]
+            for index in indexes:
+                try:
+                    await collection.create_indexes([index])
+                except OperationFailure as e:
+                    spec = index.document
+                    if e.code == INDEX_OPTIONS_CONFLICT and "expireAfterSeconds" in spec:
+                        # TTL changed: update it in place instead of rebuilding the index
+                        await db.command({
+                            "collMod": collection_name,
+                            "index": {"name": spec["name"], "expireAfterSeconds": spec["expireAfterSeconds"]}
+                        })
+                    else:
+                        logger.error(f"Could not create index {spec['name']} on {collection_name}: {e}")
+    
+    @staticmethod
+    async def get_index_stats() -> dict:
+        """Get per-index usage counters for every registered collection"""
+        stats = {}
+        for collection_name, indexes in DatabaseManager.INDEXES.items():
+            declared = {index.document["name"] for index in indexes}
+            cursor = db[collection_name].aggregate([{"$indexStats": {}}])
+            collection_stats = []
+            async for index_stats in cursor:
+                accesses = index_stats.get("accesses", {})
+                collection_stats.append({
+                    "name": index_stats["name"],
+                    "key": dict(index_stats.get("key", {})),
+                    "ops": accesses.get("ops", 0),
+                    "since": accesses.get("since"),
+                    "declared": index_stats["name"] in declared,
+                })
+            missing = declared - {index["name"] for index in collection_stats}
+            stats[collection_name] = {"indexes": collection_stats, "missing": sorted(missing)}
+        return stats
+    
     @staticmethod
     async def create_session() -> UserSession:
         """Create a new user session"""
-        initialize_database()
         session = UserSession()
         await sessions_collection.insert_one(session.dict())
         return session
@@ -38,16 +181,14 @@ class DatabaseManager:
     @staticmethod
     async def get_session(session_id: str) -> Optional[UserSession]:
         """Get session by ID"""
-        initialize_database()
         session_data = await sessions_collection.find_one({"session_id": session_id})
         if session_data:
-            return UserSession(**session_data)
+            return construct_model(UserSession, session_data)
         return None
     
     @staticmethod
     async def update_session_access(session_id: str):
         """Update last accessed time for session"""
-        initialize_database()
         await sessions_collection.update_one(
             {"session_id": session_id},
             {"$set": {"last_accessed": datetime.utcnow()}}
@@ -56,94 +197,176 @@ class DatabaseManager:
     @staticmethod
     async def create_project(project: Project) -> Project:
         """Create a new project"""
-        initialize_database()
         project_dict = project.dict()
         await projects_collection.insert_one(project_dict)
         return project
     
     @staticmethod
-    async def get_project(project_id: str) -> Optional[Project]:
-        """Get project by ID"""
-        initialize_database()
-        project_data = await projects_collection.find_one({"id": project_id})
+    async def get_project(project_id: str, fields: Optional[List[str]] = None) -> Optional[Project]:
+        """Get project by ID, optionally loading only some fields"""
+        project_data = await projects_collection.find_one({"id": project_id}, get_projection(fields))
         if project_data:
-            return Project(**project_data)
+            return construct_model(Project, project_data)
         return None
     
     @staticmethod
-    async def get_projects_by_session(session_id: str, limit: int = 50) -> List[Project]:
+    async def get_projects_by_session(session_id: str, limit: int = 50, fields: Optional[List[str]] = None) -> List[Project]:
         """Get all projects for a session"""
-        initialize_database()
-        cursor = projects_collection.find({"user_session": session_id}).sort("updated_at", -1).limit(limit)
+        cursor = projects_collection.find({"user_session": session_id}, get_projection(fields)).sort("updated_at", -1).limit(limit)
         projects = []
         async for project_data in cursor:
-            projects.append(Project(**project_data))
+            projects.append(construct_model(Project, project_data))
         return projects
     
+    @staticmethod
+    async def get_projects_with_images(session_id: str, limit: int = 50) -> List[Tuple[Project, List[ImageResponse]]]:
+        """Get a session's projects together with their images in two round-trips"""
+        projects = await DatabaseManager.get_projects_by_session(session_id, limit)
+        
+        # One $in query for the images of every project
+        all_image_ids = {image_id for project in projects for image_id in project.images}
+        images = await DatabaseManager.get_images(list(all_image_ids)) if all_image_ids else []
+        
+        # Each project's images in its own order, like get_project_images
+        images_by_id = {image.id: image for image in images}
+        results = []
+        for project in projects:
+            results.append((project, [images_by_id[image_id] for image_id in project.images if image_id in images_by_id]))
+        return results
+    
     @staticmethod
     async def update_project(project_id: str, update_data: dict) -> Optional[Project]:
         """Update a project"""
-        initialize_database()
         update_data["updated_at"] = datetime.utcnow()
         result = await projects_collection.update_one(
             {"id": project_id},
             {"$set": update_data}
         )
         if result.modified_count > 0:
+            if RENDER_FIELDS.intersection(update_data):
+                RenderCache.invalidate_project(project_id)
             return await DatabaseManager.get_project(project_id)
         return None
     
     @staticmethod
     async def delete_project(project_id: str) -> bool:
         """Delete a project"""
-        initialize_database()
         result = await projects_collection.delete_one({"id": project_id})
+        if result.deleted_count > 0:
+            RenderCache.invalidate_project(project_id)
         return result.deleted_count > 0
     
     @staticmethod
     async def create_image(image: ImageResponse) -> ImageResponse:
         """Create a new image record"""
-        initialize_database()
         image_dict = image.dict()
         await images_collection.insert_one(image_dict)
         return image
     
     @staticmethod
-    async def get_image(image_id: str) -> Optional[ImageResponse]:
-        """Get image by ID"""
-        initialize_database()
-        image_data = await images_collection.find_one({"id": image_id})
+    async def create_images(images: List[ImageResponse]) -> List[ImageResponse]:
+        """Create many image records in one round-trip"""
+        if images:
+            await images_collection.insert_many([image.dict() for image in images])
+        return images
+    
+    @staticmethod
+    async def find_image_by_hash(content_hash: str) -> Optional[ImageResponse]:
+        """Get an image record whose file has this content hash"""
+        image_data = await images_collection.find_one({"content_hash": content_hash})
         if image_data:
-            return ImageResponse(**image_data)
+            return construct_model(ImageResponse, image_data)
         return None
     
     @staticmethod
-    async def get_images(image_ids: List[str]) -> List[ImageResponse]:
-        """Get multiple images by IDs"""
-        initialize_database()
-        cursor = images_collection.find({"id": {"$in": image_ids}})
+    async def is_file_referenced(url: str) -> bool:
+        """Whether any image record still uses an uploaded file"""
+        return await images_collection.count_documents({"url": url}, limit=1) > 0
+    
+    @staticmethod
+    async def get_image(image_id: str, fields: Optional[List[str]] = None) -> Optional[ImageResponse]:
+        """Get image by ID, optionally loading only some fields"""
+        image_data = await images_collection.find_one({"id": image_id}, get_projection(fields))
+        if image_data:
+            return construct_model(ImageResponse, image_data)
+        return None
+    
+    @staticmethod
+    async def get_project_images(image_ids: List[str], fields: Optional[List[str]] = None) -> List[ImageResponse]:
+        """Get a project's images in the project's order, repeating images placed more than once"""
+        if not image_ids:
+            return []
+        images = {image.id: image for image in await DatabaseManager.get_images(list(set(image_ids)), fields)}
+        return [images[image_id] for image_id in image_ids if image_id in images]
+    
+    @staticmethod
+    async def get_images(image_ids: List[str], fields: Optional[List[str]] = None) -> List[ImageResponse]:
+        """Get multiple images by IDs, optionally loading only some fields"""
+        cursor = images_collection.find({"id": {"$in": image_ids}}, get_projection(fields))
         images = []
         async for image_data in cursor:
-            images.append(ImageResponse(**image_data))
+            images.append(construct_model(ImageResponse, image_data))
         return images
     
+    @staticmethod
+    async def get_file_record(filename: str) -> Optional[dict]:
+        """Get the content type, size and hash persisted for an uploaded file or one of its variants"""
+        url = f"/api/files/{filename}"
+        image_data = await images_collection.find_one(
+            {"$or": [{"url": url}, {"variants.url": url}]},
+            {"_id": 0, "url": 1, "content_type": 1, "size": 1, "content_hash": 1, "variants": 1}
+        )
+        if not image_data:
+            return None
+        
+        if image_data.get("url") == url:
+            return {
+                "content_type": image_data.get("content_type"),
+                "size": image_data.get("size"),
+                "content_hash": image_data.get("content_hash"),
+            }
+        for variant in image_data.get("variants", []):
+            if variant.get("url") == url:
+                return {"size": variant.get("file_size"), "content_hash": variant.get("content_hash")}
+        return None
+    
     @staticmethod
     async def delete_image(image_id: str) -> bool:
         """Delete an image"""
-        initialize_database()
         result = await images_collection.delete_one({"id": image_id})
+        if result.deleted_count > 0:
+            RenderCache.invalidate_image(image_id)
         return result.deleted_count > 0
     
     @staticmethod
     async def get_images_by_session(session_id: str, limit: int = 100) -> List[ImageResponse]:
         """Get all images uploaded by a session"""
-        initialize_database()
         # For now, we'll get images from projects associated with the session
-        projects = await DatabaseManager.get_projects_by_session(session_id)
+        projects = await DatabaseManager.get_projects_by_session(session_id, fields=["images"])
         all_image_ids = []
         for project in projects:
             all_image_ids.extend(project.images)
         
         if all_image_ids:
             return await DatabaseManager.get_images(list(set(all_image_ids)))
-        return []
\ No newline at end of file
+        return []
+    
+    @staticmethod
+    async def create_export_job(job: ExportJob) -> ExportJob:
+        """Create a new export job record"""
+        await export_jobs_collection.insert_one(job.dict())
+        return job
+    
+    @staticmethod
+    async def get_export_job(job_id: str) -> Optional[ExportJob]:
+        """Get export job by ID"""
+        job_data = await export_jobs_collection.find_one({"id": job_id})
+        if job_data:
+            return construct_model(ExportJob, job_data)
+        return None
+    
+    @staticmethod
+    async def update_export_job(job_id: str, update_data: dict):
+        """Update an export job's status fields"""
+        update_data["updated_at"] = datetime.utcnow()
+        await export_jobs_collection.update_one({"id": job_id}, {"$set": update_data})
@@ -0,0 +1,149 @@
+import asyncio
+import logging
+import os
+from datetime import datetime
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set
+from models import ExportJob, ExportResponse
+from database import DatabaseManager
+from render_executor import RenderExecutor, RenderQueueFull
+
+logger = logging.getLogger(__name__)
+
+# Reports a stage name and a progress fraction between 0 and 1
+ProgressCallback = Callable[[str, float], Awaitable[None]]
+
+class ExportJobManager:
+    """Background export jobs with a persistent status record.
+
+    Jobs run as tasks on the event loop and do their blocking work through
+    ``RenderExecutor``. Every status change is written to the ``export_jobs``
+    collection, so any worker can answer a status poll, and pushed to
+    in-process listeners for the event stream. Submitting the same project
+    revision while a job for it is still in flight returns that job instead of
+    rendering twice.
+    """
+    POLL_INTERVAL_SECONDS = float(os.environ.get('EXPORT_JOB_POLL_INTERVAL', 1.0))
+    TERMINAL_STATUSES = ("completed", "failed")
+
+    # In-flight jobs of this process, by job ID and by dedup key
+    _jobs: Dict[str, ExportJob] = {}
+    _in_flight: Dict[str, str] = {}
+    _tasks: Set[asyncio.Task] = set()
+    _listeners: Dict[str, List[asyncio.Queue]] = {}
+
+    @staticmethod
+    async def submit(dedup_key: str, project_id: str,
+                     run: Callable[[ProgressCallback], Awaitable[ExportResponse]]) -> ExportJob:
+        """Start a job, or return the in-flight job for the same dedup key"""
+        job_id = ExportJobManager._in_flight.get(dedup_key)
+        if job_id in ExportJobManager._jobs:
+            return ExportJobManager._jobs[job_id].model_copy()
+
+        job = ExportJob(project_id=project_id)
+        # Registered before the first await so a concurrent submit sees it
+        ExportJobManager._jobs[job.id] = job
+        ExportJobManager._in_flight[dedup_key] = job.id
+        try:
+            await DatabaseManager.create_export_job(job)
+        except Exception:
+            ExportJobManager._forget(job.id, dedup_key)
+            raise
+
+        task = asyncio.create_task(ExportJobManager._run(job, dedup_key, run))
+        ExportJobManager._tasks.add(task)
+        task.add_done_callback(ExportJobManager._tasks.discard)
+        return job.model_copy()
+
+    @staticmethod
+    async def get_job(job_id: str) -> Optional[ExportJob]:
+        """Get a job's current state, from memory if it runs in this process"""
+        job = ExportJobManager._jobs.get(job_id)
+        if job is not None:
+            return job.model_copy()
+        return await DatabaseManager.get_export_job(job_id)
+
+    @staticmethod
+    async def events(job_id: str) -> AsyncIterator[ExportJob]:
+        """Yield a job's state on every change until it finishes.
+
+        Updates from this process arrive immediately; jobs running in another
+        worker are picked up by polling the job record.
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        ExportJobManager._listeners.setdefault(job_id, []).append(queue)
+        try:
+            job = await ExportJobManager.get_job(job_id)
+            if job is None:
+                return
+            yield job
+
+            while job.status not in ExportJobManager.TERMINAL_STATUSES:
+                try:
+                    job = await asyncio.wait_for(queue.get(), timeout=ExportJobManager.POLL_INTERVAL_SECONDS)
+                except asyncio.TimeoutError:
+                    job = await ExportJobManager.get_job(job_id)
+                    if job is None:
+                        return
+                yield job
+        finally:
+            listeners = ExportJobManager._listeners.get(job_id, [])
+            if queue in listeners:
+                listeners.remove(queue)
+            if not listeners:
+                ExportJobManager._listeners.pop(job_id, None)
+
+    @staticmethod
+    async def shutdown():
+        """Cancel running jobs, marking them failed"""
+        tasks = list(ExportJobManager._tasks)
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    @staticmethod
+    async def _run(job: ExportJob, dedup_key: str, run: Callable[[ProgressCallback], Awaitable[ExportResponse]]):
+        async def progress(stage: str, value: float):
+            await ExportJobManager._update(job, status="running", stage=stage, progress=value)
+
+        try:
+            while True:
+                try:
+                    result = await run(progress)
+                    break
+                except RenderQueueFull:
+                    # Stay queued until the render pool has room
+                    await ExportJobManager._update(job, status="queued", stage="waiting_for_worker")
+                    await asyncio.sleep(RenderExecutor.RETRY_AFTER_SECONDS)
+            await ExportJobManager._update(job, status="completed", stage="completed", progress=1.0, result=result)
+        except asyncio.CancelledError:
+            await ExportJobManager._update(job, status="failed", stage="failed", error="Export was interrupted by a server shutdown")
+            raise
+        except Exception as e:
+            await ExportJobManager._update(job, status="failed", stage="failed", error=str(getattr(e, 'detail', e)))
+        finally:
+            ExportJobManager._forget(job.id, dedup_key)
+
+    @staticmethod
+    async def _update(job: ExportJob, **changes):
+        """Apply a status change, persist it and notify listeners"""
+        for name, value in changes.items():
+            setattr(job, name, value)
+        job.updated_at = datetime.utcnow()
+
+        for queue in ExportJobManager._listeners.get(job.id, []):
+            queue.put_nowait(job.model_copy())
+
+        update_data = dict(changes)
+        if 'result' in update_data and update_data['result'] is not None:
+            update_data['result'] = update_data['result'].dict()
+        try:
+            await DatabaseManager.update_export_job(job.id, update_data)
+        except Exception as e:
+            logger.error(f"Error updating export job {job.id}: {e}")
+
+    @staticmethod
+    def _forget(job_id: str, dedup_key: str):
+        ExportJobManager._jobs.pop(job_id, None)
+        if ExportJobManager._in_flight.get(dedup_key) == job_id:
+            del ExportJobManager._in_flight[dedup_key]
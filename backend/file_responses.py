@@ -0,0 +1,194 @@
+import os
+import stat
+import uuid
+from typing import List, Optional, Tuple
+import anyio
+from starlette.responses import FileResponse
+from starlette.types import Receive, Scope, Send
+
+class RangeFileResponse(FileResponse):
+    """FileResponse with HTTP Range support.
+
+    Honors single and multiple byte ranges (206, multipart/byteranges for
+    more than one), If-Range, and answers 416 for unsatisfiable ranges. The
+    file is read in large chunks on a worker thread. If an ASGI server offers
+    the ``http.response.zerocopysend`` extension, the file descriptor is
+    handed to it instead; uvicorn, which this app runs on, doesn't, so that
+    path is only taken under servers that implement the extension.
+    """
+    chunk_size = 1024 * 1024
+    # More distinct ranges than this and the Range header is ignored, so one request can't ask for endless parts
+    MAX_RANGES = int(os.environ.get('RANGE_MAX_PARTS', 16))
+    ZEROCOPY_EXTENSION = "http.response.zerocopysend"
+
+    def __init__(self, path, range_header: Optional[str] = None, if_range: Optional[str] = None,
+                 file_size: Optional[int] = None, **kwargs):
+        super().__init__(path, **kwargs)
+        self.range_header = range_header
+        self.if_range = if_range
+        # Callers with cached metadata pass the size (and Last-Modified/ETag headers) to skip the stat
+        self.file_size = file_size
+        if file_size is not None:
+            self.headers.setdefault("content-length", str(file_size))
+        self.headers.setdefault("accept-ranges", "bytes")
+
+    @staticmethod
+    def parse_range(range_header: str, file_size: int) -> Optional[List[Tuple[int, int]]]:
+        """Parse a bytes Range header into inclusive (start, end) pairs.
+
+        Returns None when the header should be ignored (malformed, or more
+        than ``MAX_RANGES`` ranges after coalescing) and an empty list when
+        none of the ranges can be satisfied.
+        """
+        unit, _, range_set = range_header.partition("=")
+        if unit.strip().lower() != "bytes" or not range_set:
+            return None
+
+        ranges = []
+        for spec in range_set.split(","):
+            start_text, dash, end_text = spec.strip().partition("-")
+            if not dash:
+                return None
+            try:
+                if start_text == "":
+                    # Suffix range: the last N bytes
+                    suffix_length = int(end_text)
+                    if suffix_length <= 0:
+                        continue
+                    start, end = max(0, file_size - suffix_length), file_size - 1
+                else:
+                    start = int(start_text)
+                    end = int(end_text) if end_text else file_size - 1
+                    if end_text and end < start:
+                        return None
+                    end = min(end, file_size - 1)
+            except ValueError:
+                return None
+            if start < file_size:
+                ranges.append((start, end))
+
+        # Coalesce overlapping or adjacent ranges
+        ranges.sort()
+        merged: List[Tuple[int, int]] = []
+        for start, end in ranges:
+            if merged and start <= merged[-1][1] + 1:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+            else:
+                merged.append((start, end))
+        if len(merged) > RangeFileResponse.MAX_RANGES:
+            return None
+        return merged
+
+    def if_range_matches(self) -> bool:
+        """Whether an If-Range precondition allows a partial response"""
+        if self.if_range is None:
+            return True
+        if_range = self.if_range.strip()
+        if if_range.startswith("W/"):
+            # If-Range uses strong comparison, so a weak validator never matches
+            return False
+        if if_range.startswith('"'):
+            return if_range == self.headers.get("etag")
+        return if_range == self.headers.get("last-modified")
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if self.file_size is None:
+            if self.stat_result is None:
+                try:
+                    stat_result = await anyio.to_thread.run_sync(os.stat, self.path)
+                except FileNotFoundError:
+                    raise RuntimeError(f"File at path {self.path} does not exist.")
+                if not stat.S_ISREG(stat_result.st_mode):
+                    raise RuntimeError(f"File at path {self.path} is not a file.")
+                self.stat_result = stat_result
+                self.set_stat_headers(stat_result)
+            self.file_size = self.stat_result.st_size
+        file_size = self.file_size
+
+        ranges = None
+        if self.range_header and self.if_range_matches():
+            ranges = self.parse_range(self.range_header, file_size)
+
+        if ranges is not None and not ranges:
+            await self.send_unsatisfiable(send, file_size)
+            return
+
+        body_parts: List[Tuple[bytes, int, int]] = []  # (part header, offset, count)
+        if ranges is None:
+            status_code = self.status_code
+            body_parts.append((b"", 0, file_size))
+        elif len(ranges) == 1:
+            status_code = 206
+            start, end = ranges[0]
+            self.headers["content-range"] = f"bytes {start}-{end}/{file_size}"
+            self.headers["content-length"] = str(end - start + 1)
+            body_parts.append((b"", start, end - start + 1))
+        else:
+            status_code = 206
+            boundary = uuid.uuid4().hex
+            part_type = self.media_type or "application/octet-stream"
+            for start, end in ranges:
+                part_header = (
+                    f"\r\n--{boundary}\r\n"
+                    f"Content-Type: {part_type}\r\n"
+                    f"Content-Range: bytes {start}-{end}/{file_size}\r\n\r\n"
+                ).encode("latin-1")
+                body_parts.append((part_header, start, end - start + 1))
+            closing = f"\r\n--{boundary}--\r\n".encode("latin-1")
+            body_parts.append((closing, 0, 0))
+            self.headers["content-type"] = f"multipart/byteranges; boundary={boundary}"
+            self.headers["content-length"] = str(sum(len(header) + count for header, _, count in body_parts))
+
+        try:
+            # Open before the status line goes out, so a vanished file can still get a 404
+            file = open(self.path, "rb")
+        except FileNotFoundError:
+            await send({"type": "http.response.start", "status": 404, "headers": [(b"content-length", b"0")]})
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        with file:
+            await send({"type": "http.response.start", "status": status_code, "headers": self.raw_headers})
+
+            if scope["method"].upper() == "HEAD":
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+            else:
+                zerocopy = self.ZEROCOPY_EXTENSION in scope.get("extensions", {})
+                for part_header, offset, count in body_parts:
+                    if part_header:
+                        await send({"type": "http.response.body", "body": part_header, "more_body": True})
+                    if zerocopy and count:
+                        await send({
+                            "type": self.ZEROCOPY_EXTENSION,
+                            "file": file.fileno(),
+                            "offset": offset,
+                            "count": count,
+                            "more_body": True,
+                        })
+                    elif count:
+                        await self.send_chunks(send, file, offset, count)
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+        if self.background is not None:
+            await self.background()
+
+    async def send_chunks(self, send: Send, file, offset: int, count: int):
+        """Read a byte range on a worker thread and send it in chunks"""
+        await anyio.to_thread.run_sync(file.seek, offset)
+        remaining = count
+        while remaining > 0:
+            chunk = await anyio.to_thread.run_sync(file.read, min(self.chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+
+    async def send_unsatisfiable(self, send: Send, file_size: int):
+        """Answer 416 for a Range header that selects nothing"""
+        headers = [
+            (b"content-range", f"bytes */{file_size}".encode("latin-1")),
+            (b"content-length", b"0"),
+            (b"accept-ranges", b"bytes"),
+        ]
+        await send({"type": "http.response.start", "status": 416, "headers": headers})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
@@ -1,9 +1,14 @@
 import base64
+import hashlib
+import io
 import os
-from typing import Tuple, Optional
+import re
+from collections import OrderedDict
+from typing import List, Tuple, Optional
 from pathlib import Path
 import uuid
 from datetime import datetime
+from PIL import Image
 try:
     import magic
     HAS_MAGIC = True
@@ -14,9 +19,52 @@ except ImportError:
 UPLOAD_DIR = Path("/app/backend/uploads")
 UPLOAD_DIR.mkdir(exist_ok=True)
 
+# Cached banner renders, served through /api/files like uploads
+RENDER_DIR = UPLOAD_DIR / "renders"
+RENDER_DIR.mkdir(exist_ok=True)
+
+# Downscaled image variants generated at upload time
+THUMBNAIL_DIR = UPLOAD_DIR / "thumbnails"
+THUMBNAIL_DIR.mkdir(exist_ok=True)
+
+# Uploads, stored once per content under "{sha256}{ext}" and sharded by the first two hex digits
+BLOB_DIR = UPLOAD_DIR / "blobs"
+BLOB_DIR.mkdir(exist_ok=True)
+BLOB_FILENAME = re.compile(r"^[0-9a-f]{64}\.[a-z0-9]+$")
+
+STORAGE_DIRS = [UPLOAD_DIR, RENDER_DIR, THUMBNAIL_DIR]
+
 class FileManager:
     ALLOWED_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.webp', '.gif', '.bmp'}
     MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB
+    HASH_CHUNK_SIZE = 1024 * 1024
+    VARIANT_SIZES = [4096, 2048, 1024, 256]  # longest side, largest first
+    VARIANT_JPEG_QUALITY = 90
+    
+    # Cache-Control per file class; upload and variant names are unique so they never change
+    CACHE_CONTROL = {
+        'uploads': os.environ.get('FILES_CACHE_CONTROL_UPLOADS', 'public, max-age=31536000, immutable'),
+        'thumbnails': os.environ.get('FILES_CACHE_CONTROL_THUMBNAILS', 'public, max-age=31536000, immutable'),
+        'exports': os.environ.get('FILES_CACHE_CONTROL_EXPORTS', 'public, max-age=86400'),
+    }
+
+    # path -> (mtime, size, sha256) so unchanged files are only hashed once, most recently used last
+    HASH_CACHE_SIZE = int(os.environ.get('FILE_HASH_CACHE_SIZE', 4096))
+    _hash_cache: "OrderedDict[str, Tuple[float, int, str]]" = OrderedDict()
+    
+    # filename -> metadata needed to serve it, most recently used last
+    METADATA_CACHE_SIZE = int(os.environ.get('FILE_METADATA_CACHE_SIZE', 4096))
+    _metadata_cache: "OrderedDict[str, dict]" = OrderedDict()
+    
+    CONTENT_TYPE_MAP = {
+        '.png': 'image/png',
+        '.jpg': 'image/jpeg',
+        '.jpeg': 'image/jpeg',
+        '.webp': 'image/webp',
+        '.avif': 'image/avif',
+        '.gif': 'image/gif',
+        '.bmp': 'image/bmp'
+    }
     
     @staticmethod
     def validate_image(content_type: str, file_size: int) -> Tuple[bool, str]:
@@ -50,23 +98,72 @@ class FileManager:
             if not is_valid:
                 return False, message, None
             
-            # Generate unique filename
-            file_extension = FileManager.get_extension_from_content_type(content_type)
-            unique_filename = f"{uuid.uuid4()}_{datetime.now().strftime('%Y%m%d_%H%M%S')}{file_extension}"
-            file_path = UPLOAD_DIR / unique_filename
+            # Content-addressed filename: identical uploads share one file
+            content_hash = hashlib.sha256(image_data).hexdigest()
+            blob_filename = FileManager.get_blob_filename(content_hash, content_type)
+            file_path = FileManager.get_blob_path(blob_filename)
             
-            # Save file
-            with open(file_path, 'wb') as f:
-                f.write(image_data)
+            # A duplicate upload reuses the stored blob without writing it again
+            if not file_path.exists():
+                FileManager.write_atomic(file_path, image_data)
+            FileManager._remember_hash(file_path, content_hash)
             
             # Generate URL (relative path)
-            file_url = f"/api/files/{unique_filename}"
+            file_url = f"/api/files/{blob_filename}"
             
             return True, "File saved successfully", file_url
             
         except Exception as e:
             return False, f"Error saving file: {str(e)}", None
     
+    @staticmethod
+    def get_upload_temp_path(content_type: str) -> Path:
+        """Get a unique path to write an upload into before its content hash is known"""
+        return UPLOAD_DIR / f".{FileManager.generate_filename(content_type)}.tmp"
+    
+    @staticmethod
+    def commit_upload(temp_path: Path, content_hash: str, content_type: str) -> str:
+        """Move a fully written upload to its content-addressed name, returning its URL"""
+        blob_filename = FileManager.get_blob_filename(content_hash, content_type)
+        file_path = FileManager.get_blob_path(blob_filename)
+        # Only complete files ever appear under their final name; a duplicate keeps the stored blob
+        if file_path.exists():
+            os.remove(temp_path)
+        else:
+            file_path.parent.mkdir(exist_ok=True)
+            os.replace(temp_path, file_path)
+        FileManager._remember_hash(file_path, content_hash)
+        return f"/api/files/{blob_filename}"
+    
+    @staticmethod
+    def generate_filename(content_type: str) -> str:
+        """Generate a unique filename for an upload"""
+        file_extension = FileManager.get_extension_from_content_type(content_type)
+        return f"{uuid.uuid4()}_{datetime.now().strftime('%Y%m%d_%H%M%S')}{file_extension}"
+    
+    @staticmethod
+    def get_blob_filename(content_hash: str, content_type: str) -> str:
+        """Get the content-addressed filename of an upload"""
+        return f"{content_hash}{FileManager.get_extension_from_content_type(content_type)}"
+    
+    @staticmethod
+    def get_blob_path(blob_filename: str) -> Path:
+        """Get the sharded location of a content-addressed upload"""
+        return BLOB_DIR / blob_filename[:2] / blob_filename
+    
+    @staticmethod
+    def write_atomic(file_path: Path, data: bytes):
+        """Write a file through a temp file and rename, so concurrent readers and writers never see a partial file"""
+        file_path.parent.mkdir(exist_ok=True)
+        temp_path = file_path.parent / f".{file_path.name}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(temp_path, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, file_path)
+        finally:
+            if temp_path.exists():
+                os.remove(temp_path)
+    
     @staticmethod
     def get_extension_from_content_type(content_type: str) -> str:
         """Get file extension from content type"""
@@ -82,24 +179,209 @@ class FileManager:
     
     @staticmethod
     def get_file_path(filename: str) -> Optional[Path]:
-        """Get full path to uploaded file"""
-        file_path = UPLOAD_DIR / filename
-        if file_path.exists():
-            return file_path
+        """Get full path to uploaded or rendered file"""
+        if BLOB_FILENAME.match(filename):
+            blob_path = FileManager.get_blob_path(filename)
+            return blob_path if blob_path.exists() else None
+        
+        for storage_dir in STORAGE_DIRS:
+            file_path = storage_dir / filename
+            if file_path.exists():
+                return file_path
         return None
     
+    @staticmethod
+    def get_file_class(file_path: Path) -> str:
+        """Classify a stored file as an upload, thumbnail or export"""
+        if file_path.parent == THUMBNAIL_DIR:
+            return 'thumbnails'
+        if file_path.parent == RENDER_DIR or file_path.name.startswith('banner_'):
+            return 'exports'
+        return 'uploads'
+    
     @staticmethod
     def delete_file(filename: str) -> bool:
         """Delete uploaded file"""
         try:
-            file_path = UPLOAD_DIR / filename
-            if file_path.exists():
+            file_path = FileManager.get_file_path(filename)
+            FileManager.forget_file_metadata(filename, file_path)
+            if file_path:
                 os.remove(file_path)
                 return True
             return False
         except Exception:
             return False
     
+    @staticmethod
+    def files_exist(filenames: List[str]) -> bool:
+        """Whether every one of these stored files is present"""
+        return all(FileManager.get_file_path(filename) for filename in filenames)
+    
+    @staticmethod
+    def set_aside_files(filenames: List[str]) -> List[Tuple[Path, Path]]:
+        """Rename stored files to hidden tombstones, so their deletion can still be undone"""
+        moved = []
+        for filename in filenames:
+            file_path = FileManager.get_file_path(filename)
+            if not file_path:
+                continue
+            tombstone = file_path.parent / f".{file_path.name}.{uuid.uuid4().hex}.deleted"
+            try:
+                os.rename(file_path, tombstone)
+            except OSError:
+                continue
+            FileManager.forget_file_metadata(filename, file_path)
+            moved.append((file_path, tombstone))
+        return moved
+    
+    @staticmethod
+    def restore_files(moved: List[Tuple[Path, Path]]):
+        """Undo set_aside_files; a file rewritten in the meantime has the same content"""
+        for file_path, tombstone in moved:
+            os.replace(tombstone, file_path)
+    
+    @staticmethod
+    def remove_set_aside_files(moved: List[Tuple[Path, Path]]):
+        """Finish deleting files moved by set_aside_files"""
+        for _, tombstone in moved:
+            try:
+                os.remove(tombstone)
+            except OSError:
+                pass
+    
+    @staticmethod
+    def create_image_variants(filename: str) -> dict:
+        """Create a pyramid of downscaled copies of an uploaded image"""
+        info = {'width': None, 'height': None, 'variants': []}
+        try:
+            file_path = FileManager.get_file_path(filename)
+            with Image.open(file_path) as original:
+                info['width'], info['height'] = original.size
+                is_jpeg = original.format == 'JPEG'
+                
+                img = original
+                if img.mode in ('P', '1', 'LA', 'PA'):
+                    has_alpha = img.mode in ('LA', 'PA') or 'transparency' in img.info
+                    img = img.convert('RGBA' if has_alpha else 'RGB')
+                elif is_jpeg and img.mode not in ('RGB', 'L'):
+                    img = img.convert('RGB')
+                
+                # Each level is resampled from the previous, larger one
+                for size in FileManager.VARIANT_SIZES:
+                    if size >= max(img.size):
+                        continue
+                    
+                    img = img.copy()
+                    img.thumbnail((size, size), Image.Resampling.LANCZOS)
+                    
+                    variant_filename = f"{Path(filename).stem}_{size}{'.jpg' if is_jpeg else '.png'}"
+                    variant_path = THUMBNAIL_DIR / variant_filename
+                    variant_buffer = io.BytesIO()
+                    if is_jpeg:
+                        img.save(variant_buffer, "JPEG", quality=FileManager.VARIANT_JPEG_QUALITY)
+                    else:
+                        img.save(variant_buffer, "PNG")
+                    
+                    variant_data = variant_buffer.getvalue()
+                    FileManager.write_atomic(variant_path, variant_data)
+                    content_hash = hashlib.sha256(variant_data).hexdigest()
+                    FileManager._remember_hash(variant_path, content_hash)
+                    
+                    info['variants'].append({
+                        'size': size,
+                        'width': img.width,
+                        'height': img.height,
+                        'url': f"/api/files/{variant_filename}",
+                        'file_size': len(variant_data),
+                        'content_hash': content_hash
+                    })
+        except Exception as e:
+            print(f"Error creating variants for {filename}: {e}")
+        
+        info['variants'].sort(key=lambda variant: variant['size'])
+        return info
+    
+    @staticmethod
+    def get_content_hash(file_path: Path) -> Optional[str]:
+        """Get sha256 hex digest of a file's content"""
+        try:
+            stat = file_path.stat()
+            cached = FileManager._hash_cache.get(str(file_path))
+            if cached and cached[0] == stat.st_mtime and cached[1] == stat.st_size:
+                FileManager._hash_cache.move_to_end(str(file_path))
+                return cached[2]
+            
+            digest = hashlib.sha256()
+            with open(file_path, 'rb') as f:
+                for chunk in iter(lambda: f.read(FileManager.HASH_CHUNK_SIZE), b''):
+                    digest.update(chunk)
+            
+            content_hash = digest.hexdigest()
+            FileManager._cache_hash(file_path, stat, content_hash)
+            return content_hash
+        except Exception:
+            return None
+    
+    @staticmethod
+    def _remember_hash(file_path: Path, content_hash: str):
+        """Record the hash of a file that was just written"""
+        FileManager._cache_hash(file_path, file_path.stat(), content_hash)
+    
+    @staticmethod
+    def _cache_hash(file_path: Path, stat: os.stat_result, content_hash: str):
+        """Store a file's hash in the in-process LRU"""
+        FileManager._hash_cache[str(file_path)] = (stat.st_mtime, stat.st_size, content_hash)
+        FileManager._hash_cache.move_to_end(str(file_path))
+        while len(FileManager._hash_cache) > FileManager.HASH_CACHE_SIZE:
+            FileManager._hash_cache.popitem(last=False)
+    
+    @staticmethod
+    def get_content_type_from_extension(file_path: Path) -> str:
+        """Get content type from a file extension we assigned ourselves"""
+        return FileManager.CONTENT_TYPE_MAP.get(file_path.suffix.lower(), 'application/octet-stream')
+    
+    @staticmethod
+    def get_cached_file_metadata(filename: str) -> Optional[dict]:
+        """Get serving metadata for a file from the in-process LRU"""
+        metadata = FileManager._metadata_cache.get(filename)
+        if metadata is not None:
+            FileManager._metadata_cache.move_to_end(filename)
+        return metadata
+    
+    @staticmethod
+    def cache_file_metadata(filename: str, metadata: dict):
+        """Store serving metadata for a file in the in-process LRU"""
+        FileManager._metadata_cache[filename] = metadata
+        FileManager._metadata_cache.move_to_end(filename)
+        while len(FileManager._metadata_cache) > FileManager.METADATA_CACHE_SIZE:
+            FileManager._metadata_cache.popitem(last=False)
+    
+    @staticmethod
+    def forget_file_metadata(filename: str, file_path: Optional[Path] = None):
+        """Drop cached serving metadata, and the cached hash at ``file_path``, for a deleted file"""
+        FileManager._metadata_cache.pop(filename, None)
+        if file_path:
+            FileManager._hash_cache.pop(str(file_path), None)
+    
+    @staticmethod
+    def build_file_metadata(file_path: Path, known: Optional[dict] = None) -> dict:
+        """Build serving metadata for a file with a single stat.
+
+        ``known`` holds values persisted at upload time (content type, size,
+        hash); anything missing is derived from the file itself.
+        """
+        known = known or {}
+        stat = file_path.stat()
+        content_hash = known.get('content_hash') or FileManager.get_content_hash(file_path)
+        return {
+            'path': file_path,
+            'content_type': known.get('content_type') or FileManager.get_content_type_from_extension(file_path),
+            'size': stat.st_size,
+            'modified': stat.st_mtime,
+            'content_hash': content_hash,
+            'file_class': FileManager.get_file_class(file_path),
+        }
+    
     @staticmethod
     def get_file_info(file_path: Path) -> dict:
         """Get file information"""
@@ -119,16 +401,7 @@ class FileManager:
                     info['content_type'] = 'application/octet-stream'
             else:
                 # Fallback content type detection
-                suffix = file_path.suffix.lower()
-                content_type_map = {
-                    '.png': 'image/png',
-                    '.jpg': 'image/jpeg',
-                    '.jpeg': 'image/jpeg',
-                    '.webp': 'image/webp',
-                    '.gif': 'image/gif',
-                    '.bmp': 'image/bmp'
-                }
-                info['content_type'] = content_type_map.get(suffix, 'application/octet-stream')
+                info['content_type'] = FileManager.get_content_type_from_extension(file_path)
             
             return info
         except Exception:
@@ -0,0 +1,149 @@
+import functools
+import os
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+from PIL import Image, ImageDraw, ImageFont
+
+# Fonts shipped with the app (FONT_DIR) are preferred over system fonts
+FONT_DIR = Path(os.environ.get('FONT_DIR', Path(__file__).parent / "fonts"))
+SYSTEM_FONT_DIRS = [
+    Path("/usr/share/fonts"),
+    Path("/usr/local/share/fonts"),
+    Path.home() / ".fonts",
+    Path("/Library/Fonts"),
+    Path("C:/Windows/Fonts"),
+]
+FONT_EXTENSIONS = {'.ttf', '.otf', '.ttc'}
+
+class FontManager:
+    """Resolves text styles to font files and caches loaded fonts.
+
+    Font files are indexed once per process by family name (and file name, so
+    styles can name a file like ``ArchivoBlack-Regular``). Loaded
+    ``FreeTypeFont`` objects are kept in an LRU keyed by (family, weight,
+    style, pixel size), and rasterized text masks in a second, smaller LRU, so
+    repeated exports neither reload fonts nor re-rasterize unchanged text.
+    """
+    FONT_CACHE_SIZE = int(os.environ.get('FONT_CACHE_SIZE', 256))
+    TEXT_MASK_CACHE_SIZE = int(os.environ.get('TEXT_MASK_CACHE_SIZE', 64))
+
+    # Web font names that are rarely installed on servers, mapped to look-alikes
+    FAMILY_ALIASES = {
+        'arial': ['Liberation Sans', 'Arimo', 'DejaVu Sans'],
+        'helvetica': ['Liberation Sans', 'Arimo', 'DejaVu Sans'],
+        'verdana': ['DejaVu Sans'],
+        'trebuchet ms': ['DejaVu Sans'],
+        'times new roman': ['Liberation Serif', 'Tinos', 'DejaVu Serif'],
+        'georgia': ['Liberation Serif', 'DejaVu Serif'],
+        'courier new': ['Liberation Mono', 'Cousine', 'DejaVu Sans Mono'],
+        'lucida console': ['Liberation Mono', 'DejaVu Sans Mono'],
+        'impact': ['Anton', 'DejaVu Sans'],
+        'comic sans ms': ['Comic Neue', 'DejaVu Sans'],
+    }
+    DEFAULT_FAMILIES = ['DejaVu Sans', 'Liberation Sans']
+
+    # lowercased family or file name -> [(path, bold, italic)]
+    _index: Optional[Dict[str, List[Tuple[str, bool, bool]]]] = None
+    _index_lock = threading.Lock()
+
+    @staticmethod
+    def is_bold(weight: Union[str, int]) -> bool:
+        """Interpret a CSS font weight"""
+        weight = str(weight).strip().lower()
+        if weight.isdigit():
+            return int(weight) >= 600
+        return weight in ('bold', 'bolder')
+
+    @staticmethod
+    def is_italic(style: str) -> bool:
+        """Interpret a CSS font style"""
+        return str(style).strip().lower() in ('italic', 'oblique')
+
+    @staticmethod
+    def build_index() -> Dict[str, List[Tuple[str, bool, bool]]]:
+        """Scan the font directories once per process"""
+        with FontManager._index_lock:
+            if FontManager._index is not None:
+                return FontManager._index
+
+            index: Dict[str, List[Tuple[str, bool, bool]]] = {}
+            for font_dir in [FONT_DIR] + SYSTEM_FONT_DIRS:
+                if not font_dir.is_dir():
+                    continue
+                for font_path in sorted(font_dir.rglob("*")):
+                    if font_path.suffix.lower() not in FONT_EXTENSIONS:
+                        continue
+                    try:
+                        family, style_name = ImageFont.truetype(str(font_path), 12).getname()
+                    except Exception as e:
+                        print(f"Error reading font {font_path}: {e}")
+                        continue
+
+                    style_name = (style_name or '').lower()
+                    bold = any(word in style_name for word in ('bold', 'black', 'heavy'))
+                    italic = any(word in style_name for word in ('italic', 'oblique'))
+                    entry = (str(font_path), bold, italic)
+                    for name in {(family or '').lower(), font_path.stem.lower()}:
+                        if name:
+                            index.setdefault(name, []).append(entry)
+
+            FontManager._index = index
+            return index
+
+    @staticmethod
+    def resolve_font_path(family: str, weight: str = "normal", style: str = "normal") -> Optional[str]:
+        """Find the font file closest to a family, weight and style, or None"""
+        index = FontManager.build_index()
+        bold = FontManager.is_bold(weight)
+        italic = FontManager.is_italic(style)
+
+        family_key = (family or '').strip().lower()
+        candidates_by_family = [family_key] + [name.lower() for name in FontManager.FAMILY_ALIASES.get(family_key, [])]
+        candidates_by_family += [name.lower() for name in FontManager.DEFAULT_FAMILIES]
+
+        for name in candidates_by_family:
+            faces = index.get(name)
+            if faces:
+                # Prefer the right weight over the right slant
+                path, _, _ = min(faces, key=lambda face: (face[1] != bold) * 2 + (face[2] != italic))
+                return path
+        return None
+
+    @staticmethod
+    @functools.lru_cache(maxsize=FONT_CACHE_SIZE)
+    def get_font(family: str, weight: str, style: str, size: int) -> ImageFont.FreeTypeFont:
+        """Get a loaded font for a text style at a pixel size"""
+        size = max(1, size)
+        font_path = FontManager.resolve_font_path(family, weight, style)
+        if font_path:
+            try:
+                return ImageFont.truetype(font_path, size)
+            except Exception as e:
+                print(f"Error loading font {font_path}: {e}")
+        # Pillow's built-in scalable font
+        return ImageFont.load_default(size)
+
+    @staticmethod
+    @functools.lru_cache(maxsize=TEXT_MASK_CACHE_SIZE)
+    def render_text_mask(text: str, family: str, weight: str, style: str, size: int) -> Tuple[Image.Image, int, int]:
+        """Rasterize text into a coverage mask.
+
+        Returns the mask and the offset of its top-left corner from the text
+        origin. The mask is shared between callers and must not be modified.
+        """
+        font = FontManager.get_font(family, weight, style, size)
+        left, top, right, bottom = ImageDraw.Draw(Image.new('L', (1, 1))).textbbox((0, 0), text, font=font)
+        mask = Image.new('L', (max(1, right - left), max(1, bottom - top)))
+        ImageDraw.Draw(mask).text((-left, -top), text, fill=255, font=font)
+        return mask, left, top
+
+    @staticmethod
+    def get_cache_stats() -> dict:
+        """Get hit rates of the font and text mask caches"""
+        stats = {}
+        for name, cached in (('fonts', FontManager.get_font), ('text_masks', FontManager.render_text_mask)):
+            info = cached.cache_info()
+            stats[name] = {'hits': info.hits, 'misses': info.misses, 'size': info.currsize, 'max_size': info.maxsize}
+        stats['indexed_families'] = len(FontManager._index) if FontManager._index is not None else None
+        return stats
@@ -10,12 +10,24 @@ class ImageUpload(BaseModel):
     content_type: str
     data: str  # base64 encoded image data
 
+class ImageVariant(BaseModel):
+    size: int  # longest side in pixels
+    width: int
+    height: int
+    url: str
+    file_size: Optional[int] = None
+    content_hash: Optional[str] = None
+
 class ImageResponse(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     name: str
     size: int
     content_type: str
     url: str
+    content_hash: Optional[str] = None  # sha256 of the stored file
+    width: Optional[int] = None
+    height: Optional[int] = None
+    variants: List[ImageVariant] = []  # downscaled copies, smallest first
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
 # Text Overlay Models
@@ -47,9 +59,12 @@ class GridSize(BaseModel):
 
 # Export Settings Model
 class ExportSettings(BaseModel):
-    format: str = Field(default="png", pattern="^(png|jpg)$")
+    format: str = Field(default="png", pattern="^(png|jpg|webp|avif)$")
     quality: int = Field(default=90, ge=10, le=100)
-    resolution: str = Field(default="2K", pattern="^(1080p|2K|4K)$")
+    # Lossy formats only: lower the quality as needed to stay under this size
+    target_size_kb: Optional[int] = Field(default=None, ge=1)
+    resolution: str = Field(default="2K", pattern="^(1080p|2K|4K|8K)$")
+    profile: str = Field(default="balanced", pattern="^(fast|balanced|smallest|progressive)$")
 
 # Project Models
 class ProjectCreate(BaseModel):
@@ -101,8 +116,13 @@ class StatusResponse(BaseModel):
     status: str
     message: str
 
+class UploadError(BaseModel):
+    name: str
+    message: str
+
 class UploadResponse(BaseModel):
     images: List[ImageResponse]
+    errors: List[UploadError] = []  # files that failed while the rest were stored
     message: str
 
 class ExportResponse(BaseModel):
@@ -110,4 +130,40 @@ class ExportResponse(BaseModel):
     format: str
     resolution: str
     file_size_mb: float
-    message: str
\ No newline at end of file
+    message: str
+
+class ExportFormatsResponse(BaseModel):
+    formats: List[str]  # formats this server can encode, from the ExportSettings choices
+
+# Export Job Models
+class ExportJob(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    project_id: str
+    status: str = "queued"  # queued, running, completed or failed
+    stage: str = "queued"
+    progress: float = 0.0
+    result: Optional[ExportResponse] = None
+    error: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+# Batch Export Models
+class BatchExportTarget(BaseModel):
+    project_id: str
+    # Default to the project's own export settings
+    resolution: Optional[str] = Field(default=None, pattern="^(1080p|2K|4K|8K)$")
+    format: Optional[str] = Field(default=None, pattern="^(png|jpg|webp|avif)$")
+
+class BatchExportRequest(BaseModel):
+    targets: List[BatchExportTarget] = Field(min_length=1)
+
+class BatchExportItem(BaseModel):
+    project_id: str
+    resolution: Optional[str] = None
+    format: Optional[str] = None
+    result: Optional[ExportResponse] = None
+    error: Optional[str] = None
+
+class BatchExportResponse(BaseModel):
+    items: List[BatchExportItem]  # in the order of the requested targets
+    message: str
@@ -0,0 +1,185 @@
+import hashlib
+import json
+import os
+import time
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+from file_utils import FileManager, RENDER_DIR
+from render_utils import RENDERER_VERSION
+
+class RenderCache:
+    """Content-addressed on-disk cache of encoded banner renders.
+
+    Keys are a hash of everything that affects the output pixels, so a stale
+    entry can never be served: changing a project or an image simply produces
+    a new key. Invalidation only reclaims disk space early; the size budget is
+    enforced with LRU eviction based on last access (kept in the file's atime).
+    """
+    MAX_BYTES = int(os.environ.get('RENDER_CACHE_MAX_MB', 512)) * 1024 * 1024
+
+    # filename -> {'size': int, 'project_ids': set, 'image_ids': set}, oldest first
+    _entries: "OrderedDict[str, dict]" = OrderedDict()
+    _total_bytes = 0
+    _loaded = False
+
+    @staticmethod
+    def is_enabled() -> bool:
+        """Whether renders should be cached at all"""
+        return RenderCache.MAX_BYTES > 0
+
+    @staticmethod
+    def build_key(project, image_hashes: List[Tuple[str, Optional[str]]], width: int, height: int) -> str:
+        """Hash all render inputs of a project into a cache key"""
+        payload = {
+            'renderer_version': RENDERER_VERSION,
+            'images': [[image_id, content_hash] for image_id, content_hash in image_hashes],
+            'grid_size': project.grid_size.dict(),
+            'background_color': project.background_color,
+            'text_overlays': [overlay.dict(exclude={'id'}) for overlay in project.text_overlays],
+            'export_settings': project.export_settings.dict(),
+            'dimensions': [width, height],
+        }
+        encoded = json.dumps(payload, sort_keys=True, default=str).encode('utf-8')
+        return hashlib.sha256(encoded).hexdigest()
+
+    @staticmethod
+    def get_filename(key: str, file_format: str) -> str:
+        """Get the cache filename for a key"""
+        return f"render_{key}.{file_format}"
+
+    @staticmethod
+    def get(key: str, file_format: str) -> Optional[Path]:
+        """Get the cached render for a key, marking it as recently used"""
+        RenderCache._load_index()
+        filename = RenderCache.get_filename(key, file_format)
+        file_path = RENDER_DIR / filename
+        if not file_path.exists():
+            # Evicted by another worker process
+            RenderCache._forget(filename)
+            return None
+
+        if filename not in RenderCache._entries:
+            # Rendered by another worker process; keys are content-addressed, so it's safe to serve
+            if not RenderCache._adopt(filename, file_path):
+                return None
+            RenderCache._evict(keep=filename)
+        RenderCache._entries.move_to_end(filename)
+        try:
+            # Record the access in atime only, so Last-Modified stays stable
+            os.utime(file_path, (time.time(), file_path.stat().st_mtime))
+        except OSError:
+            pass
+        return file_path
+
+    @staticmethod
+    def get_temp_path(key: str, file_format: str) -> Path:
+        """Get a unique path to render into before the result is committed"""
+        return RENDER_DIR / f".{RenderCache.get_filename(key, file_format)}.{uuid.uuid4().hex}.tmp"
+
+    @staticmethod
+    def put(key: str, file_format: str, temp_path: Path, project_id: str, image_ids: Iterable[str]) -> Path:
+        """Atomically move a finished render into the cache"""
+        RenderCache._load_index()
+        filename = RenderCache.get_filename(key, file_format)
+        file_path = RENDER_DIR / filename
+        os.replace(temp_path, file_path)
+
+        entry = RenderCache._entries.get(filename)
+        if entry is None:
+            entry = {'size': 0, 'project_ids': set(), 'image_ids': set()}
+            RenderCache._entries[filename] = entry
+        RenderCache._total_bytes -= entry['size']
+        entry['size'] = file_path.stat().st_size
+        entry['project_ids'].add(project_id)
+        entry['image_ids'].update(image_ids)
+        RenderCache._total_bytes += entry['size']
+        RenderCache._entries.move_to_end(filename)
+
+        RenderCache._evict(keep=filename)
+        return file_path
+
+    @staticmethod
+    def invalidate_project(project_id: str) -> int:
+        """Drop cached renders produced for a project"""
+        return RenderCache._invalidate(lambda entry: project_id in entry['project_ids'])
+
+    @staticmethod
+    def invalidate_image(image_id: str) -> int:
+        """Drop cached renders that contain an image"""
+        return RenderCache._invalidate(lambda entry: image_id in entry['image_ids'])
+
+    @staticmethod
+    def get_stats() -> dict:
+        """Get cache occupancy"""
+        RenderCache._load_index()
+        return {
+            'entries': len(RenderCache._entries),
+            'total_bytes': RenderCache._total_bytes,
+            'max_bytes': RenderCache.MAX_BYTES,
+        }
+
+    @staticmethod
+    def _invalidate(predicate) -> int:
+        RenderCache._load_index()
+        filenames = [name for name, entry in RenderCache._entries.items() if predicate(entry)]
+        for filename in filenames:
+            RenderCache._remove(filename)
+        return len(filenames)
+
+    @staticmethod
+    def _load_index():
+        """Rebuild the LRU index from disk once per process"""
+        if RenderCache._loaded:
+            return
+        RenderCache._loaded = True
+
+        files = []
+        for file_path in RENDER_DIR.glob("render_*"):
+            try:
+                stat = file_path.stat()
+            except OSError:
+                continue
+            files.append((max(stat.st_atime, stat.st_mtime), file_path.name, stat.st_size))
+
+        for _, filename, size in sorted(files):
+            RenderCache._entries[filename] = {'size': size, 'project_ids': set(), 'image_ids': set()}
+            RenderCache._total_bytes += size
+
+        RenderCache._evict()
+
+    @staticmethod
+    def _adopt(filename: str, file_path: Path) -> bool:
+        """Add a render found on disk to this process's index"""
+        try:
+            size = file_path.stat().st_size
+        except OSError:
+            return False
+        RenderCache._entries[filename] = {'size': size, 'project_ids': set(), 'image_ids': set()}
+        RenderCache._total_bytes += size
+        return True
+
+    @staticmethod
+    def _evict(keep: Optional[str] = None):
+        """Remove least recently used renders until the cache fits its budget"""
+        for filename in list(RenderCache._entries.keys()):
+            if RenderCache._total_bytes <= RenderCache.MAX_BYTES:
+                break
+            if filename != keep:
+                RenderCache._remove(filename)
+
+    @staticmethod
+    def _remove(filename: str):
+        RenderCache._forget(filename)
+        FileManager.forget_file_metadata(filename, RENDER_DIR / filename)
+        try:
+            os.remove(RENDER_DIR / filename)
+        except OSError:
+            pass
+
+    @staticmethod
+    def _forget(filename: str):
+        entry = RenderCache._entries.pop(filename, None)
+        if entry is not None:
+            RenderCache._total_bytes -= entry['size']
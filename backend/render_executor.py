@@ -0,0 +1,174 @@
+import asyncio
+import functools
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Optional
+
+class RenderQueueFull(Exception):
+    """Raised when the render queue has no free slots"""
+    pass
+
+class RenderExecutor:
+    """Bounded worker pool for blocking banner renders.
+
+    At most ``MAX_WORKERS`` renders run at once and at most ``MAX_QUEUE`` more
+    wait for a worker. Anything beyond that is rejected with ``RenderQueueFull``
+    so the API can answer 503 instead of piling work onto the event loop.
+    """
+    EXECUTOR_TYPE = os.environ.get('RENDER_EXECUTOR', 'thread')  # "thread" or "process"
+    MAX_WORKERS = int(os.environ.get('RENDER_MAX_WORKERS', min(4, os.cpu_count() or 1)))
+    MAX_QUEUE = int(os.environ.get('RENDER_MAX_QUEUE', 8))
+    RETRY_AFTER_SECONDS = int(os.environ.get('RENDER_RETRY_AFTER', 5))
+    # Longest a bundle or batch archive render waits for room before giving up
+    MAX_WAIT_SECONDS = int(os.environ.get('RENDER_MAX_WAIT', 300))
+
+    _executor: Optional[Executor] = None
+    _semaphore: Optional[asyncio.Semaphore] = None
+    _pending = 0
+
+    @staticmethod
+    def get_executor() -> Executor:
+        """Get the shared executor, creating it on first use"""
+        if RenderExecutor._executor is None:
+            if RenderExecutor.EXECUTOR_TYPE == 'process':
+                RenderExecutor._executor = ProcessPoolExecutor(max_workers=RenderExecutor.MAX_WORKERS)
+            else:
+                RenderExecutor._executor = ThreadPoolExecutor(
+                    max_workers=RenderExecutor.MAX_WORKERS,
+                    thread_name_prefix='render'
+                )
+        return RenderExecutor._executor
+
+    @staticmethod
+    async def run(func: Callable, *args: Any) -> Any:
+        """Run a blocking render function on the pool, waiting for a free worker.
+
+        A render that has started keeps its worker and queue slot until it
+        finishes, even if the caller is cancelled (say, the client went away),
+        so abandoned renders still count against the limits.
+        """
+        if RenderExecutor._pending >= RenderExecutor.MAX_WORKERS + RenderExecutor.MAX_QUEUE:
+            raise RenderQueueFull(
+                f"Render queue is full ({RenderExecutor._pending} renders pending)"
+            )
+
+        if RenderExecutor._semaphore is None:
+            RenderExecutor._semaphore = asyncio.Semaphore(RenderExecutor.MAX_WORKERS)
+        semaphore = RenderExecutor._semaphore
+
+        RenderExecutor._pending += 1
+        try:
+            await semaphore.acquire()
+        except BaseException:
+            # Cancelled while still queued; nothing is running yet
+            RenderExecutor._pending -= 1
+            raise
+
+        def release(_future):
+            semaphore.release()
+            RenderExecutor._pending -= 1
+
+        try:
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(RenderExecutor.get_executor(), functools.partial(func, *args))
+        except BaseException:
+            release(None)
+            raise
+        future.add_done_callback(release)
+        # Cancelling the caller must not cancel the future, which would release the slot early
+        return await asyncio.shield(future)
+
+    @staticmethod
+    def shares_memory() -> bool:
+        """Whether renders run in this process and see its in-memory caches"""
+        return RenderExecutor.EXECUTOR_TYPE != 'process'
+
+    @staticmethod
+    def supports_streaming() -> bool:
+        """Whether renders can write into a ``RenderStream`` (it can't be sent to another process)"""
+        return RenderExecutor.shares_memory()
+
+    @staticmethod
+    def get_stats() -> dict:
+        """Get current pool occupancy"""
+        return {
+            'executor': RenderExecutor.EXECUTOR_TYPE,
+            'max_workers': RenderExecutor.MAX_WORKERS,
+            'max_queue': RenderExecutor.MAX_QUEUE,
+            'pending': RenderExecutor._pending,
+        }
+
+    @staticmethod
+    def shutdown():
+        """Shut down the worker pool"""
+        if RenderExecutor._executor is not None:
+            RenderExecutor._executor.shutdown(wait=False, cancel_futures=True)
+            RenderExecutor._executor = None
+        RenderExecutor._semaphore = None
+
+class RenderStream:
+    """Writable file object that hands encoder output from a render thread to the event loop.
+
+    The encoder writes into ``path`` at full speed on a worker thread and
+    never waits for the client, so a slow download doesn't hold a render
+    worker. The response follows the file as it grows, reading back what has
+    been written so far and waiting for the writer when it catches up. When
+    the render finishes, the file is complete and can be moved into the
+    render cache; the reader keeps its own handle, so that doesn't disturb a
+    download still in progress.
+    """
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, path: Path):
+        self._loop = loop
+        self._file = open(path, 'wb')
+        self._reader = open(path, 'rb', buffering=0)
+        self._unflushed = 0
+        self._written = asyncio.Event()
+
+    def write(self, data) -> int:
+        """Called from the render thread"""
+        self._file.write(data)
+        self._unflushed += len(data)
+        if self._unflushed >= RenderStream.CHUNK_SIZE:
+            self.flush()
+        return len(data)
+
+    def flush(self):
+        """Called from the render thread; makes everything written so far readable"""
+        self._file.flush()
+        self._unflushed = 0
+        self._loop.call_soon_threadsafe(self._written.set)
+
+    async def iter_chunks(self, render: "asyncio.Future") -> AsyncIterator[bytes]:
+        """Yield the file's content as it is written until ``render`` finishes, re-raising its error"""
+        while True:
+            # Cleared before reading, so a flush after the read isn't missed
+            self._written.clear()
+            chunk = await asyncio.to_thread(self._reader.read, RenderStream.CHUNK_SIZE)
+            if chunk:
+                yield chunk
+                continue
+
+            if render.done():
+                # The last flush happened before the render returned; read what's left
+                while True:
+                    chunk = await asyncio.to_thread(self._reader.read, RenderStream.CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    yield chunk
+                render.result()
+                return
+
+            written = asyncio.ensure_future(self._written.wait())
+            await asyncio.wait({written, render}, return_when=asyncio.FIRST_COMPLETED)
+            written.cancel()
+
+    def detach(self):
+        """Stop reading; the render carries on into the file"""
+        self._reader.close()
+
+    def close_writer(self):
+        """Close the file once the render has finished"""
+        self._file.close()
@@ -0,0 +1,601 @@
+import io
+import os
+import struct
+import time
+import zlib
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple, Union
+from PIL import Image, ImageChops
+from font_utils import FontManager
+from tile_cache import TileCache
+
+# AVIF needs Pillow built with libavif, or the pillow-avif-plugin package on older Pillow
+try:
+    import pillow_avif  # noqa: F401 - registers the AVIF codec with Pillow
+except ImportError:
+    pass
+
+Image.init()
+HAS_WEBP = "WEBP" in Image.SAVE
+HAS_AVIF = "AVIF" in Image.SAVE
+
+# Bump whenever a change to compositing or encoding alters rendered output,
+# so cached renders and tiles from older code are no longer served
+RENDERER_VERSION = 1
+
+# Output resolutions for each export preset
+RESOLUTION_MAP = {
+    "1080p": (1920, 1080),
+    "2K": (2048, 2048),
+    "4K": (4096, 4096),
+    "8K": (8192, 8192)
+}
+
+FORMAT_MEDIA_TYPES = {
+    "jpg": "image/jpeg",
+    "png": "image/png",
+    "webp": "image/webp",
+    "avif": "image/avif"
+}
+
+# Formats whose quality setting trades size for fidelity, so they can aim for a target size
+LOSSY_FORMATS = ("jpg", "webp", "avif")
+
+# Encoder options for each export profile, per format
+# WebP "method" and AVIF "speed" trade encode time for size (higher method, lower speed is smaller)
+ENCODER_PROFILES = {
+    "fast": {
+        "png": {"compress_level": 1},
+        "jpg": {"optimize": False},
+        "webp": {"method": 0},
+        "avif": {"speed": 10},
+    },
+    "balanced": {
+        "png": {"compress_level": 6},
+        "jpg": {"optimize": True},
+        "webp": {"method": 4},
+        "avif": {"speed": 8},
+    },
+    "smallest": {
+        # Palette PNG when the banner has few enough colors to convert losslessly
+        "png": {"compress_level": 9, "optimize": True, "quantize": True},
+        "jpg": {"optimize": True, "progressive": True},
+        "webp": {"method": 6},
+        "avif": {"speed": 4},
+    },
+    "progressive": {
+        # Pillow can't write interlaced PNGs, and WebP/AVIF have no progressive mode
+        "png": {"compress_level": 6},
+        "jpg": {"optimize": True, "progressive": True},
+        "webp": {"method": 4},
+        "avif": {"speed": 8},
+    },
+}
+
+class PNGStreamWriter:
+    """Incremental encoder for 8-bit RGB PNGs delivered in horizontal stripes.
+
+    Each scanline uses the PNG "Up" filter, computed for a whole stripe at
+    once with ``ImageChops.subtract_modulo``, and the filtered rows are fed
+    through one zlib stream that is flushed out as IDAT chunks as it grows.
+    """
+    SIGNATURE = b'\x89PNG\r\n\x1a\n'
+    FILTER_UP = b'\x02'
+
+    def __init__(self, fileobj: BinaryIO, width: int, height: int, compress_level: int = 6):
+        self.fileobj = fileobj
+        self.width = width
+        self.height = height
+        self.rows_written = 0
+        self._compressor = zlib.compressobj(compress_level)
+        # The row above the first scanline counts as all zeros
+        self._previous_row = Image.new('RGB', (width, 1))
+
+        fileobj.write(self.SIGNATURE)
+        # Bit depth 8, color type 2 (RGB), default compression, filtering and no interlace
+        self._write_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+
+    def write_stripe(self, stripe: Image.Image) -> None:
+        """Filter, compress and write the next rows of the image"""
+        if stripe.mode != 'RGB':
+            stripe = stripe.convert('RGB')
+        rows = stripe.height
+
+        # Each row minus the row above it, modulo 256
+        above = Image.new('RGB', stripe.size)
+        above.paste(self._previous_row, (0, 0))
+        if rows > 1:
+            above.paste(stripe.crop((0, 0, self.width, rows - 1)), (0, 1))
+        filtered = ImageChops.subtract_modulo(stripe, above).tobytes()
+        self._previous_row = stripe.crop((0, rows - 1, self.width, rows))
+
+        stride = self.width * 3
+        scanlines = b''.join(
+            self.FILTER_UP + filtered[offset:offset + stride]
+            for offset in range(0, rows * stride, stride)
+        )
+        self._write_idat(self._compressor.compress(scanlines))
+        self.rows_written += rows
+
+    def close(self) -> None:
+        """Flush the compressed stream and finish the file"""
+        if self.rows_written != self.height:
+            raise ValueError(f"PNG expects {self.height} rows, got {self.rows_written}")
+        self._write_idat(self._compressor.flush())
+        self._write_chunk(b'IEND', b'')
+
+    def _write_idat(self, data: bytes) -> None:
+        if data:
+            self._write_chunk(b'IDAT', data)
+
+    def _write_chunk(self, chunk_type: bytes, data: bytes) -> None:
+        self.fileobj.write(struct.pack('>I', len(data)))
+        self.fileobj.write(chunk_type)
+        self.fileobj.write(data)
+        self.fileobj.write(struct.pack('>I', zlib.crc32(data, zlib.crc32(chunk_type))))
+
+class BannerRenderer:
+    """Synchronous banner compositing.
+
+    Everything in here is CPU bound and blocking, so it must only be called
+    through ``RenderExecutor`` from request handlers. The functions take plain,
+    picklable arguments so they can run in either a thread or a process pool.
+    """
+    # Decode JPEGs at a reduced DCT scale and box-reduce before the final resample
+    USE_REDUCED_DECODE = os.environ.get('RENDER_REDUCED_DECODE', '1') != '0'
+    # Keep at least this multiple of the target size for the final LANCZOS pass
+    REDUCING_GAP = 2
+    # Canvas rows composited and encoded at a time
+    STRIPE_HEIGHT = int(os.environ.get('RENDER_STRIPE_HEIGHT', 256))
+    # Lowest quality the target size search may go down to
+    MIN_TARGET_QUALITY = 10
+    # Bounds on the target size search, which encodes the whole banner once per step
+    TARGET_SIZE_MAX_ENCODES = int(os.environ.get('TARGET_SIZE_MAX_ENCODES', 8))
+    TARGET_SIZE_MAX_SECONDS = float(os.environ.get('TARGET_SIZE_MAX_SECONDS', 20))
+
+    @staticmethod
+    def get_dimensions(resolution: str) -> tuple:
+        """Get output width and height for a resolution preset"""
+        return RESOLUTION_MAP.get(resolution, (2048, 2048))
+
+    @staticmethod
+    def select_source_path(image_source: dict, target_width: int, target_height: int) -> str:
+        """Pick the smallest stored variant that still covers the target size"""
+        for variant in image_source.get('variants', []):
+            if variant['width'] >= target_width and variant['height'] >= target_height:
+                return variant['path']
+        return image_source['path']
+
+    @staticmethod
+    def open_scaled(file_path: str, target_width: int, target_height: int) -> Image.Image:
+        """Open an image, decoding no more pixels than the target size needs"""
+        img = Image.open(file_path)
+        if BannerRenderer.USE_REDUCED_DECODE and img.format == 'JPEG':
+            # libjpeg scales by 1/2, 1/4 or 1/8 while decoding, never below the requested size
+            img.draft(None, (target_width * BannerRenderer.REDUCING_GAP, target_height * BannerRenderer.REDUCING_GAP))
+
+        if img.mode in ('P', 'PA'):
+            # Palette images can only be resized with NEAREST and can't serve as their own paste mask
+            has_alpha = img.mode == 'PA' or 'transparency' in img.info
+            img = img.convert('RGBA' if has_alpha else 'RGB')
+
+        return BannerRenderer.reduce_for(img, target_width, target_height)
+
+    @staticmethod
+    def reduce_for(img: Image.Image, target_width: int, target_height: int) -> Image.Image:
+        """Box-reduce a decoded image while it stays above the final resample's input size"""
+        if not BannerRenderer.USE_REDUCED_DECODE:
+            return img
+
+        factor = min(img.width // (target_width * BannerRenderer.REDUCING_GAP),
+                     img.height // (target_height * BannerRenderer.REDUCING_GAP))
+        if factor >= 2 and img.mode not in ('P', '1'):
+            img = img.reduce(factor)
+
+        return img
+
+    @staticmethod
+    def get_tile_key(image_source: dict, cell_width: int, cell_height: int) -> Optional[str]:
+        """Get the tile cache key of a source fitted into a cell, or None if it can't be cached"""
+        if not image_source.get('content_hash') or not TileCache.is_enabled():
+            return None
+        resample = "lanczos-reduced" if BannerRenderer.USE_REDUCED_DECODE else "lanczos"
+        return TileCache.build_key(image_source['content_hash'], cell_width, cell_height, resample, RENDERER_VERSION)
+
+    @staticmethod
+    def load_cell(image_source: dict, cell_width: int, cell_height: int) -> Image.Image:
+        """Decode one grid image and resize it to fit its cell, keeping the aspect ratio"""
+        tile_key = BannerRenderer.get_tile_key(image_source, cell_width, cell_height)
+        if tile_key:
+            tile = TileCache.get(tile_key)
+            if tile is not None:
+                return tile
+
+        tile = BannerRenderer.fit_to_cell(image_source, cell_width, cell_height)
+        if tile_key:
+            TileCache.put(tile_key, tile)
+        return tile
+
+    @staticmethod
+    def get_fit_size(image_source: dict, cell_width: int, cell_height: int) -> Tuple[int, int]:
+        """Get the size of an image fitted into a cell"""
+        if image_source.get('width') and image_source.get('height'):
+            img_width, img_height = image_source['width'], image_source['height']
+        else:
+            with Image.open(image_source['path']) as original:
+                img_width, img_height = original.size
+
+        # Resize to fit cell while maintaining aspect ratio
+        img_ratio = img_width / img_height
+        cell_ratio = cell_width / cell_height
+
+        if img_ratio > cell_ratio:
+            # Image is wider, fit to width
+            return cell_width, int(cell_width / img_ratio)
+        # Image is taller, fit to height
+        return int(cell_height * img_ratio), cell_height
+
+    @staticmethod
+    def fit_to_cell(image_source: dict, cell_width: int, cell_height: int) -> Image.Image:
+        """Decode and resize an image to fit a cell"""
+        new_width, new_height = BannerRenderer.get_fit_size(image_source, cell_width, cell_height)
+
+        file_path = BannerRenderer.select_source_path(image_source, new_width, new_height)
+        img = BannerRenderer.open_scaled(file_path, new_width, new_height)
+
+        return img.resize((new_width, new_height), Image.Resampling.LANCZOS)
+
+    @staticmethod
+    def prepare_tiles(image_source: dict, cell_sizes: List[Tuple[int, int]]) -> int:
+        """Fill the tile cache with one source fitted into several cell sizes, decoding it once.
+
+        The source is decoded for the largest missing tile and every smaller
+        tile is resampled from that decode. Returns the number of tiles added.
+        """
+        missing = []
+        for cell_width, cell_height in set(cell_sizes):
+            tile_key = BannerRenderer.get_tile_key(image_source, cell_width, cell_height)
+            if tile_key and not TileCache.contains(tile_key):
+                missing.append((BannerRenderer.get_fit_size(image_source, cell_width, cell_height), tile_key))
+        if not missing:
+            return 0
+
+        missing.sort(reverse=True)
+        largest_width, largest_height = missing[0][0]
+        file_path = BannerRenderer.select_source_path(image_source, largest_width, largest_height)
+        with BannerRenderer.open_scaled(file_path, largest_width, largest_height) as decoded:
+            decoded.load()
+            for (tile_width, tile_height), tile_key in missing:
+                img = BannerRenderer.reduce_for(decoded, tile_width, tile_height)
+                TileCache.put(tile_key, img.resize((tile_width, tile_height), Image.Resampling.LANCZOS))
+        return len(missing)
+
+    @staticmethod
+    def iter_stripes(project, width: int, height: int, image_sources: List[Optional[dict]]) -> Iterator[Tuple[int, Image.Image]]:
+        """Composite the banner top to bottom, yielding ``(top, stripe)`` bands.
+
+        Only the cells of the grid rows a stripe crosses are kept decoded, so
+        peak memory is one grid row of cells plus one stripe instead of the
+        full canvas. Sources are dicts with the original ``path``, its
+        ``content_hash``, ``width`` and ``height`` when known, and
+        ``variants`` (dicts with ``width``, ``height`` and ``path``) ordered
+        smallest first.
+        """
+        try:
+            # Create base image with background color
+            if project.background_color.startswith('#'):
+                bg_color = project.background_color
+            else:
+                bg_color = '#ffffff'
+
+            # Calculate grid layout
+            rows = project.grid_size.rows
+            cols = project.grid_size.cols
+            cell_width = width // cols
+            cell_height = height // rows
+            image_sources = image_sources[:rows * cols]
+
+            # Grid row -> [(paste_x, paste_y, image)] for rows crossed by the current stripe
+            loaded_rows = {}
+            text_overlays = BannerRenderer.prepare_text_overlays(project, width, height)
+
+            for top in range(0, height, BannerRenderer.STRIPE_HEIGHT):
+                bottom = min(top + BannerRenderer.STRIPE_HEIGHT, height)
+                stripe = Image.new('RGB', (width, bottom - top), bg_color)
+
+                first_row = top // cell_height
+                last_row = min((bottom - 1) // cell_height, rows - 1)
+                for row in list(loaded_rows):
+                    if row < first_row:
+                        del loaded_rows[row]
+
+                # Place images
+                for row in range(first_row, last_row + 1):
+                    if row not in loaded_rows:
+                        loaded_rows[row] = BannerRenderer.load_row(image_sources, row, cols, cell_width, cell_height)
+                    for placement in list(loaded_rows[row]):
+                        paste_x, paste_y, img = placement
+                        try:
+                            # Handle transparency
+                            if img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info):
+                                stripe.paste(img, (paste_x, paste_y - top), img)
+                            else:
+                                stripe.paste(img, (paste_x, paste_y - top))
+                        except Exception as e:
+                            print(f"Error placing image in grid row {row}: {e}")
+                            loaded_rows[row].remove(placement)
+
+                # Add text overlays that reach into this stripe
+                for text_x, text_y, mask, text_color in text_overlays:
+                    if text_y < bottom and text_y + mask.height > top:
+                        stripe.paste(text_color, (text_x, text_y - top), mask)
+
+                yield top, stripe
+
+        except Exception as e:
+            raise Exception(f"Error creating banner image: {str(e)}")
+
+    @staticmethod
+    def load_row(image_sources: List[Optional[dict]], row: int, cols: int, cell_width: int, cell_height: int) -> list:
+        """Load and position the cell images of one grid row"""
+        placed = []
+        for col in range(cols):
+            i = row * cols + col
+            image_source = image_sources[i] if i < len(image_sources) else None
+            if not image_source:
+                continue
+
+            try:
+                img = BannerRenderer.load_cell(image_source, cell_width, cell_height)
+            except Exception as e:
+                print(f"Error processing image {image_source['path']}: {e}")
+                continue
+
+            # Center image in cell
+            paste_x = col * cell_width + (cell_width - img.width) // 2
+            paste_y = row * cell_height + (cell_height - img.height) // 2
+            placed.append((paste_x, paste_y, img))
+        return placed
+
+    @staticmethod
+    def prepare_text_overlays(project, width: int, height: int) -> List[Tuple[int, int, Image.Image, str]]:
+        """Rasterize the project's text overlays once per render as ``(x, y, mask, color)``"""
+        prepared = []
+        for overlay in project.text_overlays:
+            try:
+                # Scale text position and size relative to canvas size
+                scale_x = width / 800  # Assuming original canvas was 800px wide
+                scale_y = height / 800  # Assuming original canvas was 800px high
+
+                x = int(overlay.position.x * scale_x)
+                y = int(overlay.position.y * scale_y)
+                font_size = int(overlay.style.font_size * min(scale_x, scale_y))
+
+                text_color = overlay.style.color
+                if not text_color.startswith('#'):
+                    continue
+
+                style = overlay.style
+                mask, offset_x, offset_y = FontManager.render_text_mask(
+                    overlay.text, style.font_family, style.font_weight, style.font_style, font_size
+                )
+                prepared.append((x + offset_x, y + offset_y, mask, text_color))
+
+            except Exception as e:
+                print(f"Error adding text overlay: {e}")
+                continue
+        return prepared
+
+    @staticmethod
+    def create_banner(project, width: int, height: int, image_sources: List[Optional[dict]]) -> Image.Image:
+        """Create the full banner image from project data and resolved image sources"""
+        banner = Image.new('RGB', (width, height))
+        for top, stripe in BannerRenderer.iter_stripes(project, width, height, image_sources):
+            banner.paste(stripe, (0, top))
+        return banner
+
+    @staticmethod
+    def is_format_supported(file_format: str) -> bool:
+        """Whether this Pillow build can encode an export format"""
+        if file_format == "webp":
+            return HAS_WEBP
+        if file_format == "avif":
+            return HAS_AVIF
+        return file_format in FORMAT_MEDIA_TYPES
+
+    @staticmethod
+    def get_encoder_options(export_settings) -> dict:
+        """Get the encoder options of the export settings' profile"""
+        profile = ENCODER_PROFILES.get(export_settings.profile, ENCODER_PROFILES["balanced"])
+        return profile.get(export_settings.format, profile["png"])
+
+    @staticmethod
+    def save_banner(banner: Image.Image, target: Union[str, Path, BinaryIO], export_settings) -> None:
+        """Encode banner with the format, quality and profile from export settings"""
+        options = BannerRenderer.get_encoder_options(export_settings)
+        if export_settings.target_size_kb and export_settings.format in LOSSY_FORMATS:
+            data = BannerRenderer.encode_to_target_size(banner, export_settings, options)
+            if isinstance(target, (str, Path)):
+                Path(target).write_bytes(data)
+            else:
+                target.write(data)
+            return
+
+        BannerRenderer.encode(banner, target, export_settings.format, export_settings.quality, options)
+
+    @staticmethod
+    def encode(banner: Image.Image, target: Union[str, Path, BinaryIO], file_format: str, quality: int, options: dict) -> None:
+        """Encode banner in one format at one quality"""
+        if file_format == "jpg":
+            banner.save(target, "JPEG", quality=quality,
+                        optimize=options.get("optimize", False), progressive=options.get("progressive", False))
+        elif file_format == "webp":
+            banner.save(target, "WEBP", quality=quality, method=options["method"])
+        elif file_format == "avif":
+            banner.save(target, "AVIF", quality=quality, speed=options["speed"])
+        else:
+            if options.get("quantize"):
+                banner = BannerRenderer.to_lossless_palette(banner)
+            banner.save(target, "PNG", compress_level=options["compress_level"], optimize=options.get("optimize", False))
+
+    @staticmethod
+    def encode_to_target_size(banner: Image.Image, export_settings, options: dict) -> bytes:
+        """Find the highest quality up to the configured one whose encoding fits the byte budget.
+
+        The search encodes with the "fast" profile's options, which take a
+        fraction of the time of the slower profiles and usually produce larger
+        files at the same quality, so the quality it settles on errs low. Only
+        that quality is then encoded with the profile's own options, keeping
+        the fast encoding if that one comes out over budget; a target size
+        therefore costs one regular encode plus a few fast ones. The search
+        stops after ``TARGET_SIZE_MAX_ENCODES`` encodes or
+        ``TARGET_SIZE_MAX_SECONDS``, whichever comes first, and uses the best
+        quality found by then. If nothing fits, the lowest quality is used.
+        """
+        file_format = export_settings.format
+        budget = export_settings.target_size_kb * 1024
+        search_options = ENCODER_PROFILES["fast"][file_format]
+
+        def encode_at(quality: int, encoder_options: dict) -> bytes:
+            buffer = io.BytesIO()
+            BannerRenderer.encode(banner, buffer, file_format, quality, encoder_options)
+            return buffer.getvalue()
+
+        # Most budgets are generous, so try the configured quality first
+        best_quality, best_data = BannerRenderer.MIN_TARGET_QUALITY, None
+        data = encode_at(export_settings.quality, search_options)
+        if len(data) <= budget:
+            best_quality, best_data = export_settings.quality, data
+        else:
+            deadline = time.perf_counter() + BannerRenderer.TARGET_SIZE_MAX_SECONDS
+            low, high = BannerRenderer.MIN_TARGET_QUALITY, export_settings.quality - 1
+            encodes = 1
+            while low <= high and encodes < BannerRenderer.TARGET_SIZE_MAX_ENCODES and time.perf_counter() < deadline:
+                quality = (low + high) // 2
+                data = encode_at(quality, search_options)
+                encodes += 1
+                if len(data) <= budget:
+                    best_quality, best_data = quality, data
+                    low = quality + 1
+                else:
+                    high = quality - 1
+
+        if best_data is not None and options == search_options:
+            return best_data
+        data = encode_at(best_quality, options)
+        if best_data is not None and len(data) > budget:
+            return best_data
+        return data
+
+    @staticmethod
+    def to_lossless_palette(banner: Image.Image) -> Image.Image:
+        """Convert to a palette image if that loses nothing, otherwise return the image unchanged"""
+        colors = banner.getcolors(256) if banner.mode == 'RGB' else None
+        if colors is None:
+            return banner
+
+        # quantize() matches colors at reduced precision and merges near neighbours, so the
+        # indexes are looked up exactly instead: first (red, green) -> pair code, then
+        # (pair code, blue) -> palette index, each through a 16-bit lookup table
+        red, green, blue = banner.split()
+        pair_codes = {}
+        pair_lut = [0] * 65536
+        index_lut = [0] * 65536
+        palette = []
+        for index, (_, (r, g, b)) in enumerate(colors):
+            pair_code = pair_codes.setdefault((r, g), len(pair_codes))
+            pair_lut[r + g * 256] = pair_code
+            index_lut[pair_code + b * 256] = index
+            palette += [r, g, b]
+
+        pairs = BannerRenderer.pack_bands(red, green).point(pair_lut, 'L')
+        palette_image = BannerRenderer.pack_bands(pairs, blue).point(index_lut, 'L')
+        palette_image.putpalette(palette)
+        return palette_image
+
+    @staticmethod
+    def pack_bands(low: Image.Image, high: Image.Image) -> Image.Image:
+        """Combine two L bands into one I image holding ``low + high * 256``"""
+        return Image.frombytes('I', low.size, Image.merge('LA', (low, high)).tobytes(), 'raw', 'I;16')
+
+    @staticmethod
+    def render_to_stream(project, width: int, height: int, image_sources: List[Optional[dict]], target: BinaryIO) -> dict:
+        """Render and encode banner into a writable file object, returning encoder metrics"""
+        export_settings = project.export_settings
+        options = BannerRenderer.get_encoder_options(export_settings)
+        output = CountingWriter(target)
+        encode_seconds = 0.0
+
+        if export_settings.format == "png" and not options.get("quantize"):
+            # PNG is encoded stripe by stripe without ever holding the full canvas
+            writer = PNGStreamWriter(output, width, height, options["compress_level"])
+            for _, stripe in BannerRenderer.iter_stripes(project, width, height, image_sources):
+                start = time.perf_counter()
+                writer.write_stripe(stripe)
+                encode_seconds += time.perf_counter() - start
+            start = time.perf_counter()
+            writer.close()
+            encode_seconds += time.perf_counter() - start
+        else:
+            # Pillow's JPEG/WebP/AVIF encoders and palette conversion need the whole image
+            banner = BannerRenderer.create_banner(project, width, height, image_sources)
+            start = time.perf_counter()
+            BannerRenderer.save_banner(banner, output, export_settings)
+            encode_seconds = time.perf_counter() - start
+        target.flush()
+
+        return {
+            'format': export_settings.format,
+            'profile': export_settings.profile,
+            'encode_ms': encode_seconds * 1000,
+            'bytes': output.bytes_written,
+        }
+
+    @staticmethod
+    def render_to_file(project, width: int, height: int, image_sources: List[Optional[dict]], target: str) -> dict:
+        """Render and encode banner to a file, returning encoder metrics"""
+        with open(target, 'wb') as f:
+            return BannerRenderer.render_to_stream(project, width, height, image_sources, f)
+
+class CountingWriter:
+    """Write-through wrapper that counts the bytes written"""
+
+    def __init__(self, target: BinaryIO):
+        self.target = target
+        self.bytes_written = 0
+
+    def write(self, data) -> int:
+        self.bytes_written += len(data)
+        return self.target.write(data)
+
+    def flush(self):
+        self.target.flush()
+
+class EncoderMetrics:
+    """Encode time and output size per format and profile, for this process"""
+    _totals: Dict[str, dict] = {}
+
+    @staticmethod
+    def record(metrics: dict):
+        """Add the metrics returned by one render"""
+        key = f"{metrics['format']}/{metrics['profile']}"
+        totals = EncoderMetrics._totals.setdefault(
+            key, {'count': 0, 'encode_ms_total': 0.0, 'encode_ms_max': 0.0, 'bytes_total': 0}
+        )
+        totals['count'] += 1
+        totals['encode_ms_total'] += metrics['encode_ms']
+        totals['encode_ms_max'] = max(totals['encode_ms_max'], metrics['encode_ms'])
+        totals['bytes_total'] += metrics['bytes']
+
+    @staticmethod
+    def get_stats() -> dict:
+        """Get average and worst encode time and average output size per format and profile"""
+        return {
+            key: {
+                'count': totals['count'],
+                'avg_encode_ms': round(totals['encode_ms_total'] / totals['count'], 1),
+                'max_encode_ms': round(totals['encode_ms_max'], 1),
+                'avg_bytes': totals['bytes_total'] // totals['count'],
+            }
+            for key, totals in sorted(EncoderMetrics._totals.items())
+        }
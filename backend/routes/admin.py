@@ -0,0 +1,47 @@
+import os
+import secrets
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException
+from database import DatabaseManager
+from render_executor import RenderExecutor
+from render_cache import RenderCache
+from render_utils import EncoderMetrics
+from font_utils import FontManager
+from tile_cache import TileCache
+
+# Unset means the admin endpoints are disabled; set it to require a matching X-Admin-Token header
+ADMIN_API_TOKEN = os.environ.get('ADMIN_API_TOKEN')
+
+async def require_admin_token(x_admin_token: Optional[str] = Header(None)):
+    """Hide the admin endpoints unless they are enabled and the shared secret matches"""
+    if not ADMIN_API_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not x_admin_token or not secrets.compare_digest(x_admin_token.encode(), ADMIN_API_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+router = APIRouter(prefix="/admin", tags=["admin"], dependencies=[Depends(require_admin_token)])
+
+@router.get("/indexes")
+async def get_index_stats():
+    """Get MongoDB index usage statistics"""
+    try:
+        return await DatabaseManager.get_index_stats()
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching index stats: {str(e)}")
+
+@router.get("/render-stats")
+async def get_render_stats():
+    """Get render pool occupancy, render and tile cache usage, encoder metrics and font caches of this worker"""
+    try:
+        return {
+            "executor": RenderExecutor.get_stats(),
+            "cache": RenderCache.get_stats(),
+            "tiles": TileCache.get_stats(),
+            "encoders": EncoderMetrics.get_stats(),
+            "fonts": FontManager.get_cache_stats(),
+        }
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching render stats: {str(e)}")
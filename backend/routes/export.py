@@ -1,18 +1,62 @@
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import StreamingResponse, FileResponse
-from models import ExportResponse
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.concurrency import iterate_in_threadpool, run_in_threadpool
+from fastapi.responses import Response, StreamingResponse
+from models import (ExportResponse, ExportFormatsResponse, ExportJob, ImageResponse, Project,
+                    BatchExportRequest, BatchExportTarget, BatchExportItem, BatchExportResponse)
 from database import DatabaseManager
-from file_utils import FileManager
-import base64
-import io
-from PIL import Image, ImageDraw, ImageFont
+from file_utils import FileManager, UPLOAD_DIR
+from render_utils import BannerRenderer, EncoderMetrics, FORMAT_MEDIA_TYPES
+from render_executor import RenderExecutor, RenderQueueFull, RenderStream
+from render_cache import RenderCache
+from export_jobs import ExportJobManager, ProgressCallback
+from file_responses import RangeFileResponse
+from tile_cache import TileCache
+from zip_stream import ZipStream
+import asyncio
 import json
-from datetime import datetime
+import os
+import time
 import uuid
+from datetime import datetime
 from pathlib import Path
+from typing import AsyncIterator, List, Optional, Tuple
+from urllib.parse import quote
 
 router = APIRouter(prefix="/export", tags=["export"])
 
+# Image record fields the compositor and render cache need
+RENDER_IMAGE_FIELDS = ["id", "url", "content_hash", "width", "height", "variants"]
+
+# Most (project, resolution, format) targets one batch export may ask for
+BATCH_EXPORT_MAX_TARGETS = int(os.environ.get('BATCH_EXPORT_MAX_TARGETS', 100))
+
+def render_queue_full_error(e: RenderQueueFull) -> HTTPException:
+    """Build the 503 returned when the render pool is saturated"""
+    return HTTPException(
+        status_code=503,
+        detail=f"Export service is busy, please retry: {str(e)}",
+        headers={"Retry-After": str(RenderExecutor.RETRY_AFTER_SECONDS)}
+    )
+
+def get_content_disposition(filename: str) -> str:
+    """Build an attachment header that survives quotes, semicolons and non-ASCII project names (RFC 6266)"""
+    # Some clients split on ";" even inside quotes, so it's left out of the ASCII fallback too
+    fallback = "".join(char if " " <= char <= "~" and char not in '"\\;' else "_" for char in filename)
+    return f"attachment; filename=\"{fallback}\"; filename*=UTF-8''{quote(filename, safe='')}"
+
+def check_export_format(project):
+    """Reject formats this server's Pillow build can't encode"""
+    file_format = project.export_settings.format
+    if not BannerRenderer.is_format_supported(file_format):
+        raise HTTPException(status_code=400, detail=f"{file_format.upper()} export is not available on this server")
+
+@router.get("/formats", response_model=ExportFormatsResponse)
+async def get_export_formats():
+    """List the export formats this server's Pillow build can encode"""
+    return ExportFormatsResponse(
+        formats=[file_format for file_format in FORMAT_MEDIA_TYPES if BannerRenderer.is_format_supported(file_format)]
+    )
+
 @router.post("/{project_id}/generate", response_model=ExportResponse)
 async def generate_banner(project_id: str):
     """Generate and export banner for a project"""
@@ -21,192 +65,554 @@ async def generate_banner(project_id: str):
         project = await DatabaseManager.get_project(project_id)
         if not project:
             raise HTTPException(status_code=404, detail="Project not found")
-        
-        # Get resolution settings
-        resolution_map = {
-            "1080p": (1920, 1080),
-            "2K": (2048, 2048),
-            "4K": (4096, 4096)
-        }
-        
-        width, height = resolution_map.get(project.export_settings.resolution, (2048, 2048))
-        
-        # Create banner image
-        banner_image = await create_banner_image(project, width, height)
-        
-        # Save banner to temporary file
-        temp_filename = f"banner_{project_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{project.export_settings.format}"
-        temp_path = Path("/app/backend/uploads") / temp_filename
-        
-        # Save with appropriate format and quality
-        if project.export_settings.format == "jpg":
-            banner_image.save(temp_path, "JPEG", quality=project.export_settings.quality, optimize=True)
+        check_export_format(project)
+
+        return await export_project(project)
+
+    except HTTPException:
+        raise
+    except RenderQueueFull as e:
+        raise render_queue_full_error(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error generating banner: {str(e)}")
+
+@router.post("/{project_id}/jobs", response_model=ExportJob, status_code=202)
+async def create_export_job(project_id: str):
+    """Start generating a banner in the background and return the job to poll"""
+    try:
+        project = await DatabaseManager.get_project(project_id)
+        if not project:
+            raise HTTPException(status_code=404, detail="Project not found")
+        check_export_format(project)
+
+        # The same project revision is only rendered once at a time
+        dedup_key = f"{project.id}:{project.updated_at.isoformat()}"
+        return await ExportJobManager.submit(
+            dedup_key, project.id, lambda progress: export_project(project, progress)
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error creating export job: {str(e)}")
+
+@router.get("/jobs/{job_id}", response_model=ExportJob)
+async def get_export_job(job_id: str):
+    """Get an export job's status and, once completed, its result"""
+    try:
+        job = await ExportJobManager.get_job(job_id)
+        if not job:
+            raise HTTPException(status_code=404, detail="Export job not found")
+        return job
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching export job: {str(e)}")
+
+@router.get("/jobs/{job_id}/events")
+async def stream_export_job(job_id: str):
+    """Stream an export job's progress as server-sent events until it finishes"""
+    try:
+        job = await ExportJobManager.get_job(job_id)
+        if not job:
+            raise HTTPException(status_code=404, detail="Export job not found")
+
+        async def event_stream():
+            async for update in ExportJobManager.events(job_id):
+                yield f"event: {update.status}\ndata: {update.model_dump_json()}\n\n"
+
+        return StreamingResponse(
+            event_stream(),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error streaming export job: {str(e)}")
+
+@router.post("/batch", response_model=BatchExportResponse)
+async def batch_export(request: BatchExportRequest):
+    """Render many (project, resolution, format) targets in one call and list the exports"""
+    try:
+        check_batch_size(request)
+
+        items: List[Optional[BatchExportItem]] = [None] * len(request.targets)
+        async for index, item, _, _ in iter_batch_export(request.targets):
+            items[index] = item
+
+        failed = sum(1 for item in items if item.error)
+        if failed:
+            message = f"Exported {len(items) - failed} of {len(items)} targets"
         else:
-            banner_image.save(temp_path, "PNG", optimize=True)
-        
-        # Get file size
-        file_size_mb = temp_path.stat().st_size / (1024 * 1024)
-        
-        # Generate export URL
-        export_url = f"/api/files/{temp_filename}"
-        
-        return ExportResponse(
-            export_url=export_url,
-            format=project.export_settings.format,
-            resolution=project.export_settings.resolution,
-            file_size_mb=round(file_size_mb, 2),
-            message="Banner generated successfully"
+            message = f"Successfully exported {len(items)} targets"
+
+        return BatchExportResponse(items=items, message=message)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error exporting batch: {str(e)}")
+
+@router.post("/batch/archive")
+async def batch_export_archive(request: BatchExportRequest):
+    """Render many targets and stream them as a ZIP archive, adding each file as soon as it's rendered"""
+    try:
+        check_batch_size(request)
+
+        async def body():
+            archive = ZipStream()
+            entries = []
+            async for index, item, project, banner_path in iter_batch_export(request.targets):
+                entry = item.dict()
+                entry['file'] = None
+                if banner_path:
+                    arcname = f"{get_archive_name(project)}/{item.resolution}.{item.format}"
+                    try:
+                        async for chunk in iterate_in_threadpool(archive.add_file(arcname, banner_path)):
+                            if chunk:
+                                yield chunk
+                        entry['file'] = arcname
+                    except OSError as e:
+                        # The render cache evicted the file before it was opened
+                        entry['result'] = None
+                        entry['error'] = f"Rendered file is no longer available: {str(e)}"
+                entries.append((index, entry))
+
+            manifest = {'targets': [entry for _, entry in sorted(entries, key=lambda pair: pair[0])]}
+            for chunk in archive.add_bytes("manifest.json", json.dumps(manifest, indent=2).encode('utf-8')):
+                yield chunk
+            for chunk in archive.close():
+                yield chunk
+
+        filename = f"banners_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
+        return StreamingResponse(
+            body(),
+            media_type=ZipStream.MEDIA_TYPE,
+            headers={"Content-Disposition": get_content_disposition(filename)}
         )
-        
+
     except HTTPException:
         raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error generating banner: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error exporting batch: {str(e)}")
 
 @router.get("/{project_id}/download")
-async def download_banner(project_id: str):
+async def download_banner(project_id: str, request: Request):
     """Download the generated banner directly"""
     try:
         # Get project data
         project = await DatabaseManager.get_project(project_id)
         if not project:
             raise HTTPException(status_code=404, detail="Project not found")
-        
-        # Get resolution settings
-        resolution_map = {
-            "1080p": (1920, 1080),
-            "2K": (2048, 2048),
-            "4K": (4096, 4096)
-        }
-        
-        width, height = resolution_map.get(project.export_settings.resolution, (2048, 2048))
-        
-        # Create banner image
-        banner_image = await create_banner_image(project, width, height)
-        
-        # Save to memory buffer
-        img_buffer = io.BytesIO()
-        
-        if project.export_settings.format == "jpg":
-            banner_image.save(img_buffer, "JPEG", quality=project.export_settings.quality, optimize=True)
-            media_type = "image/jpeg"
-        else:
-            banner_image.save(img_buffer, "PNG", optimize=True)
-            media_type = "image/png"
-        
-        img_buffer.seek(0)
-        
+        check_export_format(project)
+
         # Generate filename
         filename = f"{project.name.replace(' ', '_')}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{project.export_settings.format}"
-        
-        return StreamingResponse(
-            io.BytesIO(img_buffer.read()),
-            media_type=media_type,
-            headers={"Content-Disposition": f"attachment; filename={filename}"}
-        )
-        
+        media_type = FORMAT_MEDIA_TYPES.get(project.export_settings.format, "image/png")
+        headers = {"Content-Disposition": get_content_disposition(filename)}
+
+        if not RenderExecutor.supports_streaming():
+            # Process pool workers can't write into the response, so render to disk first
+            banner_path = await render_banner_file(project)
+            return RangeFileResponse(banner_path, range_header=request.headers.get("range"),
+                                     media_type=media_type, headers=headers)
+
+        return await stream_banner(project, request, media_type, headers)
+
     except HTTPException:
         raise
+    except RenderQueueFull as e:
+        raise render_queue_full_error(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error downloading banner: {str(e)}")
 
-async def create_banner_image(project, width: int, height: int) -> Image.Image:
-    """Create the actual banner image from project data"""
+@router.get("/{project_id}/bundle")
+async def download_bundle(project_id: str):
+    """Stream a ZIP of the project's original images, its rendered banner and a manifest"""
     try:
-        # Create base image with background color
-        if project.background_color.startswith('#'):
-            bg_color = project.background_color
-        else:
-            bg_color = '#ffffff'
-        
-        banner = Image.new('RGB', (width, height), bg_color)
-        draw = ImageDraw.Draw(banner)
-        
-        # Calculate grid layout
-        rows = project.grid_size.rows
-        cols = project.grid_size.cols
-        cell_width = width // cols
-        cell_height = height // rows
-        
-        # Get and place images
-        if project.images:
-            images = await DatabaseManager.get_images(project.images)
-            
-            for i, image_data in enumerate(images[:rows * cols]):
-                if i >= rows * cols:
-                    break
-                
-                row = i // cols
-                col = i % cols
-                
-                x = col * cell_width
-                y = row * cell_height
-                
-                # Load image from file
-                filename = image_data.url.split('/')[-1] if image_data.url else None
-                if filename:
-                    file_path = FileManager.get_file_path(filename)
-                    if file_path and file_path.exists():
-                        try:
-                            img = Image.open(file_path)
-                            
-                            # Resize to fit cell while maintaining aspect ratio
-                            img_ratio = img.width / img.height
-                            cell_ratio = cell_width / cell_height
-                            
-                            if img_ratio > cell_ratio:
-                                # Image is wider, fit to width
-                                new_width = cell_width
-                                new_height = int(cell_width / img_ratio)
-                            else:
-                                # Image is taller, fit to height
-                                new_height = cell_height
-                                new_width = int(cell_height * img_ratio)
-                            
-                            img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-                            
-                            # Center image in cell
-                            paste_x = x + (cell_width - new_width) // 2
-                            paste_y = y + (cell_height - new_height) // 2
-                            
-                            # Handle transparency
-                            if img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info):
-                                banner.paste(img, (paste_x, paste_y), img)
-                            else:
-                                banner.paste(img, (paste_x, paste_y))
-                                
-                        except Exception as e:
-                            print(f"Error processing image {filename}: {e}")
-                            continue
-        
-        # Add text overlays
-        for overlay in project.text_overlays:
+        project = await DatabaseManager.get_project(project_id)
+        if not project:
+            raise HTTPException(status_code=404, detail="Project not found")
+        check_export_format(project)
+
+        images = await DatabaseManager.get_project_images(project.images)
+        # Render while the originals are being sent
+        render = asyncio.ensure_future(render_banner_file_when_ready(project))
+
+        async def body():
+            archive = ZipStream()
             try:
-                # Scale text position and size relative to canvas size
-                scale_x = width / 800  # Assuming original canvas was 800px wide
-                scale_y = height / 800  # Assuming original canvas was 800px high
-                
-                x = int(overlay.position.x * scale_x)
-                y = int(overlay.position.y * scale_y)
-                font_size = int(overlay.style.font_size * min(scale_x, scale_y))
-                
-                # Try to load font (fallback to default if not available)
+                manifest_images = []
+                for index, image in enumerate(images):
+                    entry = {
+                        'id': image.id,
+                        'name': image.name,
+                        'content_type': image.content_type,
+                        'size': image.size,
+                        'width': image.width,
+                        'height': image.height,
+                        'content_hash': image.content_hash,
+                        'file': None,
+                        'error': None,
+                    }
+                    file_path = FileManager.get_file_path(image.url.split('/')[-1]) if image.url else None
+                    if file_path:
+                        arcname = f"images/{index + 1:02d}_{Path(image.name).name}"
+                        try:
+                            async for chunk in iterate_in_threadpool(archive.add_file(arcname, file_path)):
+                                if chunk:
+                                    yield chunk
+                            entry['file'] = arcname
+                        except OSError as e:
+                            # Deleted between the lookup and the read; the rest of the bundle still goes out
+                            entry['error'] = f"Original file is no longer available: {str(e)}"
+                    else:
+                        entry['error'] = "Original file not found"
+                    manifest_images.append(entry)
+
+                banner = {'format': project.export_settings.format, 'resolution': project.export_settings.resolution,
+                          'file': None, 'error': None}
                 try:
-                    # You could add custom font loading here
-                    font = ImageFont.load_default()
-                except:
-                    font = ImageFont.load_default()
-                
-                # Draw text
-                text_color = overlay.style.color
-                if text_color.startswith('#'):
-                    draw.text((x, y), overlay.text, fill=text_color, font=font)
-                
+                    banner_path = await render
+                    arcname = f"{get_archive_name(project)}.{project.export_settings.format}"
+                    async for chunk in iterate_in_threadpool(archive.add_file(arcname, banner_path)):
+                        if chunk:
+                            yield chunk
+                    banner['file'] = arcname
+                except Exception as e:
+                    # Headers are gone already, so the failure goes into the manifest
+                    banner['error'] = str(getattr(e, 'detail', e))
+
+                manifest = {
+                    'project': {
+                        'id': project.id,
+                        'name': project.name,
+                        'description': project.description,
+                        'grid_size': project.grid_size.dict(),
+                        'background_color': project.background_color,
+                        'text_overlays': [overlay.dict() for overlay in project.text_overlays],
+                        'export_settings': project.export_settings.dict(),
+                        'updated_at': project.updated_at.isoformat(),
+                    },
+                    'images': manifest_images,
+                    'banner': banner,
+                }
+                for chunk in archive.add_bytes("manifest.json", json.dumps(manifest, indent=2).encode('utf-8')):
+                    yield chunk
+                for chunk in archive.close():
+                    yield chunk
+            finally:
+                # Keeps rendering into the cache if the client went away, like /download
+                if not render.done():
+                    render.add_done_callback(lambda future: future.cancelled() or future.exception())
+
+        filename = f"{get_archive_name(project)}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
+        return StreamingResponse(
+            body(),
+            media_type=ZipStream.MEDIA_TYPE,
+            headers={"Content-Disposition": get_content_disposition(filename)}
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error downloading bundle: {str(e)}")
+
+async def stream_banner(project, request: Request, media_type: str, headers: dict) -> Response:
+    """Send a cached render, or stream the encoder output while teeing it into the render cache"""
+    width, height = BannerRenderer.get_dimensions(project.export_settings.resolution)
+    file_format = project.export_settings.format
+
+    images = await get_banner_images(project)
+    image_sources = [get_image_source(image) for image in images]
+
+    key = None
+    if RenderCache.is_enabled():
+        key = await get_render_key(project, images, image_sources, width, height)
+        cached_path = RenderCache.get(key, file_format)
+        if cached_path:
+            return RangeFileResponse(cached_path, range_header=request.headers.get("range"),
+                                     media_type=media_type, headers=headers)
+
+    if key:
+        temp_path = RenderCache.get_temp_path(key, file_format)
+    else:
+        temp_path = UPLOAD_DIR / f".stream_{uuid.uuid4().hex}.{file_format}.tmp"
+    stream = RenderStream(asyncio.get_running_loop(), temp_path)
+    render = asyncio.ensure_future(RenderExecutor.run(
+        BannerRenderer.render_to_stream, project, width, height, image_sources, stream
+    ))
+
+    def finish_render(render: asyncio.Future):
+        # Runs even if the client disconnects, so the render still lands in the cache
+        stream.close_writer()
+        succeeded = not render.cancelled() and render.exception() is None
+        if succeeded:
+            EncoderMetrics.record(render.result())
+        if key and succeeded:
+            RenderCache.put(key, file_format, temp_path, project.id, [image.id for image in images])
+        elif temp_path.exists():
+            # The download reads through its own handle, which stays valid
+            temp_path.unlink()
+
+    render.add_done_callback(finish_render)
+
+    # Wait for the first chunk so queue and render errors still get a proper status code
+    chunks = stream.iter_chunks(render)
+    try:
+        first_chunk = await chunks.__anext__()
+    except StopAsyncIteration:
+        first_chunk = b""
+    except BaseException:
+        stream.detach()
+        raise
+
+    async def body():
+        try:
+            yield first_chunk
+            async for chunk in chunks:
+                yield chunk
+        finally:
+            stream.detach()
+
+    return StreamingResponse(body(), media_type=media_type, headers=headers)
+
+async def export_project(project, progress: Optional[ProgressCallback] = None) -> ExportResponse:
+    """Render a project's banner and describe the exported file"""
+    # Render banner, or reuse an identical earlier render
+    banner_path = await render_banner_file(project, progress)
+    return describe_export(project, banner_path)
+
+def describe_export(project, banner_path: Path) -> ExportResponse:
+    """Describe a rendered banner file"""
+    # Get file size
+    file_size_mb = banner_path.stat().st_size / (1024 * 1024)
+
+    # Generate export URL
+    export_url = f"/api/files/{banner_path.name}"
+
+    return ExportResponse(
+        export_url=export_url,
+        format=project.export_settings.format,
+        resolution=project.export_settings.resolution,
+        file_size_mb=round(file_size_mb, 2),
+        message="Banner generated successfully"
+    )
+
+async def render_banner_file(project, progress: Optional[ProgressCallback] = None,
+                             images: Optional[List[ImageResponse]] = None) -> Path:
+    """Render a project's banner to disk on the render pool, going through the render cache.
+
+    ``images`` are the project's grid image records, when the caller already has them.
+    """
+    async def report(stage: str, value: float):
+        if progress:
+            await progress(stage, value)
+
+    width, height = BannerRenderer.get_dimensions(project.export_settings.resolution)
+    file_format = project.export_settings.format
+
+    await report("loading_images", 0.1)
+    if images is None:
+        images = await get_banner_images(project)
+    image_sources = [get_image_source(image) for image in images]
+
+    if not RenderCache.is_enabled():
+        filename = f"banner_{project.id}_{project.export_settings.resolution}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{file_format}"
+        banner_path = UPLOAD_DIR / filename
+        await report("rendering", 0.3)
+        metrics = await RenderExecutor.run(
+            BannerRenderer.render_to_file, project, width, height, image_sources, str(banner_path)
+        )
+        EncoderMetrics.record(metrics)
+        return banner_path
+
+    key = await get_render_key(project, images, image_sources, width, height)
+    cached_path = RenderCache.get(key, file_format)
+    if cached_path:
+        return cached_path
+
+    temp_path = RenderCache.get_temp_path(key, file_format)
+    try:
+        await report("rendering", 0.3)
+        metrics = await RenderExecutor.run(
+            BannerRenderer.render_to_file, project, width, height, image_sources, str(temp_path)
+        )
+        EncoderMetrics.record(metrics)
+        return RenderCache.put(key, file_format, temp_path, project.id, [image.id for image in images])
+    finally:
+        if temp_path.exists():
+            temp_path.unlink()
+
+async def render_banner_file_when_ready(project, images: Optional[List[ImageResponse]] = None) -> Path:
+    """Render like ``render_banner_file``, waiting up to ``MAX_WAIT_SECONDS`` for room on a full render queue"""
+    deadline = time.monotonic() + RenderExecutor.MAX_WAIT_SECONDS
+    while True:
+        try:
+            return await render_banner_file(project, images=images)
+        except RenderQueueFull:
+            if time.monotonic() + RenderExecutor.RETRY_AFTER_SECONDS > deadline:
+                raise
+            # Other requests fill the pool; wait for room like export jobs do
+            await asyncio.sleep(RenderExecutor.RETRY_AFTER_SECONDS)
+
+async def get_render_key(project, images: List[ImageResponse], image_sources: List[Optional[dict]],
+                         width: int, height: int) -> str:
+    """Build the render cache key from the project and its images' content hashes"""
+    image_hashes = []
+    for image, image_source in zip(images, image_sources):
+        content_hash = image.content_hash
+        if content_hash is None and image_source:
+            # Records uploaded before content hashing was added
+            content_hash = await run_in_threadpool(FileManager.get_content_hash, Path(image_source['path']))
+            # Lets the renderer use the tile cache for this image too
+            image_source['content_hash'] = content_hash
+        image_hashes.append((image.id, content_hash))
+
+    return RenderCache.build_key(project, image_hashes, width, height)
+
+async def get_banner_images(project) -> List[ImageResponse]:
+    """Get the image records that fill the project's grid"""
+    if not project.images:
+        return []
+
+    images = await DatabaseManager.get_project_images(project.images, fields=RENDER_IMAGE_FIELDS)
+    return images[:project.grid_size.rows * project.grid_size.cols]
+
+def get_image_source(image: ImageResponse) -> Optional[dict]:
+    """Resolve an image record and its variants to files on disk"""
+    filename = image.url.split('/')[-1] if image.url else None
+    file_path = FileManager.get_file_path(filename) if filename else None
+    if not file_path:
+        return None
+
+    variants = []
+    for variant in image.variants:
+        variant_path = FileManager.get_file_path(variant.url.split('/')[-1])
+        if variant_path:
+            variants.append({'width': variant.width, 'height': variant.height, 'path': str(variant_path)})
+
+    return {
+        'path': str(file_path),
+        'content_hash': image.content_hash,
+        'width': image.width,
+        'height': image.height,
+        'variants': variants
+    }
+
+def check_batch_size(request: BatchExportRequest):
+    """Reject batches with more targets than one request may render"""
+    if len(request.targets) > BATCH_EXPORT_MAX_TARGETS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many export targets ({len(request.targets)}), at most {BATCH_EXPORT_MAX_TARGETS} per batch"
+        )
+
+def get_archive_name(project) -> str:
+    """Name a project's folder in an archive, keeping projects with the same name apart"""
+    name = project.name.replace(' ', '_').replace('/', '_')
+    return f"{name}_{project.id[:8]}"
+
+async def iter_batch_export(targets: List[BatchExportTarget]) -> AsyncIterator[
+        Tuple[int, BatchExportItem, Optional[Project], Optional[Path]]]:
+    """Render batch targets in parallel, yielding ``(index, item, project, file)`` as each one finishes.
+
+    Each project and its image records are loaded once, and every source
+    image is decoded once into the tile cache for all the cell sizes the
+    batch needs. At most ``MAX_WORKERS`` targets render at a time, so a large
+    batch waits for the render pool instead of failing on a full queue.
+    """
+    projects = {}
+    images = {}
+    for project_id in dict.fromkeys(target.project_id for target in targets):
+        project = await DatabaseManager.get_project(project_id)
+        if project:
+            projects[project_id] = project
+            images[project_id] = await get_banner_images(project)
+
+    renders = []
+    for index, target in enumerate(targets):
+        item = BatchExportItem(project_id=target.project_id, resolution=target.resolution, format=target.format)
+        project = projects.get(target.project_id)
+        if project is None:
+            item.error = "Project not found"
+            yield index, item, None, None
+            continue
+
+        changes = {name: value for name, value in (('resolution', target.resolution), ('format', target.format)) if value}
+        project = project.model_copy(update={'export_settings': project.export_settings.model_copy(update=changes)})
+        item.resolution = project.export_settings.resolution
+        item.format = project.export_settings.format
+        if not BannerRenderer.is_format_supported(item.format):
+            item.error = f"{item.format.upper()} export is not available on this server"
+            yield index, item, project, None
+            continue
+        renders.append((index, item, project))
+
+    await prepare_batch_tiles([(project, images[project.id]) for _, _, project in renders])
+
+    semaphore = asyncio.Semaphore(RenderExecutor.MAX_WORKERS)
+
+    async def render(index: int, item: BatchExportItem, project):
+        async with semaphore:
+            try:
+                banner_path = await render_banner_file_when_ready(project, images[project.id])
+                item.result = describe_export(project, banner_path)
+                return index, item, project, banner_path
             except Exception as e:
-                print(f"Error adding text overlay: {e}")
+                item.error = str(getattr(e, 'detail', e))
+                return index, item, project, None
+
+    tasks = [asyncio.ensure_future(render(*entry)) for entry in renders]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            yield await finished
+    finally:
+        # The client went away; don't keep rendering for nobody
+        for task in tasks:
+            task.cancel()
+
+async def prepare_batch_tiles(renders: List[Tuple[Project, List[ImageResponse]]]):
+    """Decode the source images of a batch once each, caching the tiles of every cell size it needs"""
+    if not TileCache.is_enabled() or not RenderExecutor.shares_memory():
+        # Tiles prepared on a process pool worker would stay in that worker
+        return
+
+    # content hash -> (image source, cell sizes)
+    sources = {}
+    for project, images in renders:
+        width, height = BannerRenderer.get_dimensions(project.export_settings.resolution)
+        image_sources = [get_image_source(image) for image in images]
+        if RenderCache.is_enabled():
+            key = await get_render_key(project, images, image_sources, width, height)
+            if RenderCache.get(key, project.export_settings.format):
                 continue
-        
-        return banner
-        
-    except Exception as e:
-        raise Exception(f"Error creating banner image: {str(e)}")
\ No newline at end of file
+
+        cell_size = (width // project.grid_size.cols, height // project.grid_size.rows)
+        for image_source in image_sources:
+            if image_source and image_source.get('content_hash'):
+                sources.setdefault(image_source['content_hash'], (image_source, set()))[1].add(cell_size)
+
+    # Tiles evicted again before the renders reach them would be decoded twice
+    budget = TileCache.MAX_BYTES + TileCache.DISK_MAX_BYTES
+    prepared = []
+    for image_source, cell_sizes in sources.values():
+        budget -= sum(cell_width * cell_height * 4 for cell_width, cell_height in cell_sizes)
+        if budget < 0:
+            break
+        prepared.append((image_source, list(cell_sizes)))
+
+    semaphore = asyncio.Semaphore(RenderExecutor.MAX_WORKERS)
+
+    async def prepare(image_source: dict, cell_sizes: List[Tuple[int, int]]):
+        async with semaphore:
+            try:
+                await RenderExecutor.run(BannerRenderer.prepare_tiles, image_source, cell_sizes)
+            except Exception as e:
+                # The renders decode the image themselves
+                print(f"Error preparing tiles for {image_source['path']}: {e}")
+
+    await asyncio.gather(*(prepare(image_source, cell_sizes) for image_source, cell_sizes in prepared))
@@ -1,29 +1,73 @@
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response
 from file_utils import FileManager
+from database import DatabaseManager
+from file_responses import RangeFileResponse
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Optional
 import os
 
 router = APIRouter(prefix="/files", tags=["files"])
 
 @router.get("/{filename}")
-async def serve_file(filename: str):
+async def serve_file(filename: str, request: Request):
     """Serve uploaded files"""
     try:
-        file_path = FileManager.get_file_path(filename)
-        if not file_path:
-            raise HTTPException(status_code=404, detail="File not found")
-        
-        # Get file info to determine content type
-        file_info = FileManager.get_file_info(file_path)
-        content_type = file_info.get('content_type', 'application/octet-stream')
-        
-        return FileResponse(
-            path=file_path,
-            media_type=content_type,
-            filename=filename
+        # Serving metadata comes from the in-process LRU, so a hit costs no stat or sniffing
+        metadata = FileManager.get_cached_file_metadata(filename)
+        if metadata is None:
+            file_path = FileManager.get_file_path(filename)
+            if not file_path:
+                raise HTTPException(status_code=404, detail="File not found")
+            
+            # Content type and hash recorded at upload time, if this is an upload or variant
+            known = await DatabaseManager.get_file_record(filename)
+            metadata = await run_in_threadpool(FileManager.build_file_metadata, file_path, known)
+            FileManager.cache_file_metadata(filename, metadata)
+
+        # Validators: a strong ETag from the content hash and the modification time
+        modified = int(metadata['modified'])
+        cache_headers = {
+            "Cache-Control": FileManager.CACHE_CONTROL[metadata['file_class']],
+            "Last-Modified": formatdate(modified, usegmt=True),
+        }
+        if metadata['content_hash']:
+            cache_headers["ETag"] = f'"{metadata["content_hash"]}"'
+
+        if is_not_modified(request, cache_headers.get("ETag"), modified):
+            return Response(status_code=304, headers=cache_headers)
+
+        return RangeFileResponse(
+            metadata['path'],
+            range_header=request.headers.get("range"),
+            if_range=request.headers.get("if-range"),
+            file_size=metadata['size'],
+            media_type=metadata['content_type'],
+            filename=filename,
+            headers=cache_headers
         )
-        
+
     except HTTPException:
         raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error serving file: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error serving file: {str(e)}")
+
+def is_not_modified(request: Request, etag: Optional[str], modified: int) -> bool:
+    """Evaluate If-None-Match / If-Modified-Since against the file's validators"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # If-None-Match takes precedence and uses weak comparison
+        if not etag:
+            return False
+        candidates = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in candidates or any(tag.removeprefix("W/") == etag for tag in candidates)
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return modified <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+
+    return False
@@ -1,108 +1,237 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form
-from fastapi.responses import FileResponse
-from typing import List
-from models import ImageUpload, ImageResponse, UploadResponse, StatusResponse
+from fastapi import APIRouter, HTTPException, Request, Form
+from fastapi.concurrency import run_in_threadpool
+from typing import Awaitable, List, Optional, Tuple
+from models import ImageUpload, ImageResponse, UploadResponse, UploadError, StatusResponse
 from database import DatabaseManager
 from file_utils import FileManager
+from file_responses import RangeFileResponse
+from upload_stream import MultipartUpload, UploadPart
+import asyncio
 import json
-import base64
+import os
 
 router = APIRouter(prefix="/images", tags=["images"])
 
+# Maximum number of files from one request decoded and written at the same time
+INGEST_CONCURRENCY = int(os.environ.get('INGEST_CONCURRENCY', 8))
+
+# Most bytes one /upload-files request body may have, checked before and while it's parsed
+MAX_UPLOAD_REQUEST_SIZE = int(os.environ.get('MAX_UPLOAD_REQUEST_MB', 200)) * 1024 * 1024
+
+# The body is parsed by hand, so its schema is declared for the API docs
+UPLOAD_FILES_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "properties": {"files": {"type": "array", "items": {"type": "string", "format": "binary"}}},
+                    "required": ["files"],
+                }
+            }
+        },
+    }
+}
+
 @router.post("/upload", response_model=UploadResponse)
 async def upload_images(images_data: str = Form(...)):
     """Upload multiple images via base64 encoded data"""
     try:
         # Parse the JSON data
         images_list = json.loads(images_data)
-        uploaded_images = []
         
-        for image_data in images_list:
+        async def ingest(image_data) -> Tuple[ImageResponse, bool]:
             # Validate required fields
             if not all(key in image_data for key in ['name', 'size', 'content_type', 'data']):
-                raise HTTPException(status_code=400, detail="Missing required image fields")
+                raise ValueError("Missing required image fields")
             
             # Create ImageUpload model
             image_upload = ImageUpload(**image_data)
             
             # Validate and save file
-            success, message, file_url = FileManager.save_base64_image(
+            success, message, file_url = await run_in_threadpool(
+                FileManager.save_base64_image,
                 image_upload.data, 
                 image_upload.name, 
                 image_upload.content_type
             )
             
             if not success:
-                raise HTTPException(status_code=400, detail=message)
+                raise ValueError(message)
             
-            # Create image record in database
-            image_response = ImageResponse(
-                name=image_upload.name,
-                size=image_upload.size,
-                content_type=image_upload.content_type,
-                url=file_url
+            return await build_image_record(
+                image_upload.name,
+                image_upload.size,
+                image_upload.content_type,
+                file_url
             )
-            
-            saved_image = await DatabaseManager.create_image(image_response)
-            uploaded_images.append(saved_image)
         
-        return UploadResponse(
-            images=uploaded_images,
-            message=f"Successfully uploaded {len(uploaded_images)} images"
-        )
+        names = [image_data.get('name', f"image {i + 1}") if isinstance(image_data, dict) else f"image {i + 1}"
+                 for i, image_data in enumerate(images_list)]
+        return await ingest_batch(names, [ingest(image_data) for image_data in images_list], "images")
         
+    except HTTPException:
+        raise
     except json.JSONDecodeError:
         raise HTTPException(status_code=400, detail="Invalid JSON data")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error uploading images: {str(e)}")
 
-@router.post("/upload-files", response_model=UploadResponse)
-async def upload_image_files(files: List[UploadFile] = File(...)):
-    """Upload multiple image files"""
+@router.post("/upload-files", response_model=UploadResponse, openapi_extra=UPLOAD_FILES_BODY)
+async def upload_image_files(request: Request):
+    """Upload multiple image files, writing each to disk as the request body arrives"""
     try:
-        uploaded_images = []
+        content_length = request.headers.get("content-length")
+        if content_length and content_length.isdigit() and int(content_length) > MAX_UPLOAD_REQUEST_SIZE:
+            raise HTTPException(status_code=413, detail=f"Upload exceeds maximum of {MAX_UPLOAD_REQUEST_SIZE} bytes")
         
-        for file in files:
-            # Read file content
-            file_content = await file.read()
-            
-            # Validate file
-            is_valid, message = FileManager.validate_image(file.content_type, len(file_content))
-            if not is_valid:
-                raise HTTPException(status_code=400, detail=f"Invalid file {file.filename}: {message}")
-            
-            # Convert to base64
-            base64_data = base64.b64encode(file_content).decode('utf-8')
-            
-            # Save file
-            success, save_message, file_url = FileManager.save_base64_image(
-                base64_data, 
-                file.filename, 
-                file.content_type
-            )
-            
-            if not success:
-                raise HTTPException(status_code=400, detail=f"Error saving {file.filename}: {save_message}")
-            
-            # Create image record
-            image_response = ImageResponse(
-                name=file.filename,
-                size=len(file_content),
-                content_type=file.content_type,
-                url=file_url
-            )
-            
-            saved_image = await DatabaseManager.create_image(image_response)
-            uploaded_images.append(saved_image)
+        try:
+            upload = MultipartUpload(request.headers.get("content-type", ""))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         
-        return UploadResponse(
-            images=uploaded_images,
-            message=f"Successfully uploaded {len(uploaded_images)} files"
-        )
+        try:
+            await receive_upload(request, upload)
+        except Exception:
+            # Files stored before the request failed are only kept if an earlier upload uses them
+            for part in upload.parts:
+                if part.url and not await DatabaseManager.is_file_referenced(part.url):
+                    FileManager.delete_file(part.url.split('/')[-1])
+            raise
+        finally:
+            await run_in_threadpool(upload.close)
+        
+        async def ingest(part: UploadPart) -> Tuple[ImageResponse, bool]:
+            if part.error:
+                raise ValueError(part.error)
+            return await build_image_record(part.filename, part.size, part.content_type, part.url)
         
+        return await ingest_batch([part.filename for part in upload.parts], [ingest(part) for part in upload.parts], "files")
+        
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error uploading files: {str(e)}")
 
+async def receive_upload(request: Request, upload: MultipartUpload):
+    """Feed the request body into the parser, enforcing the request size limit as it arrives"""
+    received = 0
+    try:
+        async for chunk in request.stream():
+            # Also checked here, since a chunked body has no Content-Length
+            received += len(chunk)
+            if received > MAX_UPLOAD_REQUEST_SIZE:
+                raise HTTPException(status_code=413, detail=f"Upload exceeds maximum of {MAX_UPLOAD_REQUEST_SIZE} bytes")
+            if chunk:
+                await run_in_threadpool(upload.write, chunk)
+        await run_in_threadpool(upload.finish)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+async def ingest_batch(names: List[str], jobs: List[Awaitable[Tuple[ImageResponse, bool]]], noun: str) -> UploadResponse:
+    """Run upload jobs concurrently and store every successful image with one insert"""
+    semaphore = asyncio.Semaphore(INGEST_CONCURRENCY)
+    
+    async def run(job):
+        async with semaphore:
+            return await job
+    
+    results = await asyncio.gather(*(run(job) for job in jobs), return_exceptions=True)
+    
+    records = []
+    owners = []
+    errors = []
+    for name, result in zip(names, results):
+        if isinstance(result, Exception):
+            errors.append(UploadError(name=name, message=str(result)))
+        else:
+            record, owns_files = result
+            records.append(record)
+            if owns_files:
+                owners.append(record)
+    
+    if not records:
+        detail = "; ".join(f"{error.name}: {error.message}" for error in errors) or f"No {noun} provided"
+        raise HTTPException(status_code=400, detail=detail)
+    
+    try:
+        uploaded_images = await DatabaseManager.create_images(records)
+    except Exception:
+        # Don't leave orphaned files behind when the records can't be stored
+        for record in owners:
+            for filename in get_image_filenames(record):
+                FileManager.delete_file(filename)
+        raise
+    
+    # Deleting the last earlier record that shared these files may have removed them just
+    # before the insert; delete_image gives them back if it sees the new record in time
+    stored_images = []
+    for image in uploaded_images:
+        if await run_in_threadpool(FileManager.files_exist, get_image_filenames(image)):
+            stored_images.append(image)
+        else:
+            await DatabaseManager.delete_image(image.id)
+            errors.append(UploadError(name=image.name, message="File was deleted while it was being uploaded, please try again"))
+    if not stored_images:
+        raise HTTPException(status_code=409, detail="; ".join(f"{error.name}: {error.message}" for error in errors))
+    uploaded_images = stored_images
+    
+    if errors:
+        message = f"Uploaded {len(uploaded_images)} of {len(names)} {noun}"
+    else:
+        message = f"Successfully uploaded {len(uploaded_images)} {noun}"
+    
+    return UploadResponse(images=uploaded_images, errors=errors, message=message)
+
+async def build_image_record(name: str, size: Optional[int], content_type: str, file_url: str) -> Tuple[ImageResponse, bool]:
+    """Build the image record for a saved upload, generating its downscaled variants.
+    
+    Every upload gets its own record. Content that was uploaded before shares
+    the stored file and variants of the earlier record, so the second value
+    returned says whether the files are new with this record.
+    """
+    filename = file_url.split('/')[-1]
+    file_path = FileManager.get_file_path(filename)
+    if not file_path:
+        raise ValueError("File was deleted while it was being uploaded, please try again")
+    if size is None:
+        size = file_path.stat().st_size
+    
+    content_hash = await run_in_threadpool(FileManager.get_content_hash, file_path)
+    if content_hash:
+        existing = await DatabaseManager.find_image_by_hash(content_hash)
+        # A record found while its last copy is being deleted may have lost its files already
+        if existing and await run_in_threadpool(FileManager.files_exist, get_image_filenames(existing)):
+            return ImageResponse(
+                name=name,
+                size=size,
+                content_type=content_type,
+                url=existing.url,
+                content_hash=content_hash,
+                width=existing.width,
+                height=existing.height,
+                variants=existing.variants
+            ), False
+    
+    image_info = await run_in_threadpool(FileManager.create_image_variants, filename)
+    
+    return ImageResponse(
+        name=name,
+        size=size,
+        content_type=content_type,
+        url=file_url,
+        content_hash=content_hash,
+        width=image_info['width'],
+        height=image_info['height'],
+        variants=image_info['variants']
+    ), True
+
+def get_image_filenames(image: ImageResponse) -> List[str]:
+    """Names of the stored file and variants of an image record"""
+    filenames = [image.url.split('/')[-1]] if image.url else []
+    return filenames + [variant.url.split('/')[-1] for variant in image.variants]
+
 @router.get("/{image_id}", response_model=ImageResponse)
 async def get_image(image_id: str):
     """Get image metadata by ID"""
@@ -141,17 +270,22 @@ async def delete_image(image_id: str):
         if not image:
             raise HTTPException(status_code=404, detail="Image not found")
         
-        # Extract filename from URL
-        filename = image.url.split('/')[-1] if image.url else None
-        
         # Delete from database
         deleted = await DatabaseManager.delete_image(image_id)
         if not deleted:
             raise HTTPException(status_code=404, detail="Image not found in database")
         
-        # Delete file from disk
-        if filename:
-            FileManager.delete_file(filename)
+        # Identical uploads share files, which stay until their last record is deleted
+        if image.url and await DatabaseManager.is_file_referenced(image.url):
+            return StatusResponse(status="success", message="Image deleted successfully")
+        
+        # Move the file and its variants aside, then check again: an upload of the same
+        # content may have stored a record reusing them since the check above
+        moved = await run_in_threadpool(FileManager.set_aside_files, get_image_filenames(image))
+        if image.url and await DatabaseManager.is_file_referenced(image.url):
+            await run_in_threadpool(FileManager.restore_files, moved)
+        else:
+            await run_in_threadpool(FileManager.remove_set_aside_files, moved)
         
         return StatusResponse(status="success", message="Image deleted successfully")
         
@@ -161,7 +295,7 @@ async def delete_image(image_id: str):
         raise HTTPException(status_code=500, detail=f"Error deleting image: {str(e)}")
 
 @router.get("/{image_id}/download")
-async def download_image(image_id: str):
+async def download_image(image_id: str, request: Request):
     """Download image file"""
     try:
         # Get image metadata
@@ -179,8 +313,10 @@ async def download_image(image_id: str):
         if not file_path:
             raise HTTPException(status_code=404, detail="Image file not found on disk")
         
-        return FileResponse(
-            path=file_path,
+        return RangeFileResponse(
+            file_path,
+            range_header=request.headers.get("range"),
+            if_range=request.headers.get("if-range"),
             filename=image.name,
             media_type=image.content_type
         )
@@ -37,13 +37,12 @@ async def create_project(project_create: ProjectCreate, session_id: str = Depend
 async def get_projects(session_id: str = Depends(get_session_id)):
     """Get all projects for current session"""
     try:
-        projects = await DatabaseManager.get_projects_by_session(session_id)
+        projects = await DatabaseManager.get_projects_with_images(session_id)
         
         # Convert to response format with images
         project_responses = []
-        for project in projects:
-            project_response = await get_project_response(project.id)
-            project_responses.append(project_response)
+        for project, images in projects:
+            project_responses.append(build_project_response(project, images))
         
         return project_responses
         
@@ -148,10 +147,12 @@ async def get_project_response(project_id: str) -> ProjectResponse:
         raise HTTPException(status_code=404, detail="Project not found")
     
     # Get full image data
-    images = []
-    if project.images:
-        images = await DatabaseManager.get_images(project.images)
+    images = await DatabaseManager.get_project_images(project.images)
     
+    return build_project_response(project, images)
+
+def build_project_response(project: Project, images: List[ImageResponse]) -> ProjectResponse:
+    """Combine a project and its image records into a response"""
     return ProjectResponse(
         id=project.id,
         name=project.name,
@@ -1,24 +1,39 @@
 from fastapi import FastAPI, APIRouter
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
-import os
+from contextlib import asynccontextmanager
 import logging
 from pathlib import Path
 
-# Import route modules
-from routes import projects, images, files, export
-
+# Load settings before importing modules that read them
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+# Import route modules
+from routes import projects, images, files, export, admin
+from database import DatabaseManager, connect_database, close_database
+from render_executor import RenderExecutor
+from export_jobs import ExportJobManager
+
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One pooled MongoDB client shared by every request
+    await connect_database()
+    try:
+        await DatabaseManager.ensure_indexes()
+    except Exception as e:
+        logger.error(f"Error ensuring database indexes: {e}")
+    
+    yield
+    
+    await ExportJobManager.shutdown()
+    RenderExecutor.shutdown()
+    close_database()
 
 # Create the main app without a prefix
-app = FastAPI(title="Banner Maker API", version="1.0.0")
+app = FastAPI(title="Banner Maker API", version="1.0.0", lifespan=lifespan)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -28,6 +43,7 @@ api_router.include_router(projects.router)
 api_router.include_router(images.router)
 api_router.include_router(files.router)
 api_router.include_router(export.router)
+api_router.include_router(admin.router)
 
 # Add basic health check route
 @api_router.get("/")
@@ -47,6 +63,8 @@ app.add_middleware(
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    # Lets the frontend name downloads after the server's filename
+    expose_headers=["Content-Disposition"],
 )
 
 # Configure logging
@@ -54,8 +72,4 @@ logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
-logger = logging.getLogger(__name__)
 
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
@@ -0,0 +1,213 @@
+import hashlib
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, Optional, Tuple
+from PIL import Image
+from file_utils import UPLOAD_DIR
+
+# Spilled tiles live outside the directories /api/files serves from
+TILE_DIR = UPLOAD_DIR / "tiles"
+
+class TileCache:
+    """LRU of decoded and resized grid cells, shared by all renders of a process.
+
+    Keys are the source image's content hash plus the cell size, resample
+    settings and renderer version, so an entry is valid for any project that places the same image
+    in a cell of the same size. Editing text or colors then skips decoding and
+    resizing entirely. Tiles evicted from memory are optionally spilled to disk
+    as raw pixels (``TILE_CACHE_DISK_MB``), where they also survive restarts.
+    Cached tiles are shared between renders and must not be modified.
+    """
+    MAX_BYTES = int(os.environ.get('TILE_CACHE_MAX_MB', 256)) * 1024 * 1024
+    DISK_MAX_BYTES = int(os.environ.get('TILE_CACHE_DISK_MB', 0)) * 1024 * 1024
+    # Raw spill files can't carry a palette, so P images stay memory-only
+    SPILL_MODES = ('RGB', 'RGBA', 'L', 'LA')
+
+    _tiles: "OrderedDict[str, Image.Image]" = OrderedDict()
+    _total_bytes = 0
+    # key -> (filename, size), oldest first
+    _disk_entries: "OrderedDict[str, Tuple[str, int]]" = OrderedDict()
+    _disk_bytes = 0
+    _disk_loaded = False
+    _hits = 0
+    _disk_hits = 0
+    _misses = 0
+    _lock = threading.Lock()
+
+    @staticmethod
+    def is_enabled() -> bool:
+        """Whether tiles should be cached at all"""
+        return TileCache.MAX_BYTES > 0
+
+    @staticmethod
+    def build_key(content_hash: str, cell_width: int, cell_height: int, resample: str, renderer_version: int) -> str:
+        """Build the cache key of a source image fitted into a cell.
+
+        ``renderer_version`` is passed in by the renderer, which imports this module.
+        """
+        key = f"{content_hash}:{cell_width}x{cell_height}:{resample}:{renderer_version}"
+        return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def get(key: str) -> Optional[Image.Image]:
+        """Get a cached tile, from memory or the disk spill"""
+        with TileCache._lock:
+            tile = TileCache._tiles.get(key)
+            if tile is not None:
+                TileCache._tiles.move_to_end(key)
+                TileCache._hits += 1
+                return tile
+            disk_entry = TileCache._get_disk_entry(key)
+
+        if disk_entry is not None:
+            tile = TileCache._read_spilled(*disk_entry)
+            if tile is not None:
+                with TileCache._lock:
+                    TileCache._disk_hits += 1
+                TileCache.put(key, tile)
+                return tile
+
+        with TileCache._lock:
+            TileCache._misses += 1
+        return None
+
+    @staticmethod
+    def contains(key: str) -> bool:
+        """Whether a tile is cached in memory or on disk, without counting a hit or miss"""
+        with TileCache._lock:
+            return key in TileCache._tiles or TileCache._get_disk_entry(key) is not None
+
+    @staticmethod
+    def put(key: str, tile: Image.Image):
+        """Add a tile, evicting least recently used tiles beyond the memory budget"""
+        size = TileCache.get_tile_bytes(tile)
+        if size > TileCache.MAX_BYTES:
+            return
+
+        with TileCache._lock:
+            previous = TileCache._tiles.pop(key, None)
+            if previous is not None:
+                TileCache._total_bytes -= TileCache.get_tile_bytes(previous)
+            TileCache._tiles[key] = tile
+            TileCache._total_bytes += size
+
+            evicted = []
+            while TileCache._total_bytes > TileCache.MAX_BYTES:
+                old_key, old_tile = TileCache._tiles.popitem(last=False)
+                TileCache._total_bytes -= TileCache.get_tile_bytes(old_tile)
+                evicted.append((old_key, old_tile))
+
+        # Disk writes happen outside the lock so other renders aren't held up
+        for old_key, old_tile in evicted:
+            TileCache._spill(old_key, old_tile)
+
+    @staticmethod
+    def get_tile_bytes(tile: Image.Image) -> int:
+        """Approximate memory held by a tile's pixels"""
+        return tile.width * tile.height * len(tile.getbands())
+
+    @staticmethod
+    def get_stats() -> dict:
+        """Get cache occupancy and hit counts"""
+        with TileCache._lock:
+            return {
+                'tiles': len(TileCache._tiles),
+                'total_bytes': TileCache._total_bytes,
+                'max_bytes': TileCache.MAX_BYTES,
+                'disk_tiles': len(TileCache._disk_entries),
+                'disk_bytes': TileCache._disk_bytes,
+                'disk_max_bytes': TileCache.DISK_MAX_BYTES,
+                'hits': TileCache._hits,
+                'disk_hits': TileCache._disk_hits,
+                'misses': TileCache._misses,
+            }
+
+    @staticmethod
+    def _get_disk_entry(key: str) -> Optional[Tuple[str, int]]:
+        """Look up a spilled tile; call with the lock held"""
+        if TileCache.DISK_MAX_BYTES <= 0:
+            return None
+        TileCache._load_disk_index()
+        entry = TileCache._disk_entries.get(key)
+        if entry is not None:
+            TileCache._disk_entries.move_to_end(key)
+        return entry
+
+    @staticmethod
+    def _read_spilled(filename: str, size: int) -> Optional[Image.Image]:
+        # Filenames are "{key}_{mode}_{width}x{height}.tile"
+        try:
+            _, mode, dimensions = Path(filename).stem.split('_')
+            width, height = (int(value) for value in dimensions.split('x'))
+            with open(TILE_DIR / filename, 'rb') as f:
+                return Image.frombytes(mode, (width, height), f.read())
+        except (OSError, ValueError) as e:
+            print(f"Error reading spilled tile {filename}: {e}")
+            return None
+
+    @staticmethod
+    def _spill(key: str, tile: Image.Image):
+        """Write an evicted tile to disk, if spilling is enabled"""
+        if TileCache.DISK_MAX_BYTES <= 0 or tile.mode not in TileCache.SPILL_MODES:
+            return
+
+        filename = f"{key}_{tile.mode}_{tile.width}x{tile.height}.tile"
+        data = tile.tobytes()
+        if len(data) > TileCache.DISK_MAX_BYTES:
+            return
+        with TileCache._lock:
+            TileCache._load_disk_index()
+            if key in TileCache._disk_entries:
+                TileCache._disk_entries.move_to_end(key)
+                return
+
+        temp_path = TILE_DIR / f".{filename}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(temp_path, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, TILE_DIR / filename)
+        except OSError as e:
+            print(f"Error spilling tile {filename}: {e}")
+            if temp_path.exists():
+                temp_path.unlink()
+            return
+
+        with TileCache._lock:
+            if key not in TileCache._disk_entries:
+                TileCache._disk_entries[key] = (filename, len(data))
+                TileCache._disk_bytes += len(data)
+            removed: List[str] = []
+            while TileCache._disk_bytes > TileCache.DISK_MAX_BYTES:
+                _, (old_filename, old_size) = TileCache._disk_entries.popitem(last=False)
+                TileCache._disk_bytes -= old_size
+                removed.append(old_filename)
+
+        for old_filename in removed:
+            try:
+                os.remove(TILE_DIR / old_filename)
+            except OSError:
+                pass
+
+    @staticmethod
+    def _load_disk_index():
+        """Rebuild the spill index from disk once per process; call with the lock held"""
+        if TileCache._disk_loaded:
+            return
+        TileCache._disk_loaded = True
+        TILE_DIR.mkdir(exist_ok=True)
+
+        files = []
+        for file_path in TILE_DIR.glob("*.tile"):
+            try:
+                stat = file_path.stat()
+            except OSError:
+                continue
+            files.append((stat.st_mtime, file_path.name, stat.st_size))
+
+        for _, filename, size in sorted(files):
+            key = filename.split('_', 1)[0]
+            TileCache._disk_entries[key] = (filename, size)
+            TileCache._disk_bytes += size
@@ -0,0 +1,159 @@
+import hashlib
+import os
+from pathlib import Path
+from typing import List, Optional
+from file_utils import FileManager
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:  # python-multipart before 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
+
+class UploadPart:
+    """One file part of a multipart upload"""
+
+    def __init__(self):
+        self.field_name: Optional[str] = None
+        self.filename: Optional[str] = None
+        self.content_type = "application/octet-stream"
+        self.size = 0
+        self.url: Optional[str] = None
+        self.error: Optional[str] = None
+        self.temp_path: Optional[Path] = None
+        self.file = None
+        self.digest = None
+
+class MultipartUpload:
+    """multipart/form-data request body parsed as it arrives.
+
+    File parts of the upload field are written straight into a temp file in
+    the upload directory, hashed on the way, and moved to their
+    content-addressed blob name when the part ends, so the body is written to
+    disk once and never held in memory or spooled. A part that passes
+    ``FileManager.MAX_FILE_SIZE`` is dropped as soon as it does and the rest
+    of it is skipped. ``write`` and ``finish`` do blocking file I/O and belong
+    on a worker thread; ``close`` removes the temp file of a part left
+    unfinished by an aborted request.
+    """
+
+    def __init__(self, content_type: str, field_name: str = "files"):
+        mime_type, options = parse_options_header(content_type)
+        boundary = options.get(b"boundary")
+        if mime_type != b"multipart/form-data" or not boundary:
+            raise ValueError("Expected a multipart/form-data body with a boundary")
+
+        self.field_name = field_name
+        self.parts: List[UploadPart] = []
+        self._part: Optional[UploadPart] = None
+        self._headers = {}
+        self._header_field = b""
+        self._header_value = b""
+        self._finished = False
+        self._parser = MultipartParser(boundary, {
+            'on_part_begin': self._on_part_begin,
+            'on_header_field': self._on_header_field,
+            'on_header_value': self._on_header_value,
+            'on_header_end': self._on_header_end,
+            'on_headers_finished': self._on_headers_finished,
+            'on_part_data': self._on_part_data,
+            'on_part_end': self._on_part_end,
+            'on_end': self._on_end,
+        })
+
+    def write(self, chunk: bytes):
+        """Feed the next chunk of the request body"""
+        try:
+            self._parser.write(chunk)
+        except ValueError as e:
+            raise ValueError(f"Malformed multipart body: {str(e)}")
+
+    def finish(self):
+        """Check that the whole body arrived"""
+        self._parser.finalize()
+        if not self._finished:
+            raise ValueError("Malformed multipart body: the closing boundary is missing")
+
+    def close(self):
+        """Remove the temp file of a part that never finished"""
+        if self._part is not None:
+            self._discard(self._part)
+
+    def _on_part_begin(self):
+        self._part = UploadPart()
+        self._headers = {}
+
+    def _on_header_field(self, data: bytes, start: int, end: int):
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def _on_header_end(self):
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = b""
+        self._header_value = b""
+
+    def _on_headers_finished(self):
+        part = self._part
+        _, options = parse_options_header(self._headers.get(b"content-disposition"))
+        part.field_name = options.get(b"name", b"").decode("utf-8", "replace")
+        if part.field_name != self.field_name or b"filename" not in options:
+            # Not one of the uploaded files; its data is skipped
+            return
+
+        part.filename = options[b"filename"].decode("utf-8", "replace")
+        if b"content-type" in self._headers:
+            part.content_type = self._headers[b"content-type"].decode("latin-1").strip()
+        self.parts.append(part)
+
+        is_valid, message = FileManager.validate_image(part.content_type, 0)
+        if not is_valid:
+            part.error = message
+            return
+
+        part.temp_path = FileManager.get_upload_temp_path(part.content_type)
+        part.file = open(part.temp_path, 'wb')
+        part.digest = hashlib.sha256()
+
+    def _on_part_data(self, data: bytes, start: int, end: int):
+        part = self._part
+        if part.file is None:
+            return
+
+        part.size += end - start
+        if part.size > FileManager.MAX_FILE_SIZE:
+            part.error = f"File size exceeds maximum of {FileManager.MAX_FILE_SIZE} bytes"
+            self._discard(part)
+            return
+
+        chunk = data[start:end]
+        part.file.write(chunk)
+        part.digest.update(chunk)
+
+    def _on_part_end(self):
+        part = self._part
+        self._part = None
+        if part.file is None:
+            return
+
+        part.file.close()
+        part.file = None
+        try:
+            part.url = FileManager.commit_upload(part.temp_path, part.digest.hexdigest(), part.content_type)
+        except Exception as e:
+            part.error = f"Error saving file: {str(e)}"
+            self._discard(part)
+
+    def _on_end(self):
+        self._finished = True
+
+    def _discard(self, part: UploadPart):
+        if part.file is not None:
+            part.file.close()
+            part.file = None
+        if part.temp_path is not None:
+            try:
+                os.remove(part.temp_path)
+            except OSError:
+                pass
+            part.temp_path = None
@@ -0,0 +1,69 @@
+import time
+import zipfile
+from pathlib import Path
+from typing import Iterator, Union
+
+class ZipStream:
+    """ZIP archive written on the fly as a sequence of byte chunks.
+
+    The archive goes into an unseekable sink, so ``zipfile`` emits data
+    descriptors after each entry instead of seeking back to patch the local
+    headers. Nothing but the current read chunk is held in memory, so an
+    archive of any size can be sent as it is written. The ``add_*`` methods
+    and ``close`` are generators of the bytes produced; they do blocking file
+    reads and belong on a worker thread (``iterate_in_threadpool``).
+    """
+    CHUNK_SIZE = 256 * 1024
+    MEDIA_TYPE = "application/zip"
+    # Entries stored as they are; these formats don't get smaller with deflate
+    STORED_SUFFIXES = {'.png', '.jpg', '.jpeg', '.gif', '.webp', '.avif'}
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._zip = zipfile.ZipFile(self, 'w', allowZip64=True)
+
+    def write(self, data) -> int:
+        """Sink for ``zipfile``"""
+        self._buffer += data
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def add_file(self, arcname: str, path: Union[str, Path]) -> Iterator[bytes]:
+        """Add a file from disk, stored or deflated depending on its type on disk"""
+        info = zipfile.ZipInfo.from_file(path, arcname)
+        info.compress_type = ZipStream.get_compress_type(str(path))
+        with open(path, 'rb') as src, self._zip.open(info, 'w', force_zip64=info.file_size >= zipfile.ZIP64_LIMIT) as dst:
+            while True:
+                chunk = src.read(ZipStream.CHUNK_SIZE)
+                if not chunk:
+                    break
+                dst.write(chunk)
+                if len(self._buffer) >= ZipStream.CHUNK_SIZE:
+                    yield self._drain()
+        yield self._drain()
+
+    def add_bytes(self, arcname: str, data: bytes) -> Iterator[bytes]:
+        """Add an entry from memory, such as a generated manifest"""
+        info = zipfile.ZipInfo(arcname, date_time=time.localtime()[:6])
+        info.compress_type = ZipStream.get_compress_type(arcname)
+        self._zip.writestr(info, data)
+        yield self._drain()
+
+    def close(self) -> Iterator[bytes]:
+        """Write the central directory"""
+        self._zip.close()
+        yield self._drain()
+
+    @staticmethod
+    def get_compress_type(name: str) -> int:
+        """Store already compressed images, deflate everything else"""
+        if Path(name).suffix.lower() in ZipStream.STORED_SUFFIXES:
+            return zipfile.ZIP_STORED
+        return zipfile.ZIP_DEFLATED
+
+    def _drain(self) -> bytes:
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
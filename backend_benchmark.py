@@ -0,0 +1,453 @@
+#!/usr/bin/env python3
+"""
+Local Benchmarks for Banner Maker
+Times the banner compositor and file serving against synthetic data, no server or database needed
+"""
+
+import argparse
+import asyncio
+import base64
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from PIL import Image
+from models import Project, GridSize, ExportSettings
+from render_utils import BannerRenderer, RESOLUTION_MAP, ENCODER_PROFILES
+import file_utils
+from file_utils import FileManager
+from tile_cache import TileCache
+from starlette.responses import FileResponse
+from file_responses import RangeFileResponse
+
+class CompositorBenchmark:
+    def __init__(self, work_dir: Path, repeat: int = 3):
+        self.work_dir = work_dir
+        self.repeat = repeat
+        self.results = []
+
+    def make_jpeg(self, name, size, quality=92):
+        """Write a synthetic photo-like JPEG with a gradient so it doesn't compress to nothing"""
+        path = self.work_dir / name
+        if not path.exists():
+            gradient = Image.linear_gradient('L').resize(size)
+            img = Image.merge('RGB', (gradient, gradient.rotate(90, expand=False), gradient.transpose(Image.Transpose.FLIP_LEFT_RIGHT)))
+            img.save(path, "JPEG", quality=quality)
+        return {'path': str(path), 'width': size[0], 'height': size[1], 'variants': []}
+
+    def time_render(self, project, width, height, sources):
+        """Best-of-N wall time for one composite, in milliseconds"""
+        timings = []
+        for _ in range(self.repeat):
+            start = time.perf_counter()
+            BannerRenderer.create_banner(project, width, height, sources)
+            timings.append((time.perf_counter() - start) * 1000)
+        return min(timings)
+
+    def run_reduced_decode(self, source_size=(6000, 4000)):
+        """Compare full decode against JPEG draft mode plus reduce for 2x2 and 6x6 grids"""
+        print(f"JPEG reduced decode, {source_size[0]}x{source_size[1]} sources, best of {self.repeat}")
+        print(f"{'resolution':<10} {'grid':<5} {'full ms':>10} {'reduced ms':>11} {'speedup':>8}")
+
+        for grid in (2, 6):
+            sources = [self.make_jpeg(f"source_{i}.jpg", source_size) for i in range(grid * grid)]
+            for resolution, (width, height) in RESOLUTION_MAP.items():
+                project = Project(
+                    name="benchmark",
+                    grid_size=GridSize(rows=grid, cols=grid),
+                    export_settings=ExportSettings(resolution=resolution)
+                )
+
+                BannerRenderer.USE_REDUCED_DECODE = False
+                full_ms = self.time_render(project, width, height, sources)
+                BannerRenderer.USE_REDUCED_DECODE = True
+                reduced_ms = self.time_render(project, width, height, sources)
+
+                result = {
+                    'benchmark': 'reduced_decode',
+                    'resolution': resolution,
+                    'grid': f"{grid}x{grid}",
+                    'full_ms': round(full_ms, 1),
+                    'reduced_ms': round(reduced_ms, 1),
+                    'speedup': round(full_ms / reduced_ms, 2)
+                }
+                self.results.append(result)
+                print(f"{resolution:<10} {result['grid']:<5} {result['full_ms']:>10} {result['reduced_ms']:>11} {result['speedup']:>7}x")
+
+        return self.results
+
+class FileServingBenchmark:
+    """Drives file responses through a minimal in-process ASGI server"""
+
+    def __init__(self, work_dir: Path, repeat: int = 3):
+        self.work_dir = work_dir
+        self.repeat = repeat
+        self.results = []
+
+    def make_file(self, size_mb):
+        path = self.work_dir / f"payload_{size_mb}mb.bin"
+        if not path.exists():
+            with open(path, 'wb') as f:
+                for _ in range(size_mb):
+                    f.write(os.urandom(1024 * 1024))
+        return path
+
+    async def serve(self, response, zerocopy=False):
+        """Send one response to a sink, returning the number of body bytes"""
+        sent = 0
+        sink = os.open(os.devnull, os.O_WRONLY)
+        scope = {"type": "http", "method": "GET", "headers": [], "extensions": {}}
+        if zerocopy:
+            scope["extensions"][RangeFileResponse.ZEROCOPY_EXTENSION] = {}
+
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def send(message):
+            nonlocal sent
+            if message["type"] == "http.response.body":
+                sent += len(message.get("body", b""))
+            elif message["type"] == RangeFileResponse.ZEROCOPY_EXTENSION:
+                # Simulated: what a server implementing the extension would do with the
+                # descriptor. uvicorn doesn't offer it, so production never takes this path
+                offset, remaining = message["offset"], message["count"]
+                while remaining > 0:
+                    written = os.sendfile(sink, message["file"], offset, remaining)
+                    offset += written
+                    remaining -= written
+                sent += message["count"]
+
+        try:
+            await response(scope, receive, send)
+        finally:
+            os.close(sink)
+        return sent
+
+    def run_case(self, name, make_response, zerocopy=False):
+        timings = []
+        peak_kb = 0
+        for _ in range(self.repeat):
+            tracemalloc.start()
+            start = time.perf_counter()
+            sent = asyncio.run(self.serve(make_response(), zerocopy))
+            timings.append(time.perf_counter() - start)
+            peak_kb = max(peak_kb, tracemalloc.get_traced_memory()[1] // 1024)
+            tracemalloc.stop()
+
+        seconds = min(timings)
+        result = {
+            'benchmark': 'file_serving',
+            'case': name,
+            'bytes': sent,
+            'ms': round(seconds * 1000, 1),
+            'mb_per_s': round(sent / (1024 * 1024) / seconds, 1),
+            'peak_python_kb': peak_kb,
+            # Served through the benchmark's own sendfile loop, not a real ASGI server
+            'simulated': zerocopy
+        }
+        self.results.append(result)
+        print(f"{name:<34} {result['ms']:>9} {result['mb_per_s']:>9} {result['peak_python_kb']:>9}")
+
+    def run(self, size_mb=50):
+        """Compare the old FileResponse with RangeFileResponse, full and resumed"""
+        path = self.make_file(size_mb)
+        print(f"File serving, {size_mb} MB file, best of {self.repeat}")
+        print(f"{'case':<34} {'ms':>9} {'MB/s':>9} {'peak KB':>9}")
+
+        self.run_case("FileResponse (before)", lambda: FileResponse(path))
+        self.run_case("RangeFileResponse chunked", lambda: RangeFileResponse(path))
+        resume = f"bytes={size_mb * 1024 * 1024 // 2}-"
+        self.run_case("RangeFileResponse resume at 50%", lambda: RangeFileResponse(path, range_header=resume))
+        # The benchmark's own server calls os.sendfile; not a figure any deployed server produces
+        print("Simulated zerocopysend server (uvicorn doesn't implement the extension):")
+        self.run_case("sendfile, simulated server", lambda: RangeFileResponse(path), zerocopy=True)
+        self.run_case("resume, sendfile, simulated server", lambda: RangeFileResponse(path, range_header=resume),
+                      zerocopy=True)
+        return self.results
+
+class PeakRSS:
+    """Peak resident set size of this process.
+
+    On Linux the high-water mark is reset between cases through
+    /proc/self/clear_refs, so each case reports its own peak (which includes
+    the interpreter and everything still alive). Elsewhere it can only grow
+    over the run.
+    """
+
+    @staticmethod
+    def reset():
+        try:
+            with open("/proc/self/clear_refs", "w") as f:
+                f.write("5")
+        except OSError:
+            pass
+
+    @staticmethod
+    def peak_kb():
+        try:
+            with open("/proc/self/status") as f:
+                for line in f:
+                    if line.startswith("VmHWM:"):
+                        return int(line.split()[1])
+        except OSError:
+            pass
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in bytes on macOS and KB elsewhere
+        return peak // 1024 if sys.platform == "darwin" else peak
+
+class BenchmarkSuite:
+    """Compositor, ingest and encoder cases measured against stored baselines"""
+    SOURCE_MODES = ("RGB", "RGBA", "P")
+    # Cycled through so a grid mixes large photos with small graphics
+    SOURCE_SIZES = [(3000, 2000), (1200, 1600), (800, 800), (400, 300)]
+    # Absolute slack on top of the relative tolerance, so tiny cases don't flap
+    MIN_SLACK_MS = 5.0
+    MIN_SLACK_KB = 8 * 1024
+
+    def __init__(self, work_dir: Path, repeat: int = 3, resolutions=None, all_grids=False):
+        self.work_dir = work_dir
+        self.repeat = repeat
+        self.resolutions = resolutions or list(RESOLUTION_MAP)
+        if all_grids:
+            self.grids = [(rows, cols) for rows in range(1, 7) for cols in range(1, 7)]
+        else:
+            self.grids = [(size, size) for size in range(1, 7)]
+        self.results = []
+
+    def make_source(self, mode, index):
+        """Write a synthetic source image: a JPEG photo, an RGBA PNG or a palette PNG with transparency"""
+        width, height = self.SOURCE_SIZES[index % len(self.SOURCE_SIZES)]
+        extension = "jpg" if mode == "RGB" else "png"
+        path = self.work_dir / f"source_{mode.lower()}_{width}x{height}.{extension}"
+        if not path.exists():
+            gradient = Image.linear_gradient('L').resize((width, height))
+            img = Image.merge('RGB', (gradient, gradient.rotate(90), gradient.transpose(Image.Transpose.FLIP_LEFT_RIGHT)))
+            if mode == "RGB":
+                img.save(path, "JPEG", quality=92)
+            elif mode == "RGBA":
+                img.putalpha(Image.radial_gradient('L').resize((width, height)))
+                img.save(path, "PNG")
+            else:
+                img = img.quantize(64)
+                img.info['transparency'] = 0
+                img.save(path, "PNG", transparency=0)
+        return {'path': str(path), 'width': width, 'height': height, 'variants': []}
+
+    def measure(self, benchmark, case, func, after=None, **details):
+        """Best-of-N wall time and the highest peak RSS over the runs"""
+        timings = []
+        peak_kb = 0
+        for _ in range(self.repeat):
+            PeakRSS.reset()
+            start = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - start) * 1000)
+            peak_kb = max(peak_kb, PeakRSS.peak_kb())
+            if after:
+                after()
+
+        result = {'benchmark': benchmark, 'case': case, 'ms': round(min(timings), 1), 'peak_rss_kb': peak_kb, **details}
+        self.results.append(result)
+        print(f"{benchmark + '/' + case:<40} {result['ms']:>10} {peak_kb / 1024:>10.1f}")
+        return result
+
+    def run_compositor(self):
+        """create_banner for every grid, resolution preset and source mode, with the tile cache off"""
+        max_bytes, TileCache.MAX_BYTES = TileCache.MAX_BYTES, 0
+        try:
+            for resolution in self.resolutions:
+                width, height = RESOLUTION_MAP[resolution]
+                for rows, cols in self.grids:
+                    project = Project(
+                        name="benchmark",
+                        grid_size=GridSize(rows=rows, cols=cols),
+                        export_settings=ExportSettings(resolution=resolution)
+                    )
+                    for mode in self.SOURCE_MODES:
+                        sources = [self.make_source(mode, i) for i in range(rows * cols)]
+                        self.measure(
+                            "compositor", f"{resolution}/{rows}x{cols}/{mode.lower()}",
+                            lambda: BannerRenderer.create_banner(project, width, height, sources)
+                        )
+        finally:
+            TileCache.MAX_BYTES = max_bytes
+
+    @contextlib.contextmanager
+    def use_storage(self):
+        """Point blob and variant storage at the work dir instead of the real uploads directory"""
+        saved = (file_utils.BLOB_DIR, file_utils.THUMBNAIL_DIR, file_utils.STORAGE_DIRS)
+        file_utils.BLOB_DIR = self.work_dir / "blobs"
+        file_utils.THUMBNAIL_DIR = self.work_dir / "thumbnails"
+        file_utils.STORAGE_DIRS = [self.work_dir, file_utils.THUMBNAIL_DIR]
+        file_utils.BLOB_DIR.mkdir(exist_ok=True)
+        file_utils.THUMBNAIL_DIR.mkdir(exist_ok=True)
+        try:
+            yield
+        finally:
+            file_utils.BLOB_DIR, file_utils.THUMBNAIL_DIR, file_utils.STORAGE_DIRS = saved
+
+    def run_ingest(self):
+        """save_base64_image and variant generation for each source mode"""
+        with self.use_storage():
+            self.run_ingest_cases()
+
+    def run_ingest_cases(self):
+        for mode in self.SOURCE_MODES:
+            source = self.make_source(mode, 0)
+            content_type = "image/jpeg" if mode == "RGB" else "image/png"
+            with open(source['path'], 'rb') as f:
+                payload = base64.b64encode(f.read()).decode()
+
+            saved = {}
+
+            def save():
+                success, message, url = FileManager.save_base64_image(payload, Path(source['path']).name, content_type)
+                if not success:
+                    raise RuntimeError(message)
+                saved['filename'] = url.split('/')[-1]
+
+            def delete_saved():
+                # Identical content is deduplicated, so every run must write a new file
+                FileManager.delete_file(saved['filename'])
+
+            self.measure("ingest", f"save_base64/{mode.lower()}", save, after=delete_saved,
+                         bytes=len(payload))
+
+            save()
+            variants = {}
+
+            def create_variants():
+                variants['info'] = FileManager.create_image_variants(saved['filename'])
+
+            def delete_variants():
+                for variant in variants['info']['variants']:
+                    FileManager.delete_file(variant['url'].split('/')[-1])
+
+            self.measure("ingest", f"variants/{mode.lower()}", create_variants, after=delete_variants)
+            delete_saved()
+
+    def run_encoders(self, resolution="2K"):
+        """Every available format and encoder profile, rendered the way the export routes do"""
+        width, height = RESOLUTION_MAP[resolution]
+        sources = [self.make_source(self.SOURCE_MODES[i % len(self.SOURCE_MODES)], i) for i in range(9)]
+
+        for file_format in ("png", "jpg", "webp", "avif"):
+            if not BannerRenderer.is_format_supported(file_format):
+                print(f"{'encode/' + file_format:<40} not available")
+                continue
+            for profile in ENCODER_PROFILES:
+                project = Project(name="benchmark", grid_size=GridSize(rows=3, cols=3),
+                                  export_settings=ExportSettings(format=file_format, resolution=resolution,
+                                                                 profile=profile))
+                output = {}
+
+                def encode():
+                    buffer = io.BytesIO()
+                    BannerRenderer.render_to_stream(project, width, height, sources, buffer)
+                    output['bytes'] = buffer.tell()
+
+                result = self.measure("encode", f"{file_format}/{profile}/{resolution}", encode)
+                result['bytes'] = output['bytes']
+
+    def run(self, only=None):
+        print(f"Benchmark suite, best of {self.repeat}")
+        print(f"{'case':<40} {'ms':>10} {'peak MB':>10}")
+        if only in (None, "compositor"):
+            self.run_compositor()
+        if only in (None, "ingest"):
+            self.run_ingest()
+        if only in (None, "encode"):
+            self.run_encoders()
+        return self.results
+
+    @staticmethod
+    def compare(results, baseline, time_tolerance, rss_tolerance):
+        """List the cases that got slower or bigger than the baseline allows"""
+        baseline_cases = {f"{result['benchmark']}/{result['case']}": result for result in baseline.get('results', [])}
+        regressions = []
+        for result in results:
+            name = f"{result['benchmark']}/{result['case']}"
+            expected = baseline_cases.get(name)
+            if not expected:
+                continue
+            if result['ms'] > expected['ms'] * (1 + time_tolerance) + BenchmarkSuite.MIN_SLACK_MS:
+                regressions.append(f"{name}: {result['ms']} ms, baseline {expected['ms']} ms")
+            if result['peak_rss_kb'] > expected['peak_rss_kb'] * (1 + rss_tolerance) + BenchmarkSuite.MIN_SLACK_KB:
+                regressions.append(f"{name}: peak RSS {result['peak_rss_kb']} KB, baseline {expected['peak_rss_kb']} KB")
+        return regressions
+
+def main():
+    """Main benchmark execution"""
+    parser = argparse.ArgumentParser(description="Banner Maker local benchmarks")
+    parser.add_argument("benchmark", nargs="?", default="decode", choices=["decode", "serving", "suite"],
+                        help="decode: JPEG reduced decode in the compositor; serving: file response throughput; "
+                             "suite: compositor, ingest and encoders checked against a baseline")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per case, the fastest is reported")
+    parser.add_argument("--output", type=Path, help="write results as JSON to this file")
+    parser.add_argument("--only", choices=["compositor", "ingest", "encode"], help="suite: run one group of cases")
+    parser.add_argument("--resolution", action="append", choices=list(RESOLUTION_MAP),
+                        help="suite: compositor resolution preset, may be repeated (default: all)")
+    parser.add_argument("--all-grids", action="store_true",
+                        help="suite: every rows x cols combination instead of square grids only")
+    parser.add_argument("--baseline", type=Path, default=Path(__file__).parent / "benchmark_baseline.json",
+                        help="suite: baseline results to compare against")
+    parser.add_argument("--update-baseline", action="store_true", help="suite: store these results as the baseline")
+    parser.add_argument("--time-tolerance", type=float, default=0.25,
+                        help="suite: allowed slowdown over the baseline, as a fraction")
+    parser.add_argument("--rss-tolerance", type=float, default=0.25,
+                        help="suite: allowed peak RSS growth over the baseline, as a fraction")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="banner_bench_") as work_dir:
+        if args.benchmark == "serving":
+            results = FileServingBenchmark(Path(work_dir), repeat=args.repeat).run()
+        elif args.benchmark == "suite":
+            suite = BenchmarkSuite(Path(work_dir), repeat=args.repeat, resolutions=args.resolution,
+                                   all_grids=args.all_grids)
+            results = suite.run(args.only)
+        else:
+            results = CompositorBenchmark(Path(work_dir), repeat=args.repeat).run_reduced_decode()
+
+    report = {'timestamp': datetime.now().isoformat(), 'machine': platform.platform(), 'results': results}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults saved to: {args.output}")
+
+    if args.benchmark != "suite":
+        return
+
+    if args.update_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline saved to: {args.baseline}")
+        return
+
+    if not args.baseline.exists():
+        print(f"No baseline at {args.baseline}, run with --update-baseline to store one")
+        return
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = BenchmarkSuite.compare(results, baseline, args.time_tolerance, args.rss_tolerance)
+    if regressions:
+        print(f"\n{len(regressions)} regressions against {args.baseline}:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+    print(f"\nNo regressions against {args.baseline}")
+
+if __name__ == "__main__":
+    main()
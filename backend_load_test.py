@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+Load Testing for Banner Maker
+Drives mixed API traffic against the in-process app (or a running server) and reports latency per route
+"""
+
+import argparse
+import asyncio
+import base64
+import io
+import json
+import math
+import os
+import random
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import httpx
+from PIL import Image
+
+BACKEND_DIR = Path(__file__).parent / "backend"
+
+class BannerMakerLoadTester:
+    """Mixed traffic from concurrent virtual users, timed per route.
+
+    Each user picks a weighted random operation in a loop: project CRUD,
+    base64 and multipart uploads, /files serving, exports and downloads.
+    Latencies are grouped by route template. When the app runs in this
+    process, a probe task also measures how late the event loop wakes up,
+    which shows handlers that block it. With mongomock-motor every database
+    call runs on the event loop, so loop lag there includes the mock.
+    """
+    # Relative frequency of each operation
+    TRAFFIC_MIX = {
+        'list_projects': 20,
+        'get_project': 20,
+        'create_project': 5,
+        'update_project': 10,
+        'upload_base64': 5,
+        'upload_files': 5,
+        'get_file': 25,
+        'export': 5,
+        'download': 5,
+    }
+    LOOP_PROBE_INTERVAL = 0.01
+
+    def __init__(self, client: httpx.AsyncClient, concurrency: int = 10, seed_projects: int = 5,
+                 image_size: int = 800):
+        self.client = client
+        self.concurrency = concurrency
+        self.seed_projects = seed_projects
+        self.image_size = image_size
+        self.project_ids = []
+        self.image_ids = []
+        self.file_urls = []
+        # route -> [(seconds, status code)]
+        self.samples = {}
+        self.loop_lag = []
+
+    def create_test_image(self, fmt='PNG'):
+        """Encode a small image with a random color, so uploads aren't deduplicated"""
+        color = tuple(random.randrange(256) for _ in range(3))
+        img = Image.new('RGB', (self.image_size, self.image_size * 3 // 4), color)
+        buffer = io.BytesIO()
+        img.save(buffer, format=fmt)
+        return buffer.getvalue()
+
+    async def request(self, route, method, url, **kwargs):
+        """Send one request, recording its latency under the route template"""
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+            status = response.status_code
+        except httpx.HTTPError:
+            response = None
+            status = 0
+        self.samples.setdefault(route, []).append((time.perf_counter() - start, status))
+        return response
+
+    async def setup(self):
+        """Create the projects and images the read and export traffic works on"""
+        for _ in range(self.seed_projects):
+            await self.upload_base64()
+            await self.upload_base64()
+            await self.create_project()
+            if self.project_ids:
+                await self.client.put(f"/api/projects/{self.project_ids[-1]}", json={
+                    'images': self.image_ids[-2:],
+                    'export_settings': {'format': 'jpg', 'resolution': '1080p'},
+                })
+        # Setup traffic isn't part of the measurement
+        self.samples = {}
+        if not self.project_ids or not self.file_urls:
+            raise RuntimeError("Setup failed: could not create projects and images")
+
+    async def list_projects(self):
+        await self.request("GET /api/projects/", "GET", "/api/projects/")
+
+    async def get_project(self):
+        project_id = random.choice(self.project_ids)
+        await self.request("GET /api/projects/{id}", "GET", f"/api/projects/{project_id}")
+
+    async def create_project(self):
+        response = await self.request("POST /api/projects/", "POST", "/api/projects/",
+                                      json={'name': f"Load Test {len(self.project_ids) + 1}"})
+        if response is not None and response.status_code == 200:
+            self.project_ids.append(response.json()['id'])
+
+    async def update_project(self):
+        project_id = random.choice(self.project_ids)
+        color = f"#{random.randrange(0x1000000):06x}"
+        await self.request("PUT /api/projects/{id}", "PUT", f"/api/projects/{project_id}",
+                           json={'background_color': color})
+
+    async def upload_base64(self):
+        data = base64.b64encode(self.create_test_image()).decode()
+        images_data = json.dumps([{'name': 'load.png', 'size': len(data), 'content_type': 'image/png', 'data': data}])
+        response = await self.request("POST /api/images/upload", "POST", "/api/images/upload",
+                                      data={'images_data': images_data})
+        self.remember_images(response)
+
+    async def upload_files(self):
+        files = [('files', ('load.jpg', self.create_test_image('JPEG'), 'image/jpeg'))]
+        response = await self.request("POST /api/images/upload-files", "POST", "/api/images/upload-files", files=files)
+        self.remember_images(response)
+
+    def remember_images(self, response):
+        if response is None or response.status_code != 200:
+            return
+        for image in response.json().get('images', []):
+            self.image_ids.append(image['id'])
+            self.file_urls.append(image['url'])
+
+    async def get_file(self):
+        await self.request("GET /api/files/{filename}", "GET", random.choice(self.file_urls))
+
+    async def export(self):
+        project_id = random.choice(self.project_ids)
+        await self.request("POST /api/export/{id}/generate", "POST", f"/api/export/{project_id}/generate")
+
+    async def download(self):
+        project_id = random.choice(self.project_ids)
+        await self.request("GET /api/export/{id}/download", "GET", f"/api/export/{project_id}/download")
+
+    async def user(self, deadline, remaining):
+        """One virtual user sending requests back to back"""
+        operations = list(self.TRAFFIC_MIX)
+        weights = [self.TRAFFIC_MIX[name] for name in operations]
+        while time.perf_counter() < deadline and remaining[0] != 0:
+            remaining[0] -= 1
+            await getattr(self, random.choices(operations, weights)[0])()
+
+    async def probe_loop(self):
+        """Measure how much later than scheduled the event loop wakes up"""
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.LOOP_PROBE_INTERVAL)
+            self.loop_lag.append(time.perf_counter() - start - self.LOOP_PROBE_INTERVAL)
+
+    async def run(self, duration=30.0, total_requests=None, probe=False):
+        """Run the traffic for ``duration`` seconds or ``total_requests`` requests, whichever ends first"""
+        await self.setup()
+        # A shared countdown; -1 means no request limit
+        remaining = [total_requests if total_requests else -1]
+        probe_task = asyncio.create_task(self.probe_loop()) if probe else None
+
+        start = time.perf_counter()
+        deadline = start + duration
+        await asyncio.gather(*(self.user(deadline, remaining) for _ in range(self.concurrency)))
+        elapsed = time.perf_counter() - start
+
+        if probe_task:
+            probe_task.cancel()
+        return self.summarize(elapsed)
+
+    async def cleanup(self):
+        """Delete the projects and images created by the run"""
+        for project_id in self.project_ids:
+            await self.client.delete(f"/api/projects/{project_id}")
+        for image_id in self.image_ids:
+            await self.client.delete(f"/api/images/{image_id}")
+
+    @staticmethod
+    def percentile(sorted_values, fraction):
+        """Nearest-rank percentile of an ascending list"""
+        if not sorted_values:
+            return 0.0
+        index = max(0, min(len(sorted_values) - 1, math.ceil(fraction * len(sorted_values)) - 1))
+        return sorted_values[index]
+
+    def summarize(self, elapsed):
+        routes = {}
+        total = 0
+        for route, samples in sorted(self.samples.items()):
+            latencies = sorted(seconds * 1000 for seconds, _ in samples)
+            statuses = {}
+            for _, status in samples:
+                statuses[str(status)] = statuses.get(str(status), 0) + 1
+            routes[route] = {
+                'requests': len(samples),
+                'errors': sum(1 for _, status in samples if status == 0 or status >= 500),
+                'statuses': statuses,
+                'throughput_rps': round(len(samples) / elapsed, 2),
+                'p50_ms': round(self.percentile(latencies, 0.50), 1),
+                'p95_ms': round(self.percentile(latencies, 0.95), 1),
+                'p99_ms': round(self.percentile(latencies, 0.99), 1),
+                'max_ms': round(latencies[-1], 1),
+            }
+            total += len(samples)
+
+        summary = {
+            'timestamp': datetime.now().isoformat(),
+            'concurrency': self.concurrency,
+            'duration_s': round(elapsed, 2),
+            'requests': total,
+            'throughput_rps': round(total / elapsed, 2),
+            'routes': routes,
+        }
+        if self.loop_lag:
+            lag = sorted(seconds * 1000 for seconds in self.loop_lag)
+            summary['event_loop_lag_ms'] = {
+                'p50': round(self.percentile(lag, 0.50), 1),
+                'p99': round(self.percentile(lag, 0.99), 1),
+                'max': round(lag[-1], 1),
+            }
+        return summary
+
+    @staticmethod
+    def print_summary(summary):
+        print(f"{summary['requests']} requests in {summary['duration_s']}s at concurrency {summary['concurrency']}, "
+              f"{summary['throughput_rps']} req/s")
+        print(f"{'route':<34} {'count':>6} {'err':>4} {'req/s':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+        for route, stats in summary['routes'].items():
+            print(f"{route:<34} {stats['requests']:>6} {stats['errors']:>4} {stats['throughput_rps']:>7} "
+                  f"{stats['p50_ms']:>8} {stats['p95_ms']:>8} {stats['p99_ms']:>8} {stats['max_ms']:>8}")
+        if 'event_loop_lag_ms' in summary:
+            lag = summary['event_loop_lag_ms']
+            print(f"Event loop lag: p50 {lag['p50']} ms, p99 {lag['p99']} ms, max {lag['max']} ms")
+
+def load_app(mongo_url=None, db_name="banner_load_test"):
+    """Import the backend app, backed by mongomock-motor unless a MongoDB URL is given"""
+    os.environ['MONGO_URL'] = mongo_url or "mongodb://localhost:27017"
+    os.environ['DB_NAME'] = db_name
+    sys.path.insert(0, str(BACKEND_DIR))
+    # Relative paths in the backend (fonts and such) are resolved from its directory
+    os.chdir(BACKEND_DIR)
+
+    import database
+    if not mongo_url:
+        try:
+            from mongomock_motor import AsyncMongoMockClient
+        except ImportError:
+            print("mongomock-motor is not installed; pip install mongomock-motor or pass --mongo-url")
+            sys.exit(1)
+        database.create_client = lambda: AsyncMongoMockClient()
+
+    import server
+    return server.app
+
+async def run_load_test(args):
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=args.timeout)
+        lifespan = None
+    else:
+        app = load_app(args.mongo_url, args.db_name)
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://load-test",
+                                   timeout=args.timeout)
+        # ASGITransport doesn't send lifespan events, so run the app's startup and shutdown here
+        lifespan = app.router.lifespan_context(app)
+        await lifespan.__aenter__()
+
+    tester = BannerMakerLoadTester(client, concurrency=args.concurrency, seed_projects=args.seed_projects,
+                                   image_size=args.image_size)
+    try:
+        summary = await tester.run(duration=args.duration, total_requests=args.requests, probe=not args.url)
+        if not args.keep_data:
+            await tester.cleanup()
+    finally:
+        await client.aclose()
+        if lifespan:
+            await lifespan.__aexit__(None, None, None)
+    return summary
+
+def main():
+    """Main load test execution"""
+    parser = argparse.ArgumentParser(description="Banner Maker API load test")
+    parser.add_argument("--concurrency", type=int, default=10, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds to run")
+    parser.add_argument("--requests", type=int, help="stop after this many requests")
+    parser.add_argument("--url", help="test a running server at this base URL instead of the in-process app")
+    parser.add_argument("--mongo-url", help="in-process app: use this MongoDB instead of mongomock-motor")
+    parser.add_argument("--db-name", default="banner_load_test", help="in-process app: database name")
+    parser.add_argument("--seed-projects", type=int, default=5, help="projects created before the run")
+    parser.add_argument("--image-size", type=int, default=800, help="width of uploaded test images")
+    parser.add_argument("--timeout", type=float, default=60.0, help="per-request timeout in seconds")
+    parser.add_argument("--keep-data", action="store_true", help="don't delete the created projects and images")
+    parser.add_argument("--output", type=Path, help="write the summary as JSON to this file")
+    args = parser.parse_args()
+    if args.output:
+        # The in-process app changes into the backend directory
+        args.output = args.output.resolve()
+
+    try:
+        summary = asyncio.run(run_load_test(args))
+    except KeyboardInterrupt:
+        print("\nLoad test interrupted by user")
+        sys.exit(1)
+
+    BannerMakerLoadTester.print_summary(summary)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(summary, f, indent=2)
+        print(f"\nSummary saved to: {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -38,7 +38,8 @@ const BannerMaker = () => {
   const [exportSettings, setExportSettings] = useState({
     format: 'png',
     quality: 90,
-    resolution: '2K'
+    resolution: '2K',
+    profile: 'balanced'
   });
   const [zoomLevel, setZoomLevel] = useState(1);
   const [isSaving, setIsSaving] = useState(false);
@@ -77,7 +78,8 @@ const BannerMaker = () => {
   const resolutionOptions = {
     '1080p': { width: 1920, height: 1080 },
     '2K': { width: 2048, height: 2048 },
-    '4K': { width: 4096, height: 4096 }
+    '4K': { width: 4096, height: 4096 },
+    '8K': { width: 8192, height: 8192 }
   };
 
   // Save to history for undo functionality
@@ -170,7 +172,8 @@ const BannerMaker = () => {
         exportSettings: {
           format: 'png',
           quality: 90,
-          resolution: '2K'
+          resolution: '2K',
+          profile: 'balanced'
         },
         timestamp: Date.now()
       };
@@ -232,7 +235,8 @@ const BannerMaker = () => {
         export_settings: {
           format: exportSettings.format || 'png',
           quality: Math.max(10, Math.min(100, exportSettings.quality || 90)),
-          resolution: exportSettings.resolution || '2K'
+          resolution: exportSettings.resolution || '2K',
+          profile: exportSettings.profile || 'balanced'
         }
       };
       
@@ -298,7 +302,7 @@ const BannerMaker = () => {
       await handleSaveProject();
       
       // Then export the banner
-      await downloadBanner(currentProject.id, currentProject.name);
+      await downloadBanner(currentProject.id, currentProject.name, exportSettings.format);
       
       // Show success message
       alert(`Banner exported successfully as ${exportSettings.format.toUpperCase()}!`);
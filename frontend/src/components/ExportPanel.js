@@ -1,4 +1,4 @@
-import React from 'react';
+import React, { useEffect } from 'react';
 import { Button } from './ui/button';
 import { Card } from './ui/card';
 import { Label } from './ui/label';
@@ -12,28 +12,52 @@ import {
   FileIcon,
   ZapIcon
 } from 'lucide-react';
+import { useExportFormats } from '../hooks/useApi';
 
 const ExportPanel = ({ exportSettings, onExportSettingsChange, onExport }) => {
   const formatOptions = [
     { value: 'png', label: 'PNG', description: 'Best quality, supports transparency' },
-    { value: 'jpg', label: 'JPG', description: 'Smaller file size, good for photos' }
+    { value: 'jpg', label: 'JPG', description: 'Smaller file size, good for photos' },
+    { value: 'webp', label: 'WebP', description: 'Smaller than JPG, for the web' },
+    { value: 'avif', label: 'AVIF', description: 'Smallest files, newer browsers' }
   ];
 
+  // Only offer what this server can encode (WebP and AVIF depend on its Pillow build)
+  const supportedFormats = useExportFormats();
+  const availableFormatOptions = supportedFormats
+    ? formatOptions.filter(option => supportedFormats.includes(option.value))
+    : formatOptions;
+
   const resolutionOptions = [
     { value: '1080p', label: '1080p (1920×1080)', description: 'Standard HD' },
     { value: '2K', label: '2K (2048×2048)', description: 'High quality' },
-    { value: '4K', label: '4K (4096×4096)', description: 'Ultra high quality' }
+    { value: '4K', label: '4K (4096×4096)', description: 'Ultra high quality' },
+    { value: '8K', label: '8K (8192×8192)', description: 'Print quality' }
+  ];
+
+  const profileOptions = [
+    { value: 'fast', label: 'Fast', description: 'Quickest export, larger file' },
+    { value: 'balanced', label: 'Balanced', description: 'Good compression at reasonable speed' },
+    { value: 'smallest', label: 'Smallest', description: 'Slowest export, smallest file' },
+    { value: 'progressive', label: 'Progressive', description: 'JPG loads gradually in browsers' }
   ];
 
   const handleSettingChange = (key, value) => {
     onExportSettingsChange(prev => ({ ...prev, [key]: value }));
   };
 
+  useEffect(() => {
+    if (supportedFormats && !supportedFormats.includes(exportSettings.format)) {
+      onExportSettingsChange(prev => ({ ...prev, format: 'png' }));
+    }
+  }, [supportedFormats, exportSettings.format, onExportSettingsChange]);
+
   const getEstimatedFileSize = () => {
     const resolutions = {
       '1080p': { width: 1920, height: 1080 },
       '2K': { width: 2048, height: 2048 },
-      '4K': { width: 4096, height: 4096 }
+      '4K': { width: 4096, height: 4096 },
+      '8K': { width: 8192, height: 8192 }
     };
     
     const res = resolutions[exportSettings.resolution];
@@ -54,7 +78,8 @@ const ExportPanel = ({ exportSettings, onExportSettingsChange, onExport }) => {
     const resolutions = {
       '1080p': { width: 1920, height: 1080 },
       '2K': { width: 2048, height: 2048 },
-      '4K': { width: 4096, height: 4096 }
+      '4K': { width: 4096, height: 4096 },
+      '8K': { width: 8192, height: 8192 }
     };
     return resolutions[exportSettings.resolution];
   };
@@ -84,7 +109,7 @@ const ExportPanel = ({ exportSettings, onExportSettingsChange, onExport }) => {
               <SelectValue />
             </SelectTrigger>
             <SelectContent>
-              {formatOptions.map(option => (
+              {availableFormatOptions.map(option => (
                 <SelectItem key={option.value} value={option.value}>
                   <div>
                     <div className="font-medium">{option.label}</div>
@@ -95,7 +120,7 @@ const ExportPanel = ({ exportSettings, onExportSettingsChange, onExport }) => {
             </SelectContent>
           </Select>
 
-          {exportSettings.format === 'jpg' && (
+          {exportSettings.format !== 'png' && (
             <div>
               <div className="flex items-center justify-between mb-2">
                 <Label className="text-sm font-medium text-gray-700">
@@ -123,6 +148,33 @@ const ExportPanel = ({ exportSettings, onExportSettingsChange, onExport }) => {
         </div>
       </Card>
 
+      {/* Encoding Profile */}
+      <Card className="p-4">
+        <div className="flex items-center space-x-2 mb-3">
+          <FileIcon className="h-4 w-4 text-gray-600" />
+          <h4 className="text-md font-medium text-gray-900">Encoding</h4>
+        </div>
+        
+        <Select 
+          value={exportSettings.profile || 'balanced'} 
+          onValueChange={(value) => handleSettingChange('profile', value)}
+        >
+          <SelectTrigger>
+            <SelectValue />
+          </SelectTrigger>
+          <SelectContent>
+            {profileOptions.map(option => (
+              <SelectItem key={option.value} value={option.value}>
+                <div>
+                  <div className="font-medium">{option.label}</div>
+                  <div className="text-xs text-gray-500">{option.description}</div>
+                </div>
+              </SelectItem>
+            ))}
+          </SelectContent>
+        </Select>
+      </Card>
+
       {/* Resolution Settings */}
       <Card className="p-4">
         <div className="flex items-center space-x-2 mb-3">
@@ -198,7 +250,7 @@ const ExportPanel = ({ exportSettings, onExportSettingsChange, onExport }) => {
             <span className="text-gray-600">Resolution:</span>
             <span className="font-medium">{exportSettings.resolution}</span>
           </div>
-          {exportSettings.format === 'jpg' && (
+          {exportSettings.format !== 'png' && (
             <div className="flex justify-between">
               <span className="text-gray-600">Quality:</span>
               <span className="font-medium">{exportSettings.quality}%</span>
@@ -1,4 +1,4 @@
-import { useState, useCallback } from 'react';
+import { useState, useCallback, useEffect } from 'react';
 import { apiService } from '../services/api';
 
 export const useImageUpload = () => {
@@ -197,7 +197,7 @@ export const useExport = () => {
     }
   }, []);
 
-  const downloadBanner = useCallback(async (projectId, filename = 'banner') => {
+  const downloadBanner = useCallback(async (projectId, filename = 'banner', format = 'png') => {
     setIsExporting(true);
     setExportError(null);
     setExportProgress(0);
@@ -207,7 +207,7 @@ export const useExport = () => {
         setExportProgress(prev => Math.min(prev + 20, 90));
       }, 200);
 
-      const blob = await apiService.downloadBanner(projectId);
+      const { blob, filename: serverFilename } = await apiService.downloadBanner(projectId);
       
       clearInterval(progressInterval);
       setExportProgress(100);
@@ -216,7 +216,11 @@ export const useExport = () => {
       const url = window.URL.createObjectURL(blob);
       const link = document.createElement('a');
       link.href = url;
-      link.download = `${filename}.png`;
+      // The server's filename carries the extension of the format it actually encoded
+      const extension = serverFilename && serverFilename.includes('.')
+        ? serverFilename.split('.').pop()
+        : format;
+      link.download = `${filename}.${extension}`;
       document.body.appendChild(link);
       link.click();
       document.body.removeChild(link);
@@ -248,4 +252,25 @@ export const useExport = () => {
     downloadBanner,
     clearError
   };
-};
\ No newline at end of file
+};
+
+export const useExportFormats = () => {
+  // null until the server has answered, so nothing is hidden on a failed request
+  const [formats, setFormats] = useState(null);
+
+  useEffect(() => {
+    let cancelled = false;
+    apiService.getExportFormats()
+      .then(result => {
+        if (!cancelled) setFormats(result);
+      })
+      .catch(error => {
+        console.error('Failed to load export formats:', error);
+      });
+    return () => {
+      cancelled = true;
+    };
+  }, []);
+
+  return formats;
+};
@@ -132,11 +132,19 @@ export const apiService = {
     return response.data;
   },
 
+  async getExportFormats() {
+    const response = await api.get('/api/export/formats');
+    return response.data.formats;
+  },
+
   async downloadBanner(projectId) {
     const response = await api.get(`/api/export/${projectId}/download`, {
       responseType: 'blob'
     });
-    return response.data;
+    return {
+      blob: response.data,
+      filename: getDispositionFilename(response.headers['content-disposition'])
+    };
   },
 
   // Health check
@@ -146,6 +154,22 @@ export const apiService = {
   }
 };
 
+// Helper function to read the filename out of a Content-Disposition header,
+// preferring the UTF-8 filename* over the ASCII fallback
+const getDispositionFilename = (disposition) => {
+  if (!disposition) return null;
+  const encoded = disposition.match(/filename\*=UTF-8''([^;]+)/i);
+  if (encoded) {
+    try {
+      return decodeURIComponent(encoded[1]);
+    } catch (e) {
+      // Malformed encoding, fall back to the plain filename
+    }
+  }
+  const match = disposition.match(/filename="([^"]*)"|filename=([^;]+)/);
+  return match ? (match[1] || match[2]) : null;
+};
+
 // Helper function to convert file to base64
 const fileToBase64 = (file) => {
   return new Promise((resolve, reject) => {
@@ -0,0 +1,52 @@
+import sys
+from collections import OrderedDict
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    """Point upload, blob, variant and render storage at a temporary directory"""
+    import file_utils
+
+    import render_cache
+    from routes import export
+
+    blob_dir = tmp_path / "blobs"
+    render_dir = tmp_path / "renders"
+    thumbnail_dir = tmp_path / "thumbnails"
+    for directory in (blob_dir, render_dir, thumbnail_dir):
+        directory.mkdir()
+    monkeypatch.setattr(file_utils, "UPLOAD_DIR", tmp_path)
+    monkeypatch.setattr(file_utils, "BLOB_DIR", blob_dir)
+    monkeypatch.setattr(file_utils, "RENDER_DIR", render_dir)
+    monkeypatch.setattr(file_utils, "THUMBNAIL_DIR", thumbnail_dir)
+    monkeypatch.setattr(file_utils, "STORAGE_DIRS", [tmp_path, render_dir, thumbnail_dir])
+    monkeypatch.setattr(export, "UPLOAD_DIR", tmp_path)
+    monkeypatch.setattr(render_cache, "RENDER_DIR", render_dir)
+    monkeypatch.setattr(render_cache.RenderCache, "_entries", OrderedDict())
+    monkeypatch.setattr(render_cache.RenderCache, "_total_bytes", 0)
+    monkeypatch.setattr(render_cache.RenderCache, "_loaded", False)
+    # Cached metadata would point at files from an earlier test
+    monkeypatch.setattr(file_utils.FileManager, "_metadata_cache", OrderedDict())
+    monkeypatch.setattr(file_utils.FileManager, "_hash_cache", OrderedDict())
+    return tmp_path
+
+
+@pytest.fixture
+def client(storage, monkeypatch):
+    """TestClient for the API backed by an in-memory MongoDB"""
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    from fastapi.testclient import TestClient
+
+    monkeypatch.setenv("MONGO_URL", "mongodb://localhost:27017")
+    monkeypatch.setenv("DB_NAME", "banner_maker_test")
+    import database
+    import server
+
+    monkeypatch.setattr(database, "AsyncIOMotorClient", mongomock_motor.AsyncMongoMockClient)
+    with TestClient(server.app) as test_client:
+        yield test_client
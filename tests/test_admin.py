@@ -0,0 +1,30 @@
+import pytest
+
+from routes import admin
+
+ENDPOINTS = ["/api/admin/indexes", "/api/admin/render-stats"]
+
+
+@pytest.mark.parametrize("url", ENDPOINTS)
+def test_disabled_without_a_token(client, monkeypatch, url):
+    monkeypatch.setattr(admin, "ADMIN_API_TOKEN", None)
+
+    assert client.get(url).status_code == 404
+    assert client.get(url, headers={"X-Admin-Token": ""}).status_code == 404
+
+
+@pytest.mark.parametrize("url", ENDPOINTS)
+@pytest.mark.parametrize("headers", [{}, {"X-Admin-Token": "wrong"}, {"X-Admin-Token": ""}])
+def test_rejects_a_missing_or_wrong_token(client, monkeypatch, url, headers):
+    monkeypatch.setattr(admin, "ADMIN_API_TOKEN", "secret")
+
+    assert client.get(url, headers=headers).status_code == 403
+
+
+def test_render_stats_with_the_token(client, monkeypatch):
+    monkeypatch.setattr(admin, "ADMIN_API_TOKEN", "secret")
+
+    response = client.get("/api/admin/render-stats", headers={"X-Admin-Token": "secret"})
+
+    assert response.status_code == 200
+    assert set(response.json()) == {"executor", "cache", "tiles", "encoders", "fonts"}
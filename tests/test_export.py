@@ -0,0 +1,109 @@
+import io
+import json
+import zipfile
+from urllib.parse import unquote
+
+import pytest
+
+from file_utils import FileManager
+from routes.export import get_content_disposition
+from tests.test_images import upload
+from zip_stream import ZipStream
+
+AWKWARD_NAME = 'Café; "summer"\\sale ☀'
+
+
+def disposition_params(header):
+    """Split an attachment header into its parameters, honouring quoted values"""
+    params = {}
+    for part in header.split('; ')[1:]:
+        key, _, value = part.partition('=')
+        params[key] = value
+    return params
+
+
+@pytest.mark.parametrize("filename", ["banner.png", AWKWARD_NAME + ".zip", "a,b;c=d.jpg"])
+def test_content_disposition_round_trips_any_name(filename):
+    header = get_content_disposition(filename)
+    params = disposition_params(header)
+
+    header.encode('latin-1')
+    assert header.startswith("attachment; ")
+    assert set(params) == {"filename", "filename*"}
+    fallback = params["filename"]
+    assert fallback.startswith('"') and fallback.endswith('"')
+    assert '"' not in fallback[1:-1] and '\\' not in fallback[1:-1]
+    assert fallback[1:-1].isascii()
+    assert params["filename*"].startswith("UTF-8''")
+    assert unquote(params["filename*"][len("UTF-8''"):]) == filename
+
+
+def test_content_disposition_keeps_plain_names():
+    assert get_content_disposition("P_1_abc.jpg") == "attachment; filename=\"P_1_abc.jpg\"; filename*=UTF-8''P_1_abc.jpg"
+
+
+@pytest.fixture
+def project_id(client):
+    project = client.post("/api/projects/", json={'name': AWKWARD_NAME}).json()
+    response = client.put(f"/api/projects/{project['id']}", json={
+        'export_settings': {'format': 'jpg', 'resolution': '1080p'}})
+    assert response.status_code == 200
+    return project['id']
+
+
+def test_download_header_with_an_awkward_project_name(client, project_id):
+    response = client.get(f"/api/export/{project_id}/download")
+
+    assert response.status_code == 200
+    filename = unquote(disposition_params(response.headers["content-disposition"])["filename*"][len("UTF-8''"):])
+    assert filename.startswith("Café;_\"summer\"\\sale_☀_")
+    assert filename.endswith(".jpg")
+
+
+def test_batch_archive_header(client, project_id):
+    response = client.post("/api/export/batch/archive", json={'targets': [{'project_id': project_id}]})
+
+    assert response.status_code == 200
+    params = disposition_params(response.headers["content-disposition"])
+    assert params["filename"].startswith('"banners_') and params["filename"].endswith('.zip"')
+
+
+def test_bundle_header_with_an_awkward_project_name(client, project_id):
+    response = client.get(f"/api/export/{project_id}/bundle")
+
+    assert response.status_code == 200
+    params = disposition_params(response.headers["content-disposition"])
+    assert params["filename"].startswith('"Caf____summer__sale__')
+    filename = unquote(params["filename*"][len("UTF-8''"):])
+    assert filename.startswith("Café;_\"summer\"\\sale_☀_")
+    assert filename.endswith(".zip")
+
+
+def test_bundle_stays_valid_when_an_original_disappears_mid_stream(client, storage, project_id, monkeypatch):
+    gone = upload(client, "gone.png", color=(10, 20, 30)).json()['images'][0]
+    kept = upload(client, "kept.png", color=(30, 20, 10)).json()['images'][0]
+    client.put(f"/api/projects/{project_id}", json={'images': [gone['id'], kept['id']]})
+    gone_path = FileManager.get_file_path(gone['url'].split('/')[-1])
+    add_file = ZipStream.add_file
+
+    def delete_then_add_file(self, arcname, path):
+        # The original is removed after the bundle looked it up but before it is read
+        if path == gone_path:
+            path.unlink()
+        return add_file(self, arcname, path)
+
+    monkeypatch.setattr(ZipStream, "add_file", delete_then_add_file)
+    response = client.get(f"/api/export/{project_id}/bundle")
+
+    assert response.status_code == 200
+    archive = zipfile.ZipFile(io.BytesIO(response.content))
+    assert archive.testzip() is None
+    manifest = json.loads(archive.read("manifest.json"))
+    gone_entry, kept_entry = manifest['images']
+    assert gone_entry['file'] is None
+    assert gone_entry['error'].startswith("Original file is no longer available")
+    assert kept_entry['file'] == "images/02_kept.png"
+    assert kept_entry['error'] is None
+    assert archive.read(kept_entry['file']) == FileManager.get_file_path(kept['url'].split('/')[-1]).read_bytes()
+    assert manifest['banner']['file'] in archive.namelist()
+    assert not any(name.startswith("images/01_") for name in archive.namelist())
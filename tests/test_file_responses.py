@@ -0,0 +1,120 @@
+import pytest
+from starlette.applications import Starlette
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from file_responses import RangeFileResponse
+
+CONTENT = bytes(range(256)) * 4
+ETAG = '"abc123"'
+LAST_MODIFIED = "Wed, 21 Oct 2015 07:28:00 GMT"
+
+
+@pytest.fixture
+def client(tmp_path):
+    path = tmp_path / "payload.bin"
+    path.write_bytes(CONTENT)
+
+    async def serve(request):
+        return RangeFileResponse(
+            path,
+            range_header=request.headers.get("range"),
+            if_range=request.headers.get("if-range"),
+            media_type="application/octet-stream",
+            headers={"ETag": ETAG, "Last-Modified": LAST_MODIFIED},
+        )
+
+    with TestClient(Starlette(routes=[Route("/file", serve)])) as test_client:
+        yield test_client
+
+
+def parse_multipart(response):
+    boundary = response.headers["content-type"].split("boundary=")[1].encode()
+    parts = []
+    for chunk in response.content.split(b"--" + boundary)[1:-1]:
+        head, _, body = chunk.partition(b"\r\n\r\n")
+        content_range = [line for line in head.split(b"\r\n") if line.lower().startswith(b"content-range:")][0]
+        parts.append((content_range.split(b":", 1)[1].strip().decode(), body[:-2]))
+    return parts
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-9", [(0, 9)]),
+    ("bytes=1000-", [(1000, 1023)]),
+    ("bytes=-24", [(1000, 1023)]),
+    ("bytes=-5000", [(0, 1023)]),
+    ("bytes=1000-5000", [(1000, 1023)]),
+    ("bytes=0-9, 5-19, 20-29", [(0, 29)]),
+    ("bytes=50-59,0-9", [(0, 9), (50, 59)]),
+    ("bytes=2000-", []),
+    ("bytes=-0", []),
+    ("items=0-9", None),
+    ("bytes=9-0", None),
+    ("bytes=a-b", None),
+    ("bytes=0", None),
+    ("bytes=", None),
+])
+def test_parse_range(header, expected):
+    assert RangeFileResponse.parse_range(header, len(CONTENT)) == expected
+
+
+def test_parse_range_ignores_too_many_ranges():
+    within = ",".join(f"{i * 2}-{i * 2}" for i in range(RangeFileResponse.MAX_RANGES))
+    beyond = ",".join(f"{i * 2}-{i * 2}" for i in range(RangeFileResponse.MAX_RANGES + 1))
+    adjacent = ",".join(f"{i}-{i}" for i in range(RangeFileResponse.MAX_RANGES * 4))
+
+    assert len(RangeFileResponse.parse_range(f"bytes={within}", len(CONTENT))) == RangeFileResponse.MAX_RANGES
+    assert RangeFileResponse.parse_range(f"bytes={beyond}", len(CONTENT)) is None
+    # Counted after coalescing
+    assert RangeFileResponse.parse_range(f"bytes={adjacent}", len(CONTENT)) == [(0, RangeFileResponse.MAX_RANGES * 4 - 1)]
+
+
+def test_full_response_without_range(client):
+    response = client.get("/file")
+    assert response.status_code == 200
+    assert response.headers["accept-ranges"] == "bytes"
+    assert response.content == CONTENT
+
+
+def test_single_range(client):
+    response = client.get("/file", headers={"Range": "bytes=-24"})
+    assert response.status_code == 206
+    assert response.headers["content-range"] == "bytes 1000-1023/1024"
+    assert response.headers["content-length"] == "24"
+    assert response.content == CONTENT[1000:]
+
+
+def test_multiple_ranges_are_sent_as_multipart_byteranges(client):
+    response = client.get("/file", headers={"Range": "bytes=0-9,100-109,5-14"})
+    assert response.status_code == 206
+    assert response.headers["content-type"].startswith("multipart/byteranges; boundary=")
+    assert int(response.headers["content-length"]) == len(response.content)
+    assert parse_multipart(response) == [("bytes 0-14/1024", CONTENT[0:15]), ("bytes 100-109/1024", CONTENT[100:110])]
+
+
+def test_unsatisfiable_range(client):
+    response = client.get("/file", headers={"Range": "bytes=5000-"})
+    assert response.status_code == 416
+    assert response.headers["content-range"] == "bytes */1024"
+    assert response.content == b""
+
+
+@pytest.mark.parametrize("header", ["bytes=9-0", "bytes=x-", "lines=1-2",
+                                    "bytes=" + ",".join(f"{i * 2}-{i * 2}" for i in range(100))])
+def test_ignored_range_falls_back_to_full_response(client, header):
+    response = client.get("/file", headers={"Range": header})
+    assert response.status_code == 200
+    assert response.content == CONTENT
+
+
+@pytest.mark.parametrize("if_range, status_code", [
+    (ETAG, 206),
+    (LAST_MODIFIED, 206),
+    (f"W/{ETAG}", 200),
+    ('"other"', 200),
+    ("Thu, 22 Oct 2015 07:28:00 GMT", 200),
+])
+def test_if_range(client, if_range, status_code):
+    response = client.get("/file", headers={"Range": "bytes=0-9", "If-Range": if_range})
+    assert response.status_code == status_code
+    assert response.content == (CONTENT[:10] if status_code == 206 else CONTENT)
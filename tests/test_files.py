@@ -0,0 +1,121 @@
+import base64
+import io
+from email.utils import formatdate
+
+import pytest
+from PIL import Image
+
+from file_utils import FileManager
+
+
+@pytest.fixture
+def stored(client, storage):
+    """A file written straight into blob storage, with its URL, ETag and modification time"""
+    buffer = io.BytesIO()
+    Image.new('RGB', (16, 16), (1, 2, 3)).save(buffer, "PNG")
+    data = buffer.getvalue()
+    success, _, url = FileManager.save_base64_image(base64.b64encode(data).decode(), "a.png", "image/png")
+    assert success
+    path = FileManager.get_file_path(url.split('/')[-1])
+    content_hash = FileManager.get_content_hash(path)
+    return {'url': url, 'etag': f'"{content_hash}"', 'modified': int(path.stat().st_mtime), 'data': data}
+
+
+def test_full_response_carries_validators(client, stored):
+    response = client.get(stored['url'])
+
+    assert response.status_code == 200
+    assert response.content == stored['data']
+    assert response.headers["etag"] == stored['etag']
+    assert response.headers["last-modified"] == formatdate(stored['modified'], usegmt=True)
+    assert response.headers["cache-control"] == FileManager.CACHE_CONTROL['uploads']
+
+
+@pytest.mark.parametrize("if_none_match", [
+    "{etag}",
+    '"other", {etag}',
+    '"other",{etag} , "more"',
+    "*",
+    "W/{etag}",
+])
+def test_if_none_match_hit_is_not_modified(client, stored, if_none_match):
+    response = client.get(stored['url'], headers={"If-None-Match": if_none_match.format(etag=stored['etag'])})
+
+    assert response.status_code == 304
+    assert response.content == b""
+    # A 304 keeps the headers a 200 would have carried for caching
+    assert response.headers["etag"] == stored['etag']
+    assert response.headers["cache-control"] == FileManager.CACHE_CONTROL['uploads']
+    assert response.headers["last-modified"] == formatdate(stored['modified'], usegmt=True)
+
+
+@pytest.mark.parametrize("if_none_match", ['"other"', '"other", W/"another"', '""'])
+def test_if_none_match_miss_sends_the_file(client, stored, if_none_match):
+    response = client.get(stored['url'], headers={"If-None-Match": if_none_match})
+
+    assert response.status_code == 200
+    assert response.content == stored['data']
+
+
+def test_if_modified_since_is_ignored_when_if_none_match_is_present(client, stored):
+    response = client.get(stored['url'], headers={
+        "If-None-Match": '"other"',
+        "If-Modified-Since": formatdate(stored['modified'] + 3600, usegmt=True),
+    })
+
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize("offset, status_code", [(0, 304), (3600, 304), (-3600, 200)])
+def test_if_modified_since(client, stored, offset, status_code):
+    response = client.get(stored['url'], headers={"If-Modified-Since": formatdate(stored['modified'] + offset, usegmt=True)})
+
+    assert response.status_code == status_code
+    if status_code == 304:
+        assert response.headers["etag"] == stored['etag']
+
+
+def test_invalid_if_modified_since_sends_the_file(client, stored):
+    response = client.get(stored['url'], headers={"If-Modified-Since": "not a date"})
+
+    assert response.status_code == 200
+
+
+def test_missing_file_is_not_found(client):
+    assert client.get(f"/api/files/{'0' * 64}.png").status_code == 404
+
+
+def test_hash_cache_is_bounded(storage, monkeypatch):
+    monkeypatch.setattr(FileManager, "HASH_CACHE_SIZE", 2)
+    paths = []
+    for name in "abc":
+        path = storage / f"{name}.bin"
+        path.write_bytes(name.encode())
+        paths.append(path)
+
+    FileManager.get_content_hash(paths[0])
+    FileManager.get_content_hash(paths[1])
+    FileManager.get_content_hash(paths[0])  # b is now the least recently used
+    FileManager.get_content_hash(paths[2])
+
+    assert list(FileManager._hash_cache) == [str(paths[0]), str(paths[2])]
+
+
+def test_deleting_a_file_forgets_its_hash(storage, stored):
+    filename = stored['url'].split('/')[-1]
+    path = str(FileManager.get_file_path(filename))
+    assert path in FileManager._hash_cache
+
+    assert FileManager.delete_file(filename)
+
+    assert path not in FileManager._hash_cache
+
+
+def test_setting_a_file_aside_forgets_its_hash(storage, stored):
+    filename = stored['url'].split('/')[-1]
+    path = str(FileManager.get_file_path(filename))
+
+    moved = FileManager.set_aside_files([filename])
+
+    assert path not in FileManager._hash_cache
+    FileManager.remove_set_aside_files(moved)
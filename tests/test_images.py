@@ -0,0 +1,95 @@
+import base64
+import io
+import json
+
+from PIL import Image
+
+import file_utils
+from database import DatabaseManager
+from file_utils import FileManager
+
+
+def upload(client, *names, color=(200, 30, 30), size=(1200, 800)):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, color).save(buffer, "PNG")
+    data = base64.b64encode(buffer.getvalue()).decode()
+    images = [{'name': name, 'size': 1, 'content_type': 'image/png', 'data': data} for name in names]
+    return client.post("/api/images/upload", data={'images_data': json.dumps(images)})
+
+
+def stored_files(image):
+    filenames = [image['url'].split('/')[-1]] + [variant['url'].split('/')[-1] for variant in image['variants']]
+    return [FileManager.get_file_path(filename) for filename in filenames]
+
+
+def leftovers(storage):
+    return [path for path in storage.rglob(".*") if path.suffix in (".tmp", ".deleted")]
+
+
+def test_identical_uploads_get_their_own_records_and_share_files(client, storage):
+    first = upload(client, "a.png").json()['images'][0]
+    second = upload(client, "b.png").json()['images'][0]
+
+    assert first['id'] != second['id']
+    assert second['name'] == "b.png"
+    assert second['url'] == first['url']
+    assert second['variants'] == first['variants']
+    assert len(list(file_utils.BLOB_DIR.rglob("*.png"))) == 1
+    assert all(stored_files(first))
+    assert leftovers(storage) == []
+
+
+def test_deleting_one_copy_keeps_the_shared_files(client, storage):
+    first = upload(client, "a.png").json()['images'][0]
+    second = upload(client, "b.png").json()['images'][0]
+
+    assert client.delete(f"/api/images/{first['id']}").status_code == 200
+    assert all(stored_files(second))
+    assert client.get(second['url']).status_code == 200
+
+    assert client.delete(f"/api/images/{second['id']}").status_code == 200
+    assert not any(stored_files(second))
+    assert leftovers(storage) == []
+    assert client.delete(f"/api/images/{second['id']}").status_code == 404
+
+
+def test_upload_does_not_reuse_a_record_whose_files_are_gone(client):
+    first = upload(client, "a.png").json()['images'][0]
+    # The variants were removed by a concurrent delete of the last copy
+    for path in stored_files(first)[1:]:
+        path.unlink()
+
+    second = upload(client, "b.png").json()['images'][0]
+
+    assert second['variants']
+    assert all(stored_files(second))
+
+
+def test_delete_restores_files_reused_by_a_concurrent_upload(client, monkeypatch):
+    image = upload(client, "a.png").json()['images'][0]
+    answers = iter([False, True])
+
+    async def is_file_referenced(url):
+        # An upload of the same content stores its record between the two checks
+        return next(answers)
+
+    monkeypatch.setattr(DatabaseManager, "is_file_referenced", is_file_referenced)
+
+    assert client.delete(f"/api/images/{image['id']}").status_code == 200
+    assert all(stored_files(image))
+
+
+def test_upload_drops_records_whose_files_vanish_before_the_insert(client, monkeypatch):
+    create_images = DatabaseManager.create_images
+
+    async def create_images_after_delete(records):
+        for record in records:
+            FileManager.delete_file(record.url.split('/')[-1])
+        return await create_images(records)
+
+    monkeypatch.setattr(DatabaseManager, "create_images", create_images_after_delete)
+
+    response = upload(client, "a.png")
+
+    assert response.status_code == 409
+    assert client.get("/api/images/").json() == []
@@ -0,0 +1,154 @@
+from collections import OrderedDict
+
+import pytest
+
+import render_cache
+from models import ExportSettings, GridSize, Project, TextOverlay, TextPosition, TextStyle
+from render_cache import RenderCache
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    """An empty render cache in a temporary directory"""
+    monkeypatch.setattr(render_cache, "RENDER_DIR", tmp_path)
+    monkeypatch.setattr(RenderCache, "_entries", OrderedDict())
+    monkeypatch.setattr(RenderCache, "_total_bytes", 0)
+    monkeypatch.setattr(RenderCache, "_loaded", False)
+    return tmp_path
+
+
+def make_project(**changes):
+    project = Project(
+        name="cache",
+        grid_size=GridSize(rows=2, cols=2),
+        background_color="#ffffff",
+        text_overlays=[TextOverlay(id="overlay", text="Hi", style=TextStyle(), position=TextPosition())],
+        export_settings=ExportSettings(),
+    )
+    return project.model_copy(update=changes)
+
+
+IMAGES = [("image-1", "hash-1"), ("image-2", "hash-2")]
+
+
+def put(cache, key, size, project_id="project", image_ids=("image-1",)):
+    temp_path = RenderCache.get_temp_path(key, "png")
+    temp_path.write_bytes(b"x" * size)
+    return RenderCache.put(key, "png", temp_path, project_id, image_ids)
+
+
+def test_key_changes_with_every_render_input(monkeypatch):
+    overlay = TextOverlay(id="overlay", text="Hi", style=TextStyle(), position=TextPosition())
+    base = RenderCache.build_key(make_project(), IMAGES, 1920, 1080)
+    variants = {
+        'grid_size': RenderCache.build_key(make_project(grid_size=GridSize(rows=2, cols=3)), IMAGES, 1920, 1080),
+        'background': RenderCache.build_key(make_project(background_color="#000000"), IMAGES, 1920, 1080),
+        'overlay_text': RenderCache.build_key(
+            make_project(text_overlays=[overlay.model_copy(update={'text': "Ho"})]), IMAGES, 1920, 1080),
+        'overlay_style': RenderCache.build_key(
+            make_project(text_overlays=[overlay.model_copy(update={'style': TextStyle(font_size=30)})]), IMAGES, 1920, 1080),
+        'overlay_position': RenderCache.build_key(
+            make_project(text_overlays=[overlay.model_copy(update={'position': TextPosition(x=1)})]), IMAGES, 1920, 1080),
+        'no_overlays': RenderCache.build_key(make_project(text_overlays=[]), IMAGES, 1920, 1080),
+        'format': RenderCache.build_key(make_project(export_settings=ExportSettings(format="jpg")), IMAGES, 1920, 1080),
+        'quality': RenderCache.build_key(make_project(export_settings=ExportSettings(quality=50)), IMAGES, 1920, 1080),
+        'target_size': RenderCache.build_key(
+            make_project(export_settings=ExportSettings(target_size_kb=100)), IMAGES, 1920, 1080),
+        'resolution': RenderCache.build_key(make_project(export_settings=ExportSettings(resolution="4K")), IMAGES, 1920, 1080),
+        'profile': RenderCache.build_key(make_project(export_settings=ExportSettings(profile="fast")), IMAGES, 1920, 1080),
+        'dimensions': RenderCache.build_key(make_project(), IMAGES, 1920, 1081),
+        'image_order': RenderCache.build_key(make_project(), IMAGES[::-1], 1920, 1080),
+        'image_content': RenderCache.build_key(make_project(), [("image-1", "hash-3"), IMAGES[1]], 1920, 1080),
+        'image_removed': RenderCache.build_key(make_project(), IMAGES[:1], 1920, 1080),
+    }
+    monkeypatch.setattr(render_cache, "RENDERER_VERSION", render_cache.RENDERER_VERSION + 1)
+    variants['renderer_version'] = RenderCache.build_key(make_project(), IMAGES, 1920, 1080)
+
+    assert base not in variants.values()
+    assert len(set(variants.values())) == len(variants)
+
+
+def test_key_ignores_what_does_not_affect_pixels():
+    base = RenderCache.build_key(make_project(), IMAGES, 1920, 1080)
+    renamed = make_project(name="other", description="changed")
+    new_overlay_id = make_project(text_overlays=[
+        TextOverlay(id="another", text="Hi", style=TextStyle(), position=TextPosition())])
+
+    assert RenderCache.build_key(renamed, IMAGES, 1920, 1080) == base
+    assert RenderCache.build_key(new_overlay_id, IMAGES, 1920, 1080) == base
+
+
+def test_put_then_get(cache):
+    path = put(cache, "a", 100)
+
+    assert RenderCache.get("a", "png") == path
+    assert RenderCache.get("a", "jpg") is None
+    assert RenderCache.get("b", "png") is None
+    assert list(cache.glob(".*.tmp")) == []
+
+
+def test_get_adopts_a_render_written_by_another_worker(cache):
+    RenderCache.get_stats()  # index loaded while the render doesn't exist yet
+    (cache / RenderCache.get_filename("a", "png")).write_bytes(b"x" * 100)
+
+    path = RenderCache.get("a", "png")
+
+    assert path == cache / RenderCache.get_filename("a", "png")
+    assert RenderCache.get_stats()['entries'] == 1
+    assert RenderCache.get_stats()['total_bytes'] == 100
+
+
+def test_get_forgets_a_render_removed_by_another_worker(cache):
+    path = put(cache, "a", 100)
+    path.unlink()
+
+    assert RenderCache.get("a", "png") is None
+    assert RenderCache.get_stats()['total_bytes'] == 0
+
+
+def test_lru_eviction_stays_within_budget(cache, monkeypatch):
+    monkeypatch.setattr(RenderCache, "MAX_BYTES", 250)
+    put(cache, "a", 100)
+    put(cache, "b", 100)
+    RenderCache.get("a", "png")  # b is now the least recently used
+
+    put(cache, "c", 100)
+
+    assert RenderCache.get("b", "png") is None
+    assert RenderCache.get("a", "png") is not None
+    assert RenderCache.get("c", "png") is not None
+    assert RenderCache.get_stats()['total_bytes'] <= 250
+    assert sorted(path.name for path in cache.iterdir()) == [RenderCache.get_filename(key, "png") for key in "ac"]
+
+
+def test_adopted_renders_count_towards_the_budget(cache, monkeypatch):
+    monkeypatch.setattr(RenderCache, "MAX_BYTES", 250)
+    put(cache, "a", 100)
+    put(cache, "b", 100)
+    (cache / RenderCache.get_filename("c", "png")).write_bytes(b"x" * 100)
+
+    assert RenderCache.get("c", "png") is not None
+    assert RenderCache.get_stats()['total_bytes'] <= 250
+    assert not (cache / RenderCache.get_filename("a", "png")).exists()
+
+
+def test_index_is_rebuilt_from_disk_within_budget(cache, monkeypatch):
+    for name in "abc":
+        (cache / RenderCache.get_filename(name, "png")).write_bytes(b"x" * 100)
+    monkeypatch.setattr(RenderCache, "MAX_BYTES", 150)
+
+    stats = RenderCache.get_stats()
+
+    assert stats['entries'] == 1
+    assert stats['total_bytes'] == 100
+    assert len(list(cache.iterdir())) == 1
+
+
+def test_invalidation(cache):
+    put(cache, "a", 100, project_id="p1", image_ids=["i1"])
+    put(cache, "b", 100, project_id="p2", image_ids=["i2"])
+
+    assert RenderCache.invalidate_project("p1") == 1
+    assert RenderCache.invalidate_image("i2") == 1
+    assert RenderCache.get_stats() == {'entries': 0, 'total_bytes': 0, 'max_bytes': RenderCache.MAX_BYTES}
+    assert list(cache.iterdir()) == []
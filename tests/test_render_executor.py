@@ -0,0 +1,87 @@
+import asyncio
+import threading
+
+import pytest
+
+from render_executor import RenderExecutor, RenderQueueFull
+
+
+@pytest.fixture
+def executor(monkeypatch):
+    """A fresh pool with one worker and no queue"""
+    monkeypatch.setattr(RenderExecutor, "EXECUTOR_TYPE", "thread")
+    monkeypatch.setattr(RenderExecutor, "MAX_WORKERS", 1)
+    monkeypatch.setattr(RenderExecutor, "MAX_QUEUE", 0)
+    monkeypatch.setattr(RenderExecutor, "_executor", None)
+    monkeypatch.setattr(RenderExecutor, "_semaphore", None)
+    monkeypatch.setattr(RenderExecutor, "_pending", 0)
+    yield RenderExecutor
+    RenderExecutor.shutdown()
+
+
+def test_cancelled_render_keeps_its_slot_until_it_finishes(executor):
+    started = threading.Event()
+    finish = threading.Event()
+
+    def render():
+        started.set()
+        finish.wait(5)
+        return "done"
+
+    async def scenario():
+        task = asyncio.ensure_future(executor.run(render))
+        await asyncio.to_thread(started.wait, 5)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        # The pool thread is still rendering, so there is no room
+        assert executor._pending == 1
+        with pytest.raises(RenderQueueFull):
+            await executor.run(lambda: None)
+
+        finish.set()
+        for _ in range(100):
+            if executor._pending == 0:
+                break
+            await asyncio.sleep(0.01)
+        assert executor._pending == 0
+        assert await executor.run(lambda: "next") == "next"
+
+    asyncio.run(scenario())
+
+
+def test_render_cancelled_while_queued_frees_its_slot(executor, monkeypatch):
+    monkeypatch.setattr(RenderExecutor, "MAX_QUEUE", 1)
+    finish = threading.Event()
+
+    async def scenario():
+        running = asyncio.ensure_future(executor.run(finish.wait, 5))
+        await asyncio.sleep(0.05)
+        queued = asyncio.ensure_future(executor.run(lambda: None))
+        await asyncio.sleep(0.05)
+        assert executor._pending == 2
+
+        queued.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await queued
+        assert executor._pending == 1
+
+        finish.set()
+        assert await running is True
+        assert executor._pending == 0
+
+    asyncio.run(scenario())
+
+
+def test_errors_propagate_and_release_the_slot(executor):
+    def fail():
+        raise ValueError("broken")
+
+    async def scenario():
+        with pytest.raises(ValueError):
+            await executor.run(fail)
+        assert executor._pending == 0
+        assert await executor.run(lambda: 1) == 1
+
+    asyncio.run(scenario())
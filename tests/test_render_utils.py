@@ -0,0 +1,151 @@
+import io
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+import pytest
+from PIL import Image, ImageChops
+from models import ExportSettings, GridSize, Project, TextOverlay, TextPosition, TextStyle
+import render_utils
+from render_utils import BannerRenderer
+
+
+def test_lossless_palette_keeps_near_colors_apart():
+    banner = Image.new('RGB', (64, 32), (255, 255, 255))
+    banner.putpixel((5, 5), (254, 254, 254))
+    banner.paste((16, 32, 200), (0, 16, 16, 32))
+    banner.paste((17, 33, 201), (16, 16, 32, 32))
+
+    palette_image = BannerRenderer.to_lossless_palette(banner)
+
+    assert palette_image.mode == 'P'
+    assert ImageChops.difference(palette_image.convert('RGB'), banner).getbbox() is None
+
+
+def test_lossless_palette_round_trips_through_png():
+    banner = Image.new('RGB', (16, 16))
+    for i in range(256):
+        banner.putpixel((i % 16, i // 16), (i, (i * 7) % 256, 255 - i))
+
+    buffer = io.BytesIO()
+    BannerRenderer.to_lossless_palette(banner).save(buffer, 'PNG')
+    buffer.seek(0)
+
+    with Image.open(buffer) as decoded:
+        assert decoded.mode == 'P'
+        assert ImageChops.difference(decoded.convert('RGB'), banner).getbbox() is None
+
+
+def test_lossless_palette_leaves_many_colors_unchanged():
+    banner = Image.new('RGB', (32, 32))
+    for x in range(32):
+        for y in range(32):
+            banner.putpixel((x, y), (x, y, 0))
+
+    assert BannerRenderer.to_lossless_palette(banner) is banner
+
+
+def make_sources(tmp_path):
+    gradient = Image.linear_gradient('L').resize((300, 200))
+    photo = Image.merge('RGB', (gradient, gradient.rotate(90), gradient.transpose(Image.Transpose.FLIP_LEFT_RIGHT)))
+    photo.save(tmp_path / "photo.jpg", "JPEG", quality=90)
+
+    translucent = photo.resize((120, 160))
+    translucent.putalpha(Image.radial_gradient('L').resize((120, 160)))
+    translucent.save(tmp_path / "translucent.png", "PNG")
+
+    palette = photo.resize((90, 90)).quantize(16)
+    palette.save(tmp_path / "palette.png", "PNG", transparency=0)
+
+    return [
+        {'path': str(tmp_path / name), 'width': size[0], 'height': size[1], 'variants': []}
+        for name, size in (("photo.jpg", (300, 200)), ("translucent.png", (120, 160)), ("palette.png", (90, 90)))
+    ]
+
+
+@pytest.mark.parametrize("profile", ["fast", "balanced", "progressive"])
+def test_streamed_png_matches_create_banner(tmp_path, profile):
+    sources = make_sources(tmp_path)
+    # An empty cell, and sizes that don't divide evenly into cells or stripes
+    image_sources = [sources[i % 3] for i in range(14)] + [None]
+    width, height = 1001, 643
+    project = Project(
+        name="stream",
+        grid_size=GridSize(rows=3, cols=5),
+        background_color="#336699",
+        text_overlays=[TextOverlay(text="Hello stripes", style=TextStyle(font_size=48, color="#ffcc00"),
+                                   position=TextPosition(x=120, y=300))],
+        export_settings=ExportSettings(format="png", profile=profile),
+    )
+
+    buffer = io.BytesIO()
+    BannerRenderer.render_to_stream(project, width, height, image_sources, buffer)
+    buffer.seek(0)
+    streamed = Image.open(buffer)
+    streamed.load()
+
+    expected = BannerRenderer.create_banner(project, width, height, image_sources)
+    assert streamed.size == expected.size
+    assert ImageChops.difference(streamed.convert('RGB'), expected.convert('RGB')).getbbox() is None
+
+
+def noisy_banner(size=(400, 300)):
+    gradient = Image.linear_gradient('L').resize(size)
+    return Image.merge('RGB', (gradient, Image.effect_noise(size, 64), gradient.transpose(Image.Transpose.FLIP_LEFT_RIGHT)))
+
+
+def count_encodes(monkeypatch):
+    calls = []
+    encode = BannerRenderer.encode
+
+    def counting_encode(banner, target, file_format, quality, options):
+        calls.append((quality, options))
+        return encode(banner, target, file_format, quality, options)
+
+    monkeypatch.setattr(BannerRenderer, "encode", staticmethod(counting_encode))
+    return calls
+
+
+def test_target_size_search_runs_the_profile_encoder_once(monkeypatch):
+    banner = noisy_banner()
+    settings = ExportSettings(format="jpg", quality=95, profile="smallest", target_size_kb=20)
+    options = BannerRenderer.get_encoder_options(settings)
+    calls = count_encodes(monkeypatch)
+
+    data = BannerRenderer.encode_to_target_size(banner, settings, options)
+
+    assert len(data) <= 20 * 1024
+    assert [quality for quality, used in calls if used == options] == [calls[-1][0]]
+    assert len(calls) <= BannerRenderer.TARGET_SIZE_MAX_ENCODES + 1
+
+
+def test_target_size_search_stops_at_the_encode_cap(monkeypatch):
+    monkeypatch.setattr(BannerRenderer, "TARGET_SIZE_MAX_ENCODES", 2)
+    banner = noisy_banner()
+    settings = ExportSettings(format="jpg", quality=95, profile="balanced", target_size_kb=20)
+    calls = count_encodes(monkeypatch)
+
+    data = BannerRenderer.encode_to_target_size(banner, settings, BannerRenderer.get_encoder_options(settings))
+
+    # Two search encodes, then the final one with the profile's options
+    assert len(calls) == 3
+    assert Image.open(io.BytesIO(data)).format == "JPEG"
+
+
+def test_target_size_keeps_the_configured_quality_when_it_fits(monkeypatch):
+    settings = ExportSettings(format="jpg", quality=80, profile="fast", target_size_kb=10_000)
+    calls = count_encodes(monkeypatch)
+
+    BannerRenderer.encode_to_target_size(noisy_banner(), settings, BannerRenderer.get_encoder_options(settings))
+
+    assert [quality for quality, _ in calls] == [80]
+
+
+def test_tile_key_changes_with_the_renderer_version(monkeypatch):
+    source = {'content_hash': "hash"}
+    key = BannerRenderer.get_tile_key(source, 640, 360)
+
+    monkeypatch.setattr(render_utils, "RENDERER_VERSION", render_utils.RENDERER_VERSION + 1)
+
+    assert BannerRenderer.get_tile_key(source, 640, 360) != key
@@ -0,0 +1,115 @@
+import io
+
+from PIL import Image
+
+import file_utils
+from file_utils import FileManager
+from routes import images
+from upload_stream import MultipartUpload
+
+BOUNDARY = "test-boundary"
+
+
+def png_bytes(color, size=(32, 32)):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, color).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def multipart_body(parts):
+    body = b""
+    for name, filename, content_type, data in parts:
+        body += f"--{BOUNDARY}\r\n".encode()
+        body += f'Content-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'.encode()
+        body += f"Content-Type: {content_type}\r\n\r\n".encode()
+        body += data + b"\r\n"
+    return body + f"--{BOUNDARY}--\r\n".encode()
+
+
+def temp_files(storage):
+    return list(storage.glob(".*.tmp"))
+
+
+def test_parts_are_written_to_blobs_as_they_arrive(storage):
+    data = png_bytes((10, 20, 30))
+    body = multipart_body([("files", "a.png", "image/png", data), ("other", "b.png", "image/png", data)])
+    upload = MultipartUpload(f"multipart/form-data; boundary={BOUNDARY}")
+
+    # One byte at a time, so part boundaries and headers straddle writes
+    for index in range(len(body)):
+        upload.write(body[index:index + 1])
+    upload.finish()
+
+    assert [(part.filename, part.size, part.error) for part in upload.parts] == [("a.png", len(data), None)]
+    stored = FileManager.get_file_path(upload.parts[0].url.split('/')[-1])
+    assert stored.parent.parent == file_utils.BLOB_DIR
+    assert stored.read_bytes() == data
+    assert temp_files(storage) == []
+
+
+def test_oversized_part_is_dropped_once_it_passes_the_limit(storage, monkeypatch):
+    monkeypatch.setattr(FileManager, "MAX_FILE_SIZE", 1000)
+    body = multipart_body([("files", "big.png", "image/png", b"x" * 5000),
+                           ("files", "small.png", "image/png", png_bytes((1, 2, 3), (4, 4)))])
+    upload = MultipartUpload(f"multipart/form-data; boundary={BOUNDARY}")
+    split = body.index(b"x" * 2000) + 2000
+
+    upload.write(body[:split])
+    # Dropped while the rest of the part is still to come
+    assert upload.parts[0].error.startswith("File size exceeds")
+    assert temp_files(storage) == []
+
+    upload.write(body[split:])
+    upload.finish()
+
+    assert [part.error is None for part in upload.parts] == [False, True]
+    assert temp_files(storage) == []
+
+
+def test_truncated_body_is_rejected_and_cleaned_up(storage):
+    body = multipart_body([("files", "a.png", "image/png", png_bytes((1, 1, 1)))])
+    upload = MultipartUpload(f"multipart/form-data; boundary={BOUNDARY}")
+    upload.write(body[:len(body) // 2])
+    try:
+        upload.finish()
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("finish() accepted a truncated body")
+    upload.close()
+
+    assert temp_files(storage) == []
+
+
+def test_upload_files_route_stores_each_file(client):
+    data = png_bytes((200, 30, 30))
+    response = client.post("/api/images/upload-files", files=[
+        ("files", ("a.png", data, "image/png")),
+        ("files", ("copy.png", data, "image/png")),
+        ("files", ("notes.txt", b"hello", "text/plain")),
+    ])
+
+    assert response.status_code == 200
+    result = response.json()
+    assert [image['name'] for image in result['images']] == ["a.png", "copy.png"]
+    assert [image['size'] for image in result['images']] == [len(data), len(data)]
+    assert result['images'][0]['url'] == result['images'][1]['url']
+    assert [error['name'] for error in result['errors']] == ["notes.txt"]
+
+
+def test_upload_files_route_caps_the_request_size(client, storage, monkeypatch):
+    monkeypatch.setattr(images, "MAX_UPLOAD_REQUEST_SIZE", 1024)
+    response = client.post("/api/images/upload-files", files=[("files", ("a.png", b"x" * 4096, "image/png"))])
+
+    assert response.status_code == 413
+    assert temp_files(storage) == []
+    assert list(file_utils.BLOB_DIR.iterdir()) == []
+
+
+def test_upload_files_route_rejects_malformed_bodies(client, storage):
+    response = client.post("/api/images/upload-files", content=b"--nope\r\n",
+                           headers={"Content-Type": f"multipart/form-data; boundary={BOUNDARY}"})
+    assert response.status_code == 400
+
+    response = client.post("/api/images/upload-files", json={"files": []})
+    assert response.status_code == 400
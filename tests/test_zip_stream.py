@@ -0,0 +1,76 @@
+import io
+import os
+import zipfile
+
+import pytest
+
+from zip_stream import ZipStream
+
+
+def collect(chunks, into):
+    for chunk in chunks:
+        into.append(chunk)
+
+
+def read_archive(chunks):
+    archive = zipfile.ZipFile(io.BytesIO(b"".join(chunks)))
+    assert archive.testzip() is None
+    return archive
+
+
+def test_entries_are_stored_or_deflated_and_read_back(tmp_path):
+    image = tmp_path / "photo.png"
+    image.write_bytes(os.urandom(ZipStream.CHUNK_SIZE * 3 + 17))
+    text = tmp_path / "notes.txt"
+    text.write_bytes(b"banner " * 50_000)
+    stream = ZipStream()
+    chunks = []
+
+    collect(stream.add_file("images/photo.png", image), chunks)
+    collect(stream.add_file("notes.txt", text), chunks)
+    collect(stream.add_bytes("manifest.json", b'{"ok": true}'), chunks)
+    collect(stream.close(), chunks)
+
+    archive = read_archive(chunks)
+    infos = {info.filename: info for info in archive.infolist()}
+    assert list(infos) == ["images/photo.png", "notes.txt", "manifest.json"]
+    assert infos["images/photo.png"].compress_type == zipfile.ZIP_STORED
+    assert infos["notes.txt"].compress_type == zipfile.ZIP_DEFLATED
+    assert infos["notes.txt"].compress_size < infos["notes.txt"].file_size
+    assert infos["manifest.json"].compress_type == zipfile.ZIP_DEFLATED
+    assert archive.read("images/photo.png") == image.read_bytes()
+    assert archive.read("notes.txt") == text.read_bytes()
+    assert archive.read("manifest.json") == b'{"ok": true}'
+    # Written without seeking: sizes follow each entry in a data descriptor
+    assert all(info.flag_bits & 0x08 for info in infos.values())
+
+
+def test_output_is_streamed_in_bounded_chunks(tmp_path):
+    payload = tmp_path / "large.bin"
+    payload.write_bytes(os.urandom(ZipStream.CHUNK_SIZE * 8))
+    stream = ZipStream()
+    chunks = []
+
+    collect(stream.add_file("large.bin", payload), chunks)
+    collect(stream.close(), chunks)
+
+    assert len(chunks) > 4
+    assert max(len(chunk) for chunk in chunks) < ZipStream.CHUNK_SIZE * 2
+    assert read_archive(chunks).read("large.bin") == payload.read_bytes()
+
+
+def test_missing_file_leaves_the_archive_valid(tmp_path):
+    present = tmp_path / "present.jpg"
+    present.write_bytes(b"jpeg" * 1000)
+    stream = ZipStream()
+    chunks = []
+
+    collect(stream.add_file("first.jpg", present), chunks)
+    with pytest.raises(OSError):
+        collect(stream.add_file("gone.jpg", tmp_path / "gone.jpg"), chunks)
+    collect(stream.add_file("second.jpg", present), chunks)
+    collect(stream.close(), chunks)
+
+    archive = read_archive(chunks)
+    assert archive.namelist() == ["first.jpg", "second.jpg"]
+    assert archive.read("second.jpg") == present.read_bytes()